@@ -19,6 +19,118 @@ class Settings:
     # AI APIs
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    LOCAL_HINTS_FIRST: bool = os.getenv("LOCAL_HINTS_FIRST", "true").lower() == "true"  # recognized errors skip the LLM
+    HINT_LLM_TIMEOUT_SECONDS: float = float(os.getenv("HINT_LLM_TIMEOUT_SECONDS", "15"))  # per attempt
+    HINT_LLM_MAX_RETRIES: int = int(os.getenv("HINT_LLM_MAX_RETRIES", "2"))
+    HINT_PROMPT_MAX_TOKENS: int = int(os.getenv("HINT_PROMPT_MAX_TOKENS", "3000"))  # estimated, system prompt included
+    HINT_LLM_MAX_CONCURRENCY: int = int(os.getenv("HINT_LLM_MAX_CONCURRENCY", "16"))  # calls in flight, and pooled connections
+    
+    # Precomputed hints for the most frequent errors (see services/hint_library.py; empty path = off)
+    HINT_LIBRARY_PATH: str = os.getenv("HINT_LIBRARY_PATH", "hint_library.json")
+    HINT_LIBRARY_CHECK_SECONDS: float = float(os.getenv("HINT_LIBRARY_CHECK_SECONDS", "10"))  # for a replaced file
+    HINT_LIBRARY_SIZE: int = int(os.getenv("HINT_LIBRARY_SIZE", "100"))  # error signatures per rebuild
+    HINT_LIBRARY_MIN_COUNT: int = int(os.getenv("HINT_LIBRARY_MIN_COUNT", "3"))  # occurrences to be included
+    
+    # Code execution
+    PYTHON_EXECUTABLE: str = os.getenv("PYTHON_EXECUTABLE", "python")
+    EXECUTION_TIMEOUT: int = int(os.getenv("EXECUTION_TIMEOUT", "30"))  # wall-clock ceiling; RLIMIT_CPU_SECONDS catches loops
+    EXECUTION_CONCURRENCY: int = int(os.getenv("EXECUTION_CONCURRENCY", "0"))  # 0 = one per CPU core
+    OUTPUT_BUFFER_BYTES: int = int(os.getenv("OUTPUT_BUFFER_BYTES", str(64 * 1024)))  # kept per stream (head + tail)
+    OUTPUT_LIMIT_BYTES: int = int(os.getenv("OUTPUT_LIMIT_BYTES", str(8 * 1024 * 1024)))  # program killed past this
+    PRECHECK_ENABLED: bool = os.getenv("PRECHECK_ENABLED", "true").lower() == "true"
+    # Empty = the system temp directory. A tmpfs such as /dev/shm is faster, but
+    # what programs write there uses RAM; only use one with a size limit of its own
+    SANDBOX_SCRATCH_DIR: str = os.getenv("SANDBOX_SCRATCH_DIR", "")
+    
+    # Time limits for the other tiers (students: RLIMIT_CPU_SECONDS and EXECUTION_TIMEOUT)
+    ANONYMOUS_CPU_SECONDS: int = int(os.getenv("ANONYMOUS_CPU_SECONDS", "5"))
+    ANONYMOUS_WALL_SECONDS: int = int(os.getenv("ANONYMOUS_WALL_SECONDS", "15"))
+    INSTRUCTOR_CPU_SECONDS: int = int(os.getenv("INSTRUCTOR_CPU_SECONDS", "30"))  # also admins
+    INSTRUCTOR_WALL_SECONDS: int = int(os.getenv("INSTRUCTOR_WALL_SECONDS", "60"))
+    
+    # Execution tracing (POST /api/code/trace)
+    TRACE_MAX_STEPS: int = int(os.getenv("TRACE_MAX_STEPS", "20000"))  # recording stops after this many events
+    TRACE_MAX_BYTES: int = int(os.getenv("TRACE_MAX_BYTES", str(8 * 1024 * 1024)))  # decoded size of one trace
+    TRACE_STORE_MAX_BYTES: int = int(os.getenv("TRACE_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+    TRACE_TTL_SECONDS: int = int(os.getenv("TRACE_TTL_SECONDS", "1800"))
+    
+    # Fair-share scheduling of execution slots between users
+    SCHEDULER_INSTRUCTOR_WEIGHT: float = float(os.getenv("SCHEDULER_INSTRUCTOR_WEIGHT", "4"))  # vs 1 per student
+    SCHEDULER_ANONYMOUS_SHARE: float = float(os.getenv("SCHEDULER_ANONYMOUS_SHARE", "0.5"))  # of slots, for unauthenticated runs
+    
+    # Admission control: shed load with 503 + Retry-After once saturated
+    ADMISSION_MAX_QUEUE_FACTOR: int = int(os.getenv("ADMISSION_MAX_QUEUE_FACTOR", "8"))  # queued runs per slot
+    ADMISSION_MAX_QUEUE_WAIT_MS: int = int(os.getenv("ADMISSION_MAX_QUEUE_WAIT_MS", "5000"))
+    ADMISSION_MAX_HINT_CALLS: int = int(os.getenv("ADMISSION_MAX_HINT_CALLS", "32"))  # concurrent LLM calls
+    
+    # End-to-end deadline for run + hints + save requests (/run-and-save, /debug; 0 = none).
+    # The run's real-time limit is capped at what is left; hints fall back to the
+    # local engine when less than HINT_MIN_BUDGET_SECONDS remain for the LLM call.
+    REQUEST_DEADLINE_SECONDS: float = float(os.getenv("REQUEST_DEADLINE_SECONDS", "30"))
+    HINT_MIN_BUDGET_SECONDS: float = float(os.getenv("HINT_MIN_BUDGET_SECONDS", "3"))
+    
+    # Concurrent identical runs and hint requests share one computation
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+    
+    # Persistent REPL sessions (one live interpreter each)
+    REPL_MAX_SESSIONS: int = int(os.getenv("REPL_MAX_SESSIONS", "32"))  # per node; 0 disables sessions
+    REPL_MAX_SESSIONS_PER_USER: int = int(os.getenv("REPL_MAX_SESSIONS_PER_USER", "2"))
+    REPL_IDLE_TIMEOUT_SECONDS: int = int(os.getenv("REPL_IDLE_TIMEOUT_SECONDS", "600"))
+    REPL_MEMORY_BYTES: int = int(os.getenv("REPL_MEMORY_BYTES", str(256 * 1024 * 1024)))
+    REPL_CPU_SECONDS: int = int(os.getenv("REPL_CPU_SECONDS", "300"))  # over the session's lifetime
+    
+    # "inline" runs code inside the request; "queue" hands /run and /run-and-save
+    # to execution worker processes and returns a job id to poll
+    EXECUTION_MODE: str = os.getenv("EXECUTION_MODE", "inline")
+    JOB_BROKER: str = os.getenv("JOB_BROKER", "local")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "0"))  # 0 = one per CPU core
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "1"))  # runs at once per worker
+    JOB_TIMEOUT_SECONDS: int = int(os.getenv("JOB_TIMEOUT_SECONDS", "120"))  # unfinished jobs fail after this
+    JOB_RESULT_TTL_SECONDS: int = int(os.getenv("JOB_RESULT_TTL_SECONDS", "600"))
+    
+    # Per-run resource limits (0 = unlimited)
+    RLIMIT_CPU_SECONDS: int = int(os.getenv("RLIMIT_CPU_SECONDS", "10"))  # signed-in students
+    RLIMIT_MEMORY_BYTES: int = int(os.getenv("RLIMIT_MEMORY_BYTES", str(512 * 1024 * 1024)))
+    RLIMIT_PROCESSES: int = int(os.getenv("RLIMIT_PROCESSES", "64"))  # containers: --pids-limit; locally see resource_limits._nproc_limit
+    RLIMIT_FILE_SIZE_BYTES: int = int(os.getenv("RLIMIT_FILE_SIZE_BYTES", str(10 * 1024 * 1024)))
+    
+    # Warm Python worker pool
+    PYTHON_POOL_SIZE: int = int(os.getenv("PYTHON_POOL_SIZE", "4"))  # 0 disables the warm pool
+    PYTHON_POOL_MAX_IDLE_SECONDS: int = int(os.getenv("PYTHON_POOL_MAX_IDLE_SECONDS", "300"))
+    
+    # Where Python runs execute: "local" processes, "container" (Docker, see
+    # DOCKER_SETUP.md) or "fake" (the container pool without Docker, for testing)
+    SANDBOX_BACKEND: str = os.getenv("SANDBOX_BACKEND", "local")
+    SANDBOX_IMAGE: str = os.getenv("SANDBOX_IMAGE", "tracecode-sandbox:latest")
+    DOCKER_EXECUTABLE: str = os.getenv("DOCKER_EXECUTABLE", "docker")
+    SANDBOX_POOL_SIZE: int = int(os.getenv("SANDBOX_POOL_SIZE", "4"))  # containers kept ready
+    SANDBOX_MAX_USES: int = int(os.getenv("SANDBOX_MAX_USES", "100"))  # runs before a container is replaced
+    SANDBOX_CONTAINER_MEMORY: str = os.getenv("SANDBOX_CONTAINER_MEMORY", "256m")
+    SANDBOX_CONTAINER_CPUS: str = os.getenv("SANDBOX_CONTAINER_CPUS", "1")
+    # Java, C/C++ and REPL sessions always run as local processes. With a
+    # container backend they are refused unless this is set (logged at startup).
+    SANDBOX_HOST_RUNTIMES: bool = os.getenv("SANDBOX_HOST_RUNTIMES", "false").lower() == "true"
+    
+    # C/C++ compilation; binaries are cached by source hash and flags
+    C_COMPILER: str = os.getenv("C_COMPILER", "gcc")
+    CPP_COMPILER: str = os.getenv("CPP_COMPILER", "g++")
+    C_COMPILE_FLAGS: str = os.getenv("C_COMPILE_FLAGS", "-O2 -std=gnu11 -lm")
+    CPP_COMPILE_FLAGS: str = os.getenv("CPP_COMPILE_FLAGS", "-O2 -std=gnu++17")
+    COMPILE_TIMEOUT: int = int(os.getenv("COMPILE_TIMEOUT", "20"))
+    ARTIFACT_CACHE_DIR: str = os.getenv("ARTIFACT_CACHE_DIR", "")  # empty = next to the scratch space
+    ARTIFACT_CACHE_MAX_BYTES: int = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    
+    # Java: warm JVM workers that compile in memory
+    JAVA_EXECUTABLE: str = os.getenv("JAVA_EXECUTABLE", "java")
+    JAVAC_EXECUTABLE: str = os.getenv("JAVAC_EXECUTABLE", "javac")
+    JAVA_HEAP_MB: int = int(os.getenv("JAVA_HEAP_MB", "256"))
+    JAVA_POOL_SIZE: int = int(os.getenv("JAVA_POOL_SIZE", "2"))  # 0 disables the warm pool
+    JAVA_POOL_MAX_IDLE_SECONDS: int = int(os.getenv("JAVA_POOL_MAX_IDLE_SECONDS", "300"))
+    
+    # Execution result cache
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_MAX_BYTES: int = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    RESULT_CACHE_TTL_SECONDS: int = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
     
     # Environment
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
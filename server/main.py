@@ -3,6 +3,7 @@ TraceCode - FastAPI Backend
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 import os
 
@@ -15,6 +16,14 @@ from routes.code import router as code_router
 from routes.hints import router as hints_router
 from routes.analytics import router as analytics_router
 from routes.submissions import router as submissions_router
+from services.admission import get_admission
+from services.job_queue import get_job_manager, shutdown_job_manager
+from services.hint_library import get_hint_library
+from services.java_runtime import get_java_pool, java_available, shutdown_java_pool
+from services.llm_client import close_llm_client
+from services.repl_sessions import shutdown_repl_manager
+from services.sandbox_backend import get_sandbox_backend, host_runtimes_allowed, shutdown_sandbox_backend
+from services.scratch_space import close_scratch_space
 
 # Create FastAPI app
 app = FastAPI(
@@ -42,6 +51,37 @@ app.include_router(submissions_router, prefix="/api/submissions", tags=["Submiss
 app.include_router(analytics_router, prefix="/api/analytics", tags=["Analytics"])
 
 
+@app.on_event("startup")
+async def warm_up_workers():
+    # Start the interpreter (or sandbox) and JVM pools now so the first runs don't pay for them
+    backend = get_sandbox_backend()
+    backend.start()
+    if backend.isolated:
+        if host_runtimes_allowed():
+            print(
+                f"Warning: Java, C/C++ and REPL sessions run as host processes, "
+                f"outside the {backend.name} sandbox (SANDBOX_HOST_RUNTIMES is set)"
+            )
+        else:
+            print(f"Java, C/C++ and REPL sessions are refused: they can't run in the {backend.name} sandbox")
+    if java_available() and host_runtimes_allowed():
+        get_java_pool()
+    # Queue mode: start the execution worker processes
+    get_job_manager()
+    # Load the precomputed hints, if any
+    get_hint_library()
+
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await shutdown_job_manager()
+    await shutdown_repl_manager()
+    await shutdown_sandbox_backend()
+    await shutdown_java_pool()
+    await close_llm_client()
+    close_scratch_space()
+
+
 @app.get("/")
 async def root():
     return {
@@ -54,7 +94,22 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    """Liveness plus a capacity snapshot (always 200; use /ready to route traffic)"""
+    capacity = get_admission().status()
+    return {"status": "healthy" if capacity["ready"] else "overloaded", "capacity": capacity}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for load balancers: 503 while this node is shedding load"""
+    capacity = get_admission().status()
+    if not capacity["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "overloaded", "capacity": capacity},
+            headers={"Retry-After": "5"}
+        )
+    return {"status": "ready", "capacity": capacity}
 
 
 @app.get("/api/info")
@@ -73,11 +128,22 @@ async def api_info():
             },
             "code": {
                 "POST /api/code/run": "Execute code (no auth required)",
+                "POST /api/code/run-stream": "Execute and stream output as Server-Sent Events",
+                "POST /api/code/trace": "Execute Python and record a step-by-step trace (no auth required)",
+                "GET /api/code/traces/{id}": "Fetch a range of steps from a recorded trace",
+                "WS /api/code/session": "Persistent Python session: run cells against live state (auth required)",
+                "POST /api/code/run-batch": "Execute against many test inputs (no auth required)",
                 "POST /api/code/run-and-save": "Execute and save to history (auth required)",
-                "POST /api/code/debug": "Execute with debugging hints"
+                "POST /api/code/debug": "Execute with debugging hints",
+                "GET /api/code/jobs/{id}": "Poll a queued run (EXECUTION_MODE=queue)",
+                "GET /api/code/stats": "Execution queue and worker pool metrics",
+                "GET /api/code/stats/users": "Per-user queue waits (instructors/admins)"
             },
             "hints": {
-                "POST /api/hints/get": "Get AI debugging hints"
+                "POST /api/hints/get": "Get AI debugging hints",
+                "POST /api/hints/stream": "Get hints as Server-Sent Events, one per hint as it is written",
+                "GET /api/hints/library": "Precomputed hint library version and counters",
+                "POST /api/hints/library/rebuild": "Regenerate the hint library from frequent errors (instructors/admins)"
             },
             "submissions": {
                 "GET /api/submissions": "List user's submissions",
@@ -87,7 +153,7 @@ async def api_info():
                 "DELETE /api/submissions/{id}": "Delete submission"
             }
         },
-        "supported_languages": ["python", "c", "cpp", "java"]
+        "supported_languages": ["python", "c", "cpp", "java"] if host_runtimes_allowed() else ["python"]
     }
 
 
@@ -1,7 +1,7 @@
 """
 Pydantic models for request/response schemas (Simplified for Python-only)
 """
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Literal, Dict
 
 
@@ -45,9 +45,24 @@ class FirebaseAuthResponse(BaseModel):
 
 # ========== Code Execution Models ==========
 
+class Diagnostic(BaseModel):
+    type: Literal["syntax_error", "undefined_name"]
+    message: str
+    line: int
+    column: int
+
+
+class ResourceUsage(BaseModel):
+    cpu_user: float  # seconds
+    cpu_system: float  # seconds
+    max_rss_kb: int
+    voluntary_context_switches: int
+    involuntary_context_switches: int
+
+
 class CodeRunRequest(BaseModel):
     code: str
-    language: Literal["python"] = "python"  # Python only for now
+    language: Literal["python", "c", "cpp", "java"] = "python"
     input: Optional[str] = ""
 
 
@@ -55,13 +70,19 @@ class CodeRunResponse(BaseModel):
     success: bool
     output: str
     compilation_result: str
-    execution_time: float
+    execution_time: float  # running time only
+    compile_time: Optional[float] = None  # C/C++/Java; C/C++: 0 when the binary came from the cache
     status: Literal["success", "compilation_error", "runtime_error", "timeout"]
+    truncated: bool = False  # output was cut down to its head and tail
+    output_bytes: int = 0  # total stdout bytes the program produced
+    resource_usage: Optional[ResourceUsage] = None
+    diagnostics: Optional[List[Diagnostic]] = None  # static pre-check findings
+    cached: bool = False  # answered from the result cache: no execution_time or resource_usage
 
 
 class CodeRunAndSaveRequest(BaseModel):
     code: str
-    language: Literal["python"] = "python"
+    language: Literal["python", "c", "cpp", "java"] = "python"
     input: Optional[str] = ""
     expected_output: Optional[str] = ""
     get_hints: bool = True
@@ -71,14 +92,214 @@ class CodeRunAndSaveResponse(BaseModel):
     success: bool
     output: str
     compilation_result: str
-    execution_time: float
+    execution_time: float  # running time only
+    compile_time: Optional[float] = None  # C/C++/Java; C/C++: 0 when the binary came from the cache
     status: Literal["success", "compilation_error", "runtime_error", "timeout"]
+    truncated: bool = False
+    output_bytes: int = 0
+    resource_usage: Optional[ResourceUsage] = None
+    diagnostics: Optional[List[Diagnostic]] = None
+    cached: bool = False
     submission_id: Optional[str] = None
     error_type: Optional[str] = None
     hints: Optional[List[str]] = None
     root_cause: Optional[str] = None
 
 
+class CodeTraceRequest(BaseModel):
+    code: str
+    language: Literal["python"] = "python"
+    input: Optional[str] = ""
+    max_steps: Optional[int] = Field(None, ge=1)  # capped by the server's TRACE_MAX_STEPS
+    snapshot_every: int = Field(1, ge=1, le=1000)  # snapshot variables on every Nth line
+
+
+class TraceSummary(BaseModel):
+    trace_id: str
+    steps: int
+    truncated: bool  # recording stopped at the step cap
+    url: str  # GET with ?start=&count= for ranges of steps
+
+
+class CodeTraceResponse(CodeRunResponse):
+    trace: Optional[TraceSummary] = None  # None if nothing was recorded (e.g. a syntax error)
+
+
+class TraceStep(BaseModel):
+    index: int
+    event: Literal["line", "call", "return", "exception"]
+    line: int
+    depth: int  # 1 = module level
+    function: str
+    changes: Dict[str, str]  # variables that changed (repr), plus <return> / <exception>
+
+
+class TraceRangeResponse(BaseModel):
+    trace_id: str
+    start: int
+    total: int
+    truncated: bool
+    variables: Dict[str, str]  # innermost frame's known variables just before `start`
+    steps: List[TraceStep]
+
+
+class TestCase(BaseModel):
+    input: Optional[str] = ""
+    expected_output: Optional[str] = None  # if set, output must match to pass
+
+
+class BatchRunRequest(BaseModel):
+    code: str
+    language: Literal["python", "c", "cpp", "java"] = "python"
+    cases: List[TestCase] = Field(..., min_length=1, max_length=100)
+    stop_on_failure: bool = False
+
+
+class BatchCaseResult(BaseModel):
+    index: int
+    passed: bool
+    output: str
+    compilation_result: str
+    execution_time: float
+    compile_time: Optional[float] = None
+    status: Literal["success", "compilation_error", "runtime_error", "timeout", "skipped"]
+    truncated: bool = False
+    output_bytes: int = 0
+    cached: bool = False
+
+
+class BatchRunResponse(BaseModel):
+    results: List[BatchCaseResult]
+    passed: int
+    failed: int
+    skipped: int
+    total_time: float
+
+
+class ExecutorStats(BaseModel):
+    max_concurrency: int
+    anonymous_limit: int  # slots unauthenticated runs may hold at once
+    in_flight: int
+    anonymous_in_flight: int
+    queued: int
+    completed: int
+    active_users: int
+    wait_ms_p50: float
+    wait_ms_p95: float
+    wait_ms_max: float
+    wait_ms_ewma: float  # recent queue latency, drives admission control
+
+
+class UserQueueStats(BaseModel):
+    user: str  # "user:<id>" or "anonymous"
+    weight: float
+    in_flight: int
+    queued: int
+    completed: int
+    wait_ms_p50: float
+    wait_ms_p95: float
+    wait_ms_max: float
+
+
+class UserQueueStatsResponse(BaseModel):
+    users: List[UserQueueStats]
+
+
+class WorkerPoolStats(BaseModel):
+    size: int
+    idle: int
+    warm_hits: int
+    cold_starts: int
+
+
+class SandboxPoolStats(BaseModel):
+    size: int
+    idle: int
+    leased: int
+    resetting: int
+    leases: int
+    warm_hits: int
+    cold_starts: int
+    resets: int
+    discarded: int
+
+
+class ResultCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    bypassed: int
+    evictions: int
+    hit_rate: float
+
+
+class ArtifactCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+
+
+class SingleFlightStats(BaseModel):
+    in_flight: int  # distinct computations running now
+    leaders: int  # calls that started a computation
+    coalesced: int  # calls that joined one already in flight
+    coalesced_rate: float
+
+
+class ReplSessionStats(BaseModel):
+    sessions: int
+    max_sessions: int
+    attached: int  # with a connected client
+    busy: int  # running a cell
+    opened: int
+    evicted_idle: int
+    evicted_for_room: int  # closed to make room for a new session
+
+
+class JobAcceptedResponse(BaseModel):
+    job_id: str
+    status: Literal["queued"] = "queued"
+    poll_url: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "done", "failed"]
+    created_at: float  # unix timestamps
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[CodeRunAndSaveResponse] = None  # fields of the submitting endpoint's response
+
+
+class JobQueueStats(BaseModel):
+    workers: int
+    workers_alive: int
+    queued: int
+    running: int
+    submitted: int
+    completed: int
+    lost: int
+
+
+class ExecutionStatsResponse(BaseModel):
+    executor: ExecutorStats
+    sandbox_backend: str
+    python_pool: Optional[WorkerPoolStats] = None
+    sandbox_pool: Optional[SandboxPoolStats] = None
+    java_pool: Optional[WorkerPoolStats] = None
+    result_cache: Optional[ResultCacheStats] = None
+    artifact_cache: ArtifactCacheStats
+    job_queue: Optional[JobQueueStats] = None
+    single_flight: Optional[SingleFlightStats] = None
+    repl_sessions: Optional[ReplSessionStats] = None
+
+
 # ========== Hint Models ==========
 
 class HintRequest(BaseModel):
@@ -99,6 +320,21 @@ class HintResponse(BaseModel):
     root_cause: str
     concept_references: List[ConceptReference]
     minimal_patch: str
+    prompt_tokens: Optional[int] = None  # estimated tokens sent to the model (None: answered locally)
+
+
+class HintLibraryStats(BaseModel):
+    version: int  # goes up with each rebuild
+    generated_at: str
+    entries: int  # error signatures with stored hints
+    hits: int  # lookups answered since this version was loaded
+    misses: int
+
+
+class HintLibraryStatus(BaseModel):
+    enabled: bool  # HINT_LIBRARY_PATH is set
+    rebuilding: bool
+    library: Optional[HintLibraryStats] = None  # None until a library file exists
 
 
 # ========== Submission Models ==========
@@ -109,6 +345,7 @@ class SubmissionCreate(BaseModel):
     output: str
     status: Literal["success", "error"]
     execution_time: float
+    error: Optional[str] = None  # traceback or compiler message of a failed run
     error_type: Optional[str] = None
     hints: Optional[List[str]] = None
     root_cause: Optional[str] = None
@@ -122,9 +359,12 @@ class SubmissionResponse(BaseModel):
     output: str
     status: str
     execution_time: float
+    error: Optional[str] = None
     error_type: Optional[str] = None
     hints: List[str] = []
     root_cause: Optional[str] = None
+    resource_usage: Optional[ResourceUsage] = None
+    cached: bool = False  # the run's result came from the cache, so it has no timing of its own
     timestamp: str
     created_at: str
 
@@ -41,7 +41,11 @@ async def get_optional_user(
     if not authorization or not authorization.startswith("Bearer "):
         return None
     
-    token = authorization.replace("Bearer ", "")
+    return user_from_token(authorization.replace("Bearer ", ""))
+
+
+def user_from_token(token: str) -> Optional[dict]:
+    """User for a JWT, or None if it is invalid (for WebSockets, which can't send headers)"""
     payload = decode_token(token)
     if not payload:
         return None
@@ -1,24 +1,88 @@
 """
 Code execution routes with run-and-save functionality
 """
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import json
+import time
 from typing import Optional
+from config import settings
 from models import (
     CodeRunRequest, CodeRunResponse,
-    CodeRunAndSaveRequest, CodeRunAndSaveResponse
+    CodeRunAndSaveRequest, CodeRunAndSaveResponse,
+    BatchRunRequest, BatchRunResponse, BatchCaseResult,
+    ExecutionStatsResponse, ExecutorStats, WorkerPoolStats, SandboxPoolStats, ResultCacheStats,
+    ArtifactCacheStats, JobAcceptedResponse, JobStatusResponse, JobQueueStats,
+    UserQueueStats, UserQueueStatsResponse, SingleFlightStats, ReplSessionStats,
+    CodeTraceRequest, CodeTraceResponse, TraceSummary, TraceRangeResponse, TraceStep
 )
-from services.code_service import run_code
-from services.hint_service import generate_hints
+from services.code_service import run_code, run_batch, stream_code, trace_code
+from services.deadline import set_deadline
+from services.admission import get_admission
+from services.executor import get_engine, set_requester
+from services.job_queue import get_job_manager
+from services.java_runtime import get_java_pool, java_available
+from services.native_code import get_artifact_cache
+from services.repl_sessions import ReplSession, get_repl_manager
+from services.result_cache import get_result_cache
+from services.sandbox_backend import get_sandbox_backend
+from services.single_flight import get_execution_flights
+from services.trace_store import get_trace_store
+from services.worker_pool import get_python_pool
+from services.hint_service import request_hints
 from services.submissions_service import create_submission
-from routes.auth import get_current_user, get_optional_user
+from routes.auth import get_current_user, get_optional_user, user_from_token
 
 router = APIRouter()
 
 
-@router.post("/run", response_model=CodeRunResponse)
-async def execute_code(request: CodeRunRequest):
-    """Execute code in sandbox and return results (no auth required)"""
-    result = run_code(
+async def admit_execution():
+    """Shed new runs with 503 + Retry-After while the execution queue is saturated"""
+    _admit_runs(1)
+
+
+def _admit_runs(runs: int, inline: bool = False) -> None:
+    """
+    Raise 503 + Retry-After if `runs` more runs would overfill the execution
+    queue (this process's engine when `inline`, else the job queue in queue mode)
+    """
+    retry_after = get_admission().execution_retry_after(runs, inline)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy running other programs. Please try again shortly.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+@router.post(
+    "/run",
+    response_model=CodeRunResponse,
+    responses={202: {"model": JobAcceptedResponse}},
+    dependencies=[Depends(admit_execution)]
+)
+async def execute_code(
+    request: CodeRunRequest,
+    user: Optional[dict] = Depends(get_optional_user)
+):
+    """
+    Execute code in sandbox and return results (no auth required)
+    Signed-in users are scheduled fairly against each other; anonymous runs share a capped slice.
+    In queue mode, returns 202 with a job to poll at /api/code/jobs/{job_id}.
+    """
+    manager = get_job_manager()
+    if manager:
+        job = manager.submit(
+            code=request.code,
+            language=request.language,
+            user_input=request.input or "",
+            user=user
+        )
+        return _job_accepted(job)
+    
+    set_requester(user)
+    result = await run_code(
         code=request.code,
         language=request.language,
         user_input=request.input or ""
@@ -28,11 +92,248 @@ async def execute_code(request: CodeRunRequest):
         output=result["output"],
         compilation_result=result["compilation_result"],
         execution_time=result["execution_time"],
-        status=result["status"]
+        compile_time=result.get("compile_time"),
+        status=result["status"],
+        truncated=result.get("truncated", False),
+        output_bytes=result.get("output_bytes", 0),
+        resource_usage=result.get("resource_usage"),
+        diagnostics=result.get("diagnostics"),
+        cached=result.get("cached", False)
+    )
+
+
+@router.post("/run-stream", dependencies=[Depends(admit_execution)])
+async def execute_code_stream(
+    request: CodeRunRequest,
+    user: Optional[dict] = Depends(get_optional_user)
+):
+    """
+    Execute code and stream output as Server-Sent Events (no auth required)
+    Sends `stdout`/`stderr` events with {"data": ...} as output is produced and a
+    final `result` event shaped like CodeRunResponse. Disconnecting cancels the run.
+    """
+    async def events():
+        set_requester(user)
+        stream = stream_code(
+            code=request.code,
+            language=request.language,
+            user_input=request.input or ""
+        )
+        try:
+            async for event in stream:
+                event_type = event.pop("type")
+                if event_type == "result":
+                    event = CodeRunResponse(**event).model_dump()
+                yield f"event: {event_type}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            await stream.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post(
+    "/trace",
+    response_model=CodeTraceResponse,
+    dependencies=[Depends(admit_execution)]
+)
+async def execute_traced(
+    request: CodeTraceRequest,
+    user: Optional[dict] = Depends(get_optional_user)
+):
+    """
+    Execute Python code while recording line, call and return events with
+    variable changes (no auth required). Returns the run's result and a trace
+    id; fetch steps in ranges from /api/code/traces/{trace_id}.
+    """
+    set_requester(user)
+    result = await trace_code(
+        code=request.code,
+        user_input=request.input or "",
+        max_steps=request.max_steps or 0,
+        snapshot_every=request.snapshot_every
+    )
+    trace = result.pop("trace")
+    summary = None
+    trace_id = get_trace_store().put(trace) if trace is not None else None
+    if trace_id:
+        summary = TraceSummary(
+            trace_id=trace_id,
+            steps=len(trace),
+            truncated=trace.truncated,
+            url=f"/api/code/traces/{trace_id}"
+        )
+    return CodeTraceResponse(**result, trace=summary)
+
+
+@router.get("/traces/{trace_id}", response_model=TraceRangeResponse)
+async def get_trace_range(
+    trace_id: str,
+    start: int = Query(0, ge=0),
+    count: int = Query(100, ge=1, le=1000)
+):
+    """A range of steps from a recorded trace, so clients can step through it lazily"""
+    trace = get_trace_store().get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found or expired")
+    start = min(start, len(trace))
+    end = min(start + count, len(trace))
+    return TraceRangeResponse(
+        trace_id=trace_id,
+        start=start,
+        total=len(trace),
+        truncated=trace.truncated,
+        variables=trace.variables_before(start),
+        steps=[TraceStep(**trace.step(index)) for index in range(start, end)]
+    )
+
+
+@router.websocket("/session")
+async def repl_session(
+    websocket: WebSocket,
+    token: str = Query(..., description="JWT access token"),
+    session_id: Optional[str] = Query(None, description="Reconnect to this session")
+):
+    """
+    Persistent Python session over a WebSocket (auth required)
+    Cells run one after another in the same interpreter, keeping its state.
+    The server first sends {"type": "session", "session_id": ...}. Clients send
+    {"type": "run", "code": ...}, {"type": "input", "data": ...} (an empty string
+    is end-of-file) and {"type": "interrupt"}; the server answers with
+    `stdout`/`stderr`/`input_request` events and a `result` per cell, and
+    {"type": "closed", "reason": ...} when the session ends. A disconnected
+    session can be resumed with `session_id` until it is closed for being idle.
+    """
+    await websocket.accept()
+    user = user_from_token(token)
+    if not user:
+        await websocket.close(code=1008, reason="Invalid or expired token")
+        return
+    manager = get_repl_manager()
+    if not manager:
+        await websocket.close(code=1008, reason="Sessions are disabled")
+        return
+    if get_admission().execution_retry_after() is not None:
+        await websocket.close(code=1013, reason="Server is busy. Please try again shortly.")
+        return
+    
+    if session_id:
+        session = manager.attach(session_id, user["id"])
+        if not session:
+            await websocket.close(code=1008, reason="Session not found or in use")
+            return
+    else:
+        session = await manager.open(user["id"])
+        if not session:
+            await websocket.close(code=1013, reason="Too many sessions are in use. Please try again shortly.")
+            return
+    
+    set_requester(user)
+    try:
+        await websocket.send_json({"type": "session", "session_id": session.id, "resumed": bool(session_id)})
+        await _serve_session(websocket, session)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.detach(session)
+
+
+async def _serve_session(websocket: WebSocket, session: ReplSession) -> None:
+    """Relay client messages to the session and its events back until either side goes away"""
+    cell: Optional[asyncio.Task] = None
+    
+    async def run_cell(code: str) -> None:
+        events = session.run_cell(code)
+        try:
+            async for event in events:
+                await websocket.send_json(event)
+        finally:
+            await events.aclose()
+    
+    async def report_close() -> None:
+        await session.closed.wait()
+        if cell:
+            # Let the cell's result (which says why) go out first
+            await asyncio.gather(cell, return_exceptions=True)
+        await websocket.send_json({"type": "closed", "reason": session.closed_reason})
+        await websocket.close()
+    
+    watcher = asyncio.ensure_future(report_close())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            kind = message.get("type")
+            if kind == "run":
+                if cell and not cell.done():
+                    await websocket.send_json({"type": "error", "detail": "A cell is already running"})
+                    continue
+                cell = asyncio.ensure_future(run_cell(str(message.get("code") or "")))
+            elif kind == "input":
+                session.send_input(str(message.get("data") or ""))
+            elif kind == "interrupt":
+                session.interrupt()
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown message type: {kind}"})
+    finally:
+        watcher.cancel()
+        if cell:
+            # Closes the session if the cell was still running
+            cell.cancel()
+            await asyncio.gather(cell, return_exceptions=True)
+
+
+@router.post("/run-batch", response_model=BatchRunResponse)
+async def execute_batch(
+    request: BatchRunRequest,
+    user: Optional[dict] = Depends(get_optional_user)
+):
+    """Run one program against many test inputs in parallel (no auth required)"""
+    # Admitted per case, so a large batch weighs on the queue limit like that many
+    # runs; batches always run on this process's engine, even in queue mode
+    _admit_runs(len(request.cases), inline=True)
+    set_requester(user)
+    start_time = time.time()
+    results = await run_batch(
+        code=request.code,
+        language=request.language,
+        cases=[case.model_dump() for case in request.cases],
+        stop_on_failure=request.stop_on_failure
+    )
+    case_results = [
+        BatchCaseResult(
+            index=index,
+            passed=result["passed"],
+            output=result["output"],
+            compilation_result=result["compilation_result"],
+            execution_time=result["execution_time"],
+            compile_time=result.get("compile_time"),
+            status=result["status"],
+            truncated=result.get("truncated", False),
+            output_bytes=result.get("output_bytes", 0),
+            cached=result.get("cached", False)
+        )
+        for index, result in enumerate(results)
+    ]
+    skipped = sum(1 for r in case_results if r.status == "skipped")
+    passed = sum(1 for r in case_results if r.passed)
+    return BatchRunResponse(
+        results=case_results,
+        passed=passed,
+        failed=len(case_results) - passed - skipped,
+        skipped=skipped,
+        total_time=round(time.time() - start_time, 3)
     )
 
 
-@router.post("/run-and-save", response_model=CodeRunAndSaveResponse)
+@router.post(
+    "/run-and-save",
+    response_model=CodeRunAndSaveResponse,
+    responses={202: {"model": JobAcceptedResponse}},
+    dependencies=[Depends(admit_execution)]
+)
 async def execute_and_save(
     request: CodeRunAndSaveRequest,
     user: dict = Depends(get_current_user)
@@ -40,58 +341,41 @@ async def execute_and_save(
     """
     Execute code, generate hints if error, and save to user's history.
     Requires authentication.
+    In queue mode, returns 202 with a job to poll; hints and saving happen when the run finishes.
     """
-    # Run the code
-    result = run_code(
-        code=request.code,
-        language=request.language,
-        user_input=request.input or ""
-    )
-    
-    # Generate hints if there's an error and hints are requested
-    hints_data = None
-    if not result["success"] and request.get_hints:
-        error_msg = result.get("compilation_result") or result.get("output") or ""
-        hints_data = generate_hints(
+    manager = get_job_manager()
+    if manager:
+        async def on_done(result: dict) -> dict:
+            # The run happened in a worker; hints and saving get the request's budget from here
+            set_deadline(settings.REQUEST_DEADLINE_SECONDS)
+            return (await _hint_and_save(request, user, result, request.get_hints)).model_dump()
+        
+        job = manager.submit(
             code=request.code,
             language=request.language,
-            error=error_msg,
-            expected_output=request.expected_output or ""
+            user_input=request.input or "",
+            owner_id=user["id"],
+            on_done=on_done,
+            user=user
         )
+        return _job_accepted(job)
     
-    # Determine status for submission
-    status = "success" if result["success"] else "error"
-    error_type = hints_data.get("error_type") if hints_data else None
-    hints_list = hints_data.get("hints") if hints_data else None
-    root_cause = hints_data.get("root_cause") if hints_data else None
-    
-    # Save submission to history
-    submission = create_submission(
-        user_id=user["id"],
+    # Run the code
+    set_requester(user)
+    set_deadline(settings.REQUEST_DEADLINE_SECONDS)
+    result = await run_code(
         code=request.code,
         language=request.language,
-        output=result.get("output", ""),
-        status=status,
-        execution_time=result.get("execution_time", 0),
-        error_type=error_type,
-        hints=hints_list,
-        root_cause=root_cause
-    )
-    
-    return CodeRunAndSaveResponse(
-        success=result["success"],
-        output=result["output"],
-        compilation_result=result["compilation_result"],
-        execution_time=result["execution_time"],
-        status=result["status"],
-        submission_id=submission["id"],
-        error_type=error_type,
-        hints=hints_list,
-        root_cause=root_cause
+        user_input=request.input or ""
     )
+    return await _hint_and_save(request, user, result, request.get_hints)
 
 
-@router.post("/debug", response_model=CodeRunAndSaveResponse)
+@router.post(
+    "/debug",
+    response_model=CodeRunAndSaveResponse,
+    dependencies=[Depends(admit_execution)]
+)
 async def debug_code(
     request: CodeRunAndSaveRequest,
     user: Optional[dict] = Depends(get_optional_user)
@@ -102,31 +386,46 @@ async def debug_code(
     If authenticated, saves to history.
     """
     # Run the code
-    result = run_code(
+    set_requester(user)
+    set_deadline(settings.REQUEST_DEADLINE_SECONDS)
+    result = await run_code(
         code=request.code,
         language=request.language,
         user_input=request.input or ""
     )
-    
-    # Generate hints if there's an error
+    return await _hint_and_save(request, user, result, True)
+
+
+async def _hint_and_save(
+    request: CodeRunAndSaveRequest,
+    user: Optional[dict],
+    result: dict,
+    hints_on_error: bool
+) -> CodeRunAndSaveResponse:
+    """
+    Generate hints for a failed run and save it to the user's history (if signed in)
+    Hints stay within the request's deadline, if set; saving is a local write
+    and always happens.
+    """
+    # Generate hints if there's an error and hints are requested
     hints_data = None
-    if not result["success"]:
+    if not result["success"] and hints_on_error:
         error_msg = result.get("compilation_result") or result.get("output") or ""
-        hints_data = generate_hints(
+        hints_data = await request_hints(
             code=request.code,
             language=request.language,
             error=error_msg,
             expected_output=request.expected_output or ""
         )
     
-    # Prepare response data
+    # Determine status for submission
     status = "success" if result["success"] else "error"
     error_type = hints_data.get("error_type") if hints_data else None
     hints_list = hints_data.get("hints") if hints_data else None
     root_cause = hints_data.get("root_cause") if hints_data else None
     submission_id = None
     
-    # Save to history if authenticated
+    # Save submission to history
     if user:
         submission = create_submission(
             user_id=user["id"],
@@ -135,9 +434,12 @@ async def debug_code(
             output=result.get("output", ""),
             status=status,
             execution_time=result.get("execution_time", 0),
+            error=result.get("compilation_result") if not result["success"] else None,
             error_type=error_type,
             hints=hints_list,
-            root_cause=root_cause
+            root_cause=root_cause,
+            resource_usage=result.get("resource_usage"),
+            cached=result.get("cached", False)
         )
         submission_id = submission["id"]
     
@@ -146,9 +448,86 @@ async def debug_code(
         output=result["output"],
         compilation_result=result["compilation_result"],
         execution_time=result["execution_time"],
+        compile_time=result.get("compile_time"),
         status=result["status"],
+        truncated=result.get("truncated", False),
+        output_bytes=result.get("output_bytes", 0),
+        resource_usage=result.get("resource_usage"),
+        diagnostics=result.get("diagnostics"),
+        cached=result.get("cached", False),
         submission_id=submission_id,
         error_type=error_type,
         hints=hints_list,
         root_cause=root_cause
     )
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=30, description="Seconds to wait for the job to finish"),
+    user: Optional[dict] = Depends(get_optional_user)
+):
+    """Status and result of a queued run (queue mode). Jobs from /run-and-save are visible to their owner only."""
+    manager = get_job_manager()
+    job = manager.get(job_id) if manager else None
+    if job and job["owner_id"] and (not user or user["id"] != job["owner_id"]):
+        job = None
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if wait and job["status"] in ("queued", "running"):
+        job = await manager.wait(job_id, wait) or job
+    
+    return JobStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        result=CodeRunAndSaveResponse(**job["result"]) if job["result"] else None
+    )
+
+
+def _job_accepted(job: dict) -> JSONResponse:
+    poll_url = f"/api/code/jobs/{job['id']}"
+    return JSONResponse(
+        status_code=202,
+        content=JobAcceptedResponse(job_id=job["id"], poll_url=poll_url).model_dump(),
+        headers={"Location": poll_url}
+    )
+
+
+@router.get("/stats", response_model=ExecutionStatsResponse)
+async def execution_stats():
+    """Execution engine queue depth, wait times, worker and sandbox pools, cache and coalescing usage"""
+    backend = get_sandbox_backend()
+    pool = get_python_pool() if backend.name == "local" else None
+    sandboxes = backend.stats()
+    java_pool = get_java_pool() if java_available() else None
+    jobs = get_job_manager()
+    cache = get_result_cache()
+    flights = get_execution_flights()
+    sessions = get_repl_manager()
+    return ExecutionStatsResponse(
+        executor=ExecutorStats(**get_engine().stats()),
+        sandbox_backend=backend.name,
+        python_pool=WorkerPoolStats(**pool.stats()) if pool else None,
+        sandbox_pool=SandboxPoolStats(**sandboxes) if sandboxes else None,
+        java_pool=WorkerPoolStats(**java_pool.stats()) if java_pool else None,
+        result_cache=ResultCacheStats(**cache.stats()) if cache else None,
+        artifact_cache=ArtifactCacheStats(**get_artifact_cache().stats()),
+        job_queue=JobQueueStats(**jobs.stats()) if jobs else None,
+        single_flight=SingleFlightStats(**flights.stats()) if flights else None,
+        repl_sessions=ReplSessionStats(**sessions.stats()) if sessions else None
+    )
+
+
+@router.get("/stats/users", response_model=UserQueueStatsResponse)
+async def user_queue_stats(user: dict = Depends(get_current_user)):
+    """Per-user execution queue waits, busiest users first (instructors and admins only)"""
+    if user.get("role") not in ("instructor", "admin"):
+        raise HTTPException(status_code=403, detail="Instructor or admin role required")
+    return UserQueueStatsResponse(
+        users=[UserQueueStats(**row) for row in get_engine().flow_stats()]
+    )
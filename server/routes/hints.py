@@ -1,17 +1,40 @@
 """
 AI Hints routes
 """
-from fastapi import APIRouter
-from models import HintRequest, HintResponse, ConceptReference
-from services.hint_service import generate_hints
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+from typing import Optional
+from config import settings
+from models import HintRequest, HintResponse, ConceptReference, HintLibraryStats, HintLibraryStatus
+from routes.auth import get_current_user
+from services.admission import get_admission
+from services.hint_library import get_hint_library
+from services.hint_service import rebuild_hint_library, request_hints, stream_hints
+from services.llm_client import get_llm_client
 
 router = APIRouter()
 
+# Hint library rebuild in progress, if any
+_rebuild: Optional[asyncio.Task] = None
 
-@router.post("/get", response_model=HintResponse)
+
+async def admit_hints():
+    """Shed new hint requests with 503 + Retry-After while LLM calls are at their limit"""
+    retry_after = get_admission().hints_retry_after()
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=503,
+            detail="Hint service is busy. Please try again shortly.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+@router.post("/get", response_model=HintResponse, dependencies=[Depends(admit_hints)])
 async def get_hints(request: HintRequest):
     """Get AI-powered debugging hints"""
-    result = generate_hints(
+    result = await request_hints(
         code=request.code,
         language=request.language,
         error=request.error or "",
@@ -22,5 +45,78 @@ async def get_hints(request: HintRequest):
         hints=result["hints"],
         root_cause=result["root_cause"],
         concept_references=[ConceptReference(**ref) for ref in result["concept_references"]],
-        minimal_patch=result["minimal_patch"]
+        minimal_patch=result["minimal_patch"],
+        prompt_tokens=result.get("prompt_tokens")
+    )
+
+
+@router.post("/stream", dependencies=[Depends(admit_hints)])
+async def get_hints_stream(request: HintRequest):
+    """
+    Get hints as Server-Sent Events, each as soon as the model has written it
+    Sends a `hint` event with {"index": ..., "hint": ...} per hint, from vague to
+    specific, then a final `result` event shaped like HintResponse.
+    """
+    async def events():
+        stream = stream_hints(
+            code=request.code,
+            language=request.language,
+            error=request.error or "",
+            expected_output=request.expected_output or ""
+        )
+        try:
+            async for event in stream:
+                event_type = event.pop("type")
+                if event_type == "result":
+                    event = HintResponse(**event).model_dump()
+                yield f"event: {event_type}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            await stream.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
+
+
+def _library_status() -> HintLibraryStatus:
+    library = get_hint_library()
+    return HintLibraryStatus(
+        enabled=bool(settings.HINT_LIBRARY_PATH),
+        rebuilding=_rebuild is not None and not _rebuild.done(),
+        library=HintLibraryStats(**library.stats()) if library else None
+    )
+
+
+@router.get("/library", response_model=HintLibraryStatus)
+async def hint_library_status():
+    """Version and counters of the precomputed hint library"""
+    return _library_status()
+
+
+@router.post("/library/rebuild", status_code=202, response_model=HintLibraryStatus)
+async def rebuild_library(user: dict = Depends(get_current_user)):
+    """
+    Regenerate the hint library from the most frequent errors in stored
+    submissions (instructors and admins only)
+    Runs in the background; the new version is served once it is saved.
+    """
+    global _rebuild
+    if user.get("role") not in ("instructor", "admin"):
+        raise HTTPException(status_code=403, detail="Instructor or admin role required")
+    if not settings.HINT_LIBRARY_PATH:
+        raise HTTPException(status_code=409, detail="Hint library is disabled (HINT_LIBRARY_PATH is empty)")
+    if get_llm_client() is None:
+        raise HTTPException(status_code=503, detail="No LLM is configured to generate hints")
+    if _rebuild is not None and not _rebuild.done():
+        raise HTTPException(status_code=409, detail="A rebuild is already running")
+    
+    _rebuild = asyncio.create_task(rebuild_hint_library())
+    _rebuild.add_done_callback(_report_rebuild)
+    return _library_status()
+
+
+def _report_rebuild(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Hint library rebuild failed: {task.exception()!r}")
@@ -29,6 +29,7 @@ async def create_new_submission(
         output=data.output,
         status=data.status,
         execution_time=data.execution_time,
+        error=data.error,
         error_type=data.error_type,
         hints=data.hints,
         root_cause=data.root_cause
@@ -0,0 +1,254 @@
+import java.io.ByteArrayOutputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.io.StringWriter;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.lang.reflect.Modifier;
+import java.net.URI;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import java.util.Arrays;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.Locale;
+import java.util.regex.Matcher;
+import java.util.regex.Pattern;
+import javax.tools.FileObject;
+import javax.tools.ForwardingJavaFileManager;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileManager;
+import javax.tools.JavaFileObject;
+import javax.tools.SimpleJavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+
+/**
+ * Warm Java sandbox worker (started by services/java_runtime.py).
+ *
+ * Starts the JVM and warms up javac ahead of time, then reads a single job from
+ * stdin: the source length in bytes, a newline, then the source. The source is
+ * compiled in memory and its main class (the public class, or Main) is run from
+ * a fresh class loader; the rest of stdin is the program's input. Each worker
+ * runs exactly one program and then exits.
+ *
+ * The last argument is a file descriptor; when the JVM exits the worker writes
+ * a JSON report there: whether compilation failed, compile time and resource
+ * usage.
+ */
+public final class JavaWorker {
+    private static final Pattern PUBLIC_CLASS =
+        Pattern.compile("public\\s+(?:final\\s+|abstract\\s+)*class\\s+([A-Za-z_$][\\w$]*)");
+    private static final String WARM_UP_SOURCE =
+        "public class Main { public static void main(String[] args) { System.out.println(args.length); } }";
+
+    private static String reportPath;
+    private static boolean compileError;
+    private static double compileTime;
+    private static long[] baseline;
+
+    public static void main(String[] args) throws Exception {
+        reportPath = args.length > 0 ? "/proc/self/fd/" + args[args.length - 1] : null;
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+
+        // Pay for loading javac now, not when the student's program arrives
+        compile(compiler, "Main", WARM_UP_SOURCE, new StringWriter());
+
+        String header = readLine(System.in);
+        if (header == null) {
+            // Pool shut down before a job arrived
+            return;
+        }
+        byte[] sourceBytes = System.in.readNBytes(Integer.parseInt(header.trim()));
+        String source = new String(sourceBytes, StandardCharsets.UTF_8);
+        baseline = procCounters();
+        Runtime.getRuntime().addShutdownHook(new Thread(JavaWorker::writeReport));
+
+        String className = mainClassName(source);
+        StringWriter diagnostics = new StringWriter();
+        long compileStart = System.nanoTime();
+        Map<String, byte[]> classes = compile(compiler, className, source, diagnostics);
+        compileTime = Math.round((System.nanoTime() - compileStart) / 1e6) / 1000.0;
+        if (classes == null) {
+            compileError = true;
+            System.err.print(diagnostics);
+            System.err.flush();
+            System.exit(1);
+        }
+
+        Method main;
+        try {
+            Class<?> mainClass = new MemoryClassLoader(classes).loadClass(className);
+            main = mainClass.getMethod("main", String[].class);
+            if (!Modifier.isStatic(main.getModifiers())) {
+                throw new NoSuchMethodException();
+            }
+        } catch (ClassNotFoundException | NoSuchMethodException e) {
+            System.err.println("Error: Main method not found in class " + className
+                + ", please define the main method as:\n   public static void main(String[] args)");
+            System.exit(1);
+            return;
+        }
+
+        try {
+            main.invoke(null, (Object) new String[0]);
+        } catch (InvocationTargetException e) {
+            // Print it the way the java launcher would, without this worker's frames
+            Throwable cause = e.getCause();
+            StackTraceElement[] frames = cause.getStackTrace();
+            int end = frames.length;
+            for (int i = 0; i < frames.length; i++) {
+                String frameClass = frames[i].getClassName();
+                if (frameClass.startsWith("jdk.internal.reflect.") || frameClass.startsWith("java.lang.reflect.")) {
+                    end = i;
+                    break;
+                }
+            }
+            cause.setStackTrace(Arrays.copyOf(frames, end));
+            System.err.print("Exception in thread \"main\" ");
+            cause.printStackTrace();
+            System.exit(1);
+        }
+        // Returning lets the JVM exit once the program's own threads finish, as `java Main` would
+    }
+
+    private static String mainClassName(String source) {
+        Matcher matcher = PUBLIC_CLASS.matcher(source);
+        return matcher.find() ? matcher.group(1) : "Main";
+    }
+
+    private static String readLine(InputStream in) throws IOException {
+        ByteArrayOutputStream line = new ByteArrayOutputStream();
+        int b;
+        while ((b = in.read()) != -1 && b != '\n') {
+            line.write(b);
+        }
+        if (b == -1 && line.size() == 0) {
+            return null;
+        }
+        return line.toString(StandardCharsets.US_ASCII);
+    }
+
+    /** Compiles one source file in memory; returns class name to bytecode, or null on errors */
+    private static Map<String, byte[]> compile(
+        JavaCompiler compiler, String className, String source, StringWriter diagnostics
+    ) throws IOException {
+        Map<String, ByteArrayOutputStream> output = new HashMap<>();
+        StandardJavaFileManager standard = compiler.getStandardFileManager(null, Locale.ROOT, StandardCharsets.UTF_8);
+        JavaFileManager fileManager = new ForwardingJavaFileManager<JavaFileManager>(standard) {
+            @Override
+            public JavaFileObject getJavaFileForOutput(
+                Location location, String name, JavaFileObject.Kind kind, FileObject sibling
+            ) {
+                URI uri = URI.create("mem:///" + name.replace('.', '/') + kind.extension);
+                return new SimpleJavaFileObject(uri, kind) {
+                    @Override
+                    public OutputStream openOutputStream() {
+                        ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+                        output.put(name, bytes);
+                        return bytes;
+                    }
+                };
+            }
+        };
+        String fileName = className + ".java";
+        JavaFileObject file = new SimpleJavaFileObject(URI.create("string:///" + fileName), JavaFileObject.Kind.SOURCE) {
+            @Override
+            public CharSequence getCharContent(boolean ignoreEncodingErrors) {
+                return source;
+            }
+
+            @Override
+            public String getName() {
+                return fileName;
+            }
+        };
+        boolean ok = compiler.getTask(
+            diagnostics, fileManager, null, List.of("-g", "-encoding", "UTF-8"), null, List.of(file)
+        ).call();
+        fileManager.close();
+        if (!ok) {
+            return null;
+        }
+        Map<String, byte[]> classes = new HashMap<>();
+        output.forEach((name, bytes) -> classes.put(name, bytes.toByteArray()));
+        return classes;
+    }
+
+    private static final class MemoryClassLoader extends ClassLoader {
+        private final Map<String, byte[]> classes;
+
+        MemoryClassLoader(Map<String, byte[]> classes) {
+            super(ClassLoader.getSystemClassLoader());
+            this.classes = classes;
+        }
+
+        @Override
+        protected Class<?> findClass(String name) throws ClassNotFoundException {
+            byte[] bytes = classes.get(name);
+            if (bytes == null) {
+                throw new ClassNotFoundException(name);
+            }
+            return defineClass(name, bytes, 0, bytes.length);
+        }
+    }
+
+    /** utime, stime (clock ticks), voluntary and involuntary context switches from /proc */
+    private static long[] procCounters() {
+        long[] counters = new long[4];
+        try {
+            String stat = new String(Files.readAllBytes(Paths.get("/proc/self/stat")), StandardCharsets.US_ASCII);
+            // Fields after the command name, which is in parentheses and may contain spaces
+            String[] fields = stat.substring(stat.lastIndexOf(')') + 2).split(" ");
+            counters[0] = Long.parseLong(fields[11]);
+            counters[1] = Long.parseLong(fields[12]);
+            for (String line : Files.readAllLines(Paths.get("/proc/self/status"))) {
+                if (line.startsWith("voluntary_ctxt_switches:")) {
+                    counters[2] = Long.parseLong(line.split("\\s+")[1]);
+                } else if (line.startsWith("nonvoluntary_ctxt_switches:")) {
+                    counters[3] = Long.parseLong(line.split("\\s+")[1]);
+                }
+            }
+        } catch (IOException | RuntimeException e) {
+            // Not Linux: report zeros
+        }
+        return counters;
+    }
+
+    private static long peakRssKb() {
+        try {
+            for (String line : Files.readAllLines(Paths.get("/proc/self/status"))) {
+                if (line.startsWith("VmHWM:")) {
+                    return Long.parseLong(line.split("\\s+")[1]);
+                }
+            }
+        } catch (IOException | RuntimeException e) {
+            // Not Linux
+        }
+        return 0;
+    }
+
+    private static void writeReport() {
+        if (reportPath == null) {
+            return;
+        }
+        long[] now = procCounters();
+        double ticks = 100.0;  // USER_HZ on Linux
+        String report = String.format(Locale.ROOT,
+            "{\"compile_error\": %b, \"compile_time\": %.3f, \"resource_usage\": {"
+                + "\"cpu_user\": %.4f, \"cpu_system\": %.4f, \"max_rss_kb\": %d, "
+                + "\"voluntary_context_switches\": %d, \"involuntary_context_switches\": %d}}",
+            compileError, compileTime,
+            (now[0] - baseline[0]) / ticks, (now[1] - baseline[1]) / ticks, peakRssKb(),
+            now[2] - baseline[2], now[3] - baseline[3]);
+        try (FileOutputStream out = new FileOutputStream(reportPath)) {
+            out.write(report.getBytes(StandardCharsets.US_ASCII));
+        } catch (IOException e) {
+            // Server stopped listening
+        }
+    }
+}
@@ -0,0 +1,122 @@
+"""
+Admission control
+Rejects new execution and hint work early when the node is already saturated,
+instead of letting requests queue until clients time out. Decisions use the
+execution engine's measured queue latency and the number of in-flight LLM calls.
+"""
+import math
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from config import settings
+from services.executor import get_engine
+from services.job_queue import get_job_manager
+from services.llm_client import get_llm_client
+from services.single_flight import get_hint_flights
+
+# Bounds for the Retry-After hint given to rejected clients
+MIN_RETRY_AFTER_SECONDS = 1
+MAX_RETRY_AFTER_SECONDS = 30
+
+
+class AdmissionController:
+    """Admit-or-shed decisions plus counters for /health and monitoring"""
+
+    def __init__(self):
+        self.hints_in_flight = 0
+        self.rejected_executions = 0
+        self.rejected_hints = 0
+
+    def execution_retry_after(self, runs: int = 1, inline: bool = False) -> Optional[int]:
+        """
+        None to admit a request, or seconds the client should wait before retrying
+        `runs` is how many programs the request will run (a batch's case count);
+        each counts against the queue limit as if it were already queued.
+        `inline` requests run on this process's engine even in queue mode
+        (batches), so they are judged by its queue rather than the job queue.
+        """
+        reason = self._execution_overload(runs, inline)
+        if reason is None:
+            return None
+        self.rejected_executions += 1
+        return self._drain_seconds(runs)
+
+    def hints_retry_after(self) -> Optional[int]:
+        """None to admit a hint request, or seconds the client should wait"""
+        if self.hints_in_flight < settings.ADMISSION_MAX_HINT_CALLS:
+            return None
+        self.rejected_hints += 1
+        return MIN_RETRY_AFTER_SECONDS * 2
+
+    @contextmanager
+    def hint_call(self) -> Iterator[None]:
+        """Count an LLM call as in flight for the duration of the block"""
+        self.hints_in_flight += 1
+        try:
+            yield
+        finally:
+            self.hints_in_flight -= 1
+
+    def status(self) -> dict:
+        """Readiness and remaining capacity, for load balancers"""
+        engine = get_engine().stats()
+        hint_flights = get_hint_flights()
+        llm = get_llm_client()
+        reason = self._execution_overload()
+        if reason is None and self.hints_in_flight >= settings.ADMISSION_MAX_HINT_CALLS:
+            reason = "hint calls at limit"
+        return {
+            "ready": reason is None,
+            "reason": reason,
+            "executions_in_flight": engine["in_flight"],
+            "executions_queued": engine["queued"],
+            "execution_slots": engine["max_concurrency"],
+            "queue_wait_ms": engine["wait_ms_ewma"],
+            "hints_in_flight": self.hints_in_flight,
+            "hint_call_limit": settings.ADMISSION_MAX_HINT_CALLS,
+            "hints_coalesced": hint_flights.coalesced if hint_flights else 0,
+            "hint_llm": llm.stats() if llm else None,
+            "rejected_executions": self.rejected_executions,
+            "rejected_hints": self.rejected_hints
+        }
+
+    def _execution_overload(self, runs: int = 1, inline: bool = False) -> Optional[str]:
+        """Why a request adding `runs` runs should be shed right now, or None"""
+        jobs = None if inline else get_job_manager()
+        if jobs:
+            # Queue mode: the backlog lives in the broker, not in this process
+            stats = jobs.stats()
+            limit = stats["workers"] * jobs.worker_concurrency * settings.ADMISSION_MAX_QUEUE_FACTOR
+            if stats["queued"] + min(runs, limit) > limit:
+                return "job queue full"
+            return None
+
+        engine = get_engine().stats()
+        limit = engine["max_concurrency"] * settings.ADMISSION_MAX_QUEUE_FACTOR
+        # A batch larger than the whole queue is still admitted when the queue is empty
+        if engine["queued"] + min(runs, limit) > limit:
+            return "execution queue full"
+        # Latency-driven: only while there is a backlog, so the average of an
+        # earlier burst doesn't keep shedding once the queue has drained
+        if engine["queued"] > 0 and engine["wait_ms_ewma"] > settings.ADMISSION_MAX_QUEUE_WAIT_MS:
+            return "execution queue wait too long"
+        return None
+
+    def _drain_seconds(self, runs: int = 1) -> int:
+        """Rough time for the current backlog plus `runs` new runs to clear, from measured run times"""
+        engine = get_engine()
+        stats = engine.stats()
+        backlog = stats["queued"] + stats["in_flight"] + runs
+        seconds = backlog * engine.service_time_ewma / max(stats["max_concurrency"], 1)
+        return min(MAX_RETRY_AFTER_SECONDS, max(MIN_RETRY_AFTER_SECONDS, math.ceil(seconds)))
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission() -> AdmissionController:
+    """Get the shared admission controller"""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
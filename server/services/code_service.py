@@ -1,90 +1,665 @@
 """
-Code execution service - Python only (simplified)
-Uses subprocess with timeout for safe execution
+Code execution service - Python, C, C++ and Java
+Uses subprocesses with CPU-time and wall-clock limits for safe execution. Python and Java runs are served
+from warm worker pools with the source sent over stdin; C/C++ programs are
+compiled once and run from the compiled-artifact cache.
 """
-import subprocess
-import tempfile
+import asyncio
+import codecs
 import os
+import signal
+import sys
 import time
-import shutil
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
+from config import settings
+from services.deadline import current_deadline
+from services.executor import current_requester, get_engine
+from services.java_runtime import java_available, lease_java_worker
+from services.native_code import compiled, is_compiled_language, launch_binary
+from services.output_buffer import OutputCapture
+from services.precheck import analyze, syntax_error_result
+from services.resource_limits import TierLimits, current_limits, tier_limits
+from services.result_cache import get_result_cache, is_deterministic, make_key
+from services.single_flight import flight_key, get_execution_flights
+from services.trace_format import TRACE_FILENAME, Trace
+from services.sandbox_backend import get_sandbox_backend, host_runtimes_allowed, lease_python_sandbox
+from services.worker_pool import prepare_source, prepare_traced_source
 
-def run_code(code: str, language: str = "python", user_input: str = "") -> dict:
+# Streaming: bytes read per pipe read, and chunks buffered ahead of a slow client
+STREAM_CHUNK_BYTES = 4096
+STREAM_QUEUE_CHUNKS = 16
+
+
+async def run_code(code: str, language: str = "python", user_input: str = "") -> dict:
     """
-    Execute Python code in a sandboxed environment
+    Execute code in a sandboxed environment
     Returns: dict with success, output, compilation_result, execution_time, status
+    (plus compile_time for compiled languages)
+    Concurrent runs of the same code and input share one execution; it is
+    scheduled as the first caller's run, with the tier's time limits. A caller
+    with a request deadline waits for it only as long as the deadline allows.
     """
-    # For now, only Python is supported
-    if language != "python":
-        return {
-            "success": False,
-            "output": "",
-            "compilation_result": f"Language '{language}' is not yet supported. Currently only Python is available.",
-            "execution_time": 0,
-            "status": "compilation_error"
-        }
+    flights = get_execution_flights()
+    if not flights:
+        return await _run_code(code, language, user_input)
+    # Tiers have different time limits, so only same-tier runs are shared
+    key = flight_key(language, code, user_input, current_requester().tier)
+    shared = flights.do(key, lambda: _run_code(code, language, user_input))
+    if current_deadline() is None:
+        return await shared
+    limits = current_limits()
+    start_time = time.time()
+    try:
+        return await asyncio.wait_for(shared, limits.wall_seconds)
+    except asyncio.TimeoutError:
+        return _timeout_result(limits, _new_capture(), round(time.time() - start_time, 3))
+
+
+async def trace_code(code: str, user_input: str = "", max_steps: int = 0, snapshot_every: int = 1) -> dict:
+    """
+    Run a Python program while recording its execution (see tracer.py)
+    Returns run_code's result plus `trace`: a Trace, or None if none was
+    recorded (e.g. a syntax error). `max_steps` is capped at TRACE_MAX_STEPS.
+    Traced runs are never cached or shared.
+    """
+    analysis = await _static_check(code)
+    if analysis and analysis["syntax_error"]:
+        return dict(syntax_error_result(analysis), trace=None)
     
-    temp_dir = tempfile.mkdtemp(prefix="tracecode_")
+    max_steps = min(max_steps or settings.TRACE_MAX_STEPS, settings.TRACE_MAX_STEPS)
+    traces: List[Trace] = []
     
-    try:
-        # Create source file
-        source_file = os.path.join(temp_dir, "main.py")
-        
-        with open(source_file, "w", encoding="utf-8") as f:
-            f.write(code)
-        
-        # Run Python code
-        start_time = time.time()
+    def collect(worker) -> None:
         try:
-            result = subprocess.run(
-                ["python", source_file],
-                input=user_input,
-                capture_output=True,
-                text=True,
-                timeout=10,  # 10 second timeout
-                cwd=temp_dir
-            )
-            execution_time = round(time.time() - start_time, 3)
-            
-            if result.returncode != 0:
-                # There was an error
-                error_output = result.stderr or result.stdout
-                return {
-                    "success": False,
-                    "output": result.stdout,
-                    "compilation_result": error_output,
-                    "execution_time": execution_time,
-                    "status": "runtime_error"
-                }
+            with open(os.path.join(worker.scratch_dir, TRACE_FILENAME), "rb") as f:
+                blob = f.read(settings.TRACE_MAX_BYTES + 1)
+            traces.append(Trace.decode(blob, settings.TRACE_MAX_BYTES))
+        except (OSError, ValueError):
+            # Killed before recording stopped, or the program tampered with the file
+            pass
+    
+    stdin_data = prepare_traced_source(code, max_steps, snapshot_every) + user_input.encode("utf-8")
+    result = await _execute(lease_python_sandbox, stdin_data, collect)
+    return dict(_with_diagnostics(result, analysis), trace=traces[0] if traces else None)
+
+
+async def _run_code(code: str, language: str, user_input: str) -> dict:
+    if _runs_on_host(language) and not host_runtimes_allowed():
+        return _host_runtime_refused(language)
+    if is_compiled_language(language):
+        async with compiled(code, language) as build:
+            if build["error"] is not None:
+                return _compile_failed_result(build)
+            result = await _execute(lambda: launch_binary(build["key"]), user_input.encode("utf-8"))
+        return dict(result, compile_time=build["compile_time"])
+    
+    if language == "java":
+        if not java_available():
+            return _java_missing_result()
+        return await _execute(lease_java_worker, prepare_source(code) + user_input.encode("utf-8"))
+    
+    if language != "python":
+        return _unsupported_language(language)
+    
+    # Syntax errors are answered without starting an interpreter
+    analysis = await _static_check(code)
+    if analysis and analysis["syntax_error"]:
+        return syntax_error_result(analysis)
+    
+    version = await _cacheable_version(code)
+    result = await _run_python_case(code, prepare_source(code), user_input, version)
+    return _with_diagnostics(result, analysis)
+
+
+async def run_batch(
+    code: str,
+    language: str,
+    cases: List[Dict[str, Any]],
+    stop_on_failure: bool = False
+) -> List[dict]:
+    """
+    Run one program against many stdin cases, in parallel up to the engine's limit
+    Each case is a dict with `input` and optional `expected_output`.
+    Returns one result dict per case (in case order) with an extra `passed` field;
+    cases cancelled after a failure have status "skipped".
+    """
+    if _runs_on_host(language) and not host_runtimes_allowed():
+        refused = _host_runtime_refused(language)
+        return [dict(refused, passed=False) for _ in cases]
+    if is_compiled_language(language):
+        async with compiled(code, language) as build:
+            if build["error"] is not None:
+                return [dict(_compile_failed_result(build), passed=False) for _ in cases]
             
-            return {
-                "success": True,
-                "output": result.stdout,
-                "compilation_result": "Execution successful",
-                "execution_time": execution_time,
-                "status": "success"
-            }
+            async def run_binary_case(user_input: str) -> dict:
+                result = await _execute(lambda: launch_binary(build["key"]), user_input.encode("utf-8"))
+                return dict(result, compile_time=build["compile_time"])
             
-        except subprocess.TimeoutExpired:
-            return {
-                "success": False,
-                "output": "",
-                "compilation_result": "Execution timeout (10s limit exceeded). Check for infinite loops.",
-                "execution_time": 10,
-                "status": "timeout"
-            }
-        except FileNotFoundError:
-            return {
+            return await _run_cases(cases, run_binary_case, stop_on_failure)
+    
+    if language == "java":
+        if not java_available():
+            return [dict(_java_missing_result(), passed=False) for _ in cases]
+        java_source = prepare_source(code)
+        
+        async def run_java_case(user_input: str) -> dict:
+            return await _execute(lease_java_worker, java_source + user_input.encode("utf-8"))
+        
+        return await _run_cases(cases, run_java_case, stop_on_failure)
+    
+    if language != "python":
+        unsupported = _unsupported_language(language)
+        return [dict(unsupported, passed=False) for _ in cases]
+    
+    analysis = await _static_check(code)
+    if analysis and analysis["syntax_error"]:
+        return [dict(syntax_error_result(analysis), passed=False) for _ in cases]
+    
+    # Prepared once and shared by every case
+    source = prepare_source(code)
+    version = await _cacheable_version(code)
+    
+    async def run_python_case(user_input: str) -> dict:
+        result = await _run_python_case(code, source, user_input, version)
+        return _with_diagnostics(result, analysis)
+    
+    return await _run_cases(cases, run_python_case, stop_on_failure)
+
+
+async def _run_cases(
+    cases: List[Dict[str, Any]],
+    run_one: Callable[[str], Awaitable[dict]],
+    stop_on_failure: bool
+) -> List[dict]:
+    """Run every case's input through `run_one` concurrently and grade the results"""
+    async def run_case(case: Dict[str, Any]) -> dict:
+        result = await run_one(case.get("input") or "")
+        expected = case.get("expected_output")
+        if expected is None:
+            passed = result["success"]
+        else:
+            passed = result["success"] and _outputs_match(result["output"], expected)
+        return dict(result, passed=passed)
+    
+    tasks = [asyncio.ensure_future(run_case(case)) for case in cases]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if stop_on_failure and not result["passed"]:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Let cancelled runs kill their processes before reporting
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    results = []
+    for task in tasks:
+        if task.done() and not task.cancelled():
+            results.append(task.result())
+        else:
+            results.append({
                 "success": False,
                 "output": "",
-                "compilation_result": "Python interpreter not found on the system",
+                "compilation_result": "Skipped after an earlier case failed",
                 "execution_time": 0,
-                "status": "runtime_error"
-            }
+                "status": "skipped",
+                "passed": False
+            })
+    return results
+
+
+def _outputs_match(actual: str, expected: str) -> bool:
+    """Compare outputs ignoring trailing whitespace on lines and trailing blank lines"""
+    def normalize(text: str) -> List[str]:
+        return [line.rstrip() for line in text.rstrip().splitlines()]
+    return normalize(actual) == normalize(expected)
+
+
+def _compile_failed_result(build: dict) -> dict:
+    return {
+        "success": False,
+        "output": "",
+        "compilation_result": build["error"],
+        "execution_time": 0,
+        "status": "compilation_error",
+        "compile_time": build["compile_time"]
+    }
+
+
+def _unsupported_language(language: str) -> dict:
+    return {
+        "success": False,
+        "output": "",
+        "compilation_result": f"Language '{language}' is not yet supported. Currently Python, C, C++ and Java are available.",
+        "execution_time": 0,
+        "status": "compilation_error"
+    }
+
+
+async def _static_check(code: str) -> Optional[dict]:
+    """
+    Pre-check analysis of the code, or None when the pre-check is disabled or
+    the sandbox interpreter is a different Python version than the server
+    (its grammar may differ from what compile() accepts here)
+    """
+    if not settings.PRECHECK_ENABLED:
+        return None
+    version = await _interpreter_version()
+    if not version:
+        return None
+    sandbox_version = version.split()[1].split(".")[:2]
+    if sandbox_version != [str(sys.version_info.major), str(sys.version_info.minor)]:
+        return None
+    return analyze(code)
+
+
+def _with_diagnostics(result: dict, analysis: Optional[dict]) -> dict:
+    if analysis and analysis["diagnostics"]:
+        return dict(result, diagnostics=analysis["diagnostics"])
+    return result
+
+
+async def _cacheable_version(code: str) -> Optional[str]:
+    """
+    Interpreter version to key cached results with, or None when results of
+    this program must not be cached (cache disabled or non-deterministic code)
+    """
+    cache = get_result_cache()
+    if not cache:
+        return None
+    if not is_deterministic(code):
+        cache.record_bypass()
+        return None
+    return await _interpreter_version()
+
+
+async def _run_python_case(code: str, source: bytes, user_input: str, version: Optional[str]) -> dict:
+    """Run one input through the program, answering from the result cache when possible"""
+    cache = get_result_cache()
+    cache_key = None
+    if cache and version:
+        limits = tier_limits(current_requester().tier)
+        cache_key = make_key("python", version, f"{limits.cpu_seconds}/{limits.wall_seconds}", code, user_input)
+    if cache_key:
+        cached = cache.get(cache_key)
+        if cached:
+            # The output is this program's, but the timings were another run's
+            return dict(cached, cached=True, execution_time=0, resource_usage=None)
+    
+    result = await _execute(lease_python_sandbox, source + user_input.encode("utf-8"))
     
+    # Timeouts depend on host load, so only completed runs are cached
+    if cache_key and result["status"] != "timeout":
+        cache.put(cache_key, result)
+    return result
+
+
+async def _interpreter_version() -> Optional[str]:
+    """Version string of the Python the sandbox backend runs programs with, or None if it can't be started"""
+    return await get_sandbox_backend().python_version()
+
+
+async def _execute(
+    launch: Callable[[], Any],
+    stdin_data: bytes,
+    collect: Optional[Callable[[Any], None]] = None
+) -> dict:
+    """
+    Run one program to completion and build the result dict
+    `launch` returns an async context manager yielding a started program (a
+    pooled worker, a sandbox run or a compiled binary) with `process`,
+    `scratch_dir`, `limit_cpu()` and `report()`.
+    The program is stopped by its tier's CPU limit, or failing that by the
+    wall-clock ceiling; either way the output it printed is kept.
+    `collect` is called with the worker once its process has ended (even on
+    timeout), before its scratch directory is emptied.
+    """
+    capture = _new_capture()
+    try:
+        async with get_engine().slot():
+            # After the queue wait, which counts against the request's deadline
+            limits = current_limits()
+            start_time = time.time()
+            async with launch() as worker:
+                process = worker.process
+                worker.limit_cpu(limits.cpu_seconds)
+                
+                async def on_chunk(stream_name: str, data: bytes) -> None:
+                    if not capture.write(stream_name, data):
+                        _kill(process)
+                
+                try:
+                    await asyncio.wait_for(_pump_output(process, stdin_data, on_chunk), limits.wall_seconds)
+                finally:
+                    if collect:
+                        if process.returncode is None:
+                            _kill(process)
+                        await process.wait()
+                        collect(worker)
+                report = worker.report()
+            execution_time = round(time.time() - start_time, 3)
+    except asyncio.TimeoutError:
+        return _timeout_result(limits, capture, round(time.time() - start_time, 3))
+    except OSError as e:
+        return _launch_failed_result(e)
+    
+    return _run_result(process.returncode, capture, execution_time, report, limits)
+
+
+async def stream_code(code: str, language: str = "python", user_input: str = "") -> AsyncIterator[dict]:
+    """
+    Execute code and yield output as the process produces it
+    Yields {"type": "stdout" | "stderr", "data": str} chunks, then one
+    {"type": "result", ...} event with the same fields as run_code's result.
+    Output is pulled only as fast as the consumer takes events, so a slow client
+    stalls the program instead of buffering without bound. Closing the generator
+    kills the process.
+    """
+    if _runs_on_host(language) and not host_runtimes_allowed():
+        yield dict(_host_runtime_refused(language), type="result")
+        return
+    if is_compiled_language(language):
+        async with compiled(code, language) as build:
+            if build["error"] is not None:
+                yield dict(_compile_failed_result(build), type="result")
+                return
+            events = _stream(lambda: launch_binary(build["key"]), user_input.encode("utf-8"))
+            try:
+                async for event in events:
+                    if event["type"] == "result":
+                        event["compile_time"] = build["compile_time"]
+                    yield event
+            finally:
+                await events.aclose()
+        return
+    
+    if language == "java":
+        if not java_available():
+            yield dict(_java_missing_result(), type="result")
+            return
+        events = _stream(lease_java_worker, prepare_source(code) + user_input.encode("utf-8"))
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+        return
+    
+    if language != "python":
+        yield dict(_unsupported_language(language), type="result")
+        return
+    
+    analysis = await _static_check(code)
+    if analysis and analysis["syntax_error"]:
+        yield dict(syntax_error_result(analysis), type="result")
+        return
+    
+    events = _stream(lease_python_sandbox, prepare_source(code) + user_input.encode("utf-8"))
+    try:
+        async for event in events:
+            if event["type"] == "result":
+                event = _with_diagnostics(event, analysis)
+            yield event
     finally:
-        # Cleanup temp directory
+        await events.aclose()
+
+
+async def _stream(launch: Callable[[], Any], stdin_data: bytes) -> AsyncIterator[dict]:
+    """Run one program (see _execute) and yield stream_code's events"""
+    capture = _new_capture()
+    try:
+        async with get_engine().slot():
+            limits = current_limits()
+            start_time = time.time()
+            deadline = time.monotonic() + limits.wall_seconds
+            async with launch() as worker:
+                process = worker.process
+                worker.limit_cpu(limits.cpu_seconds)
+                chunks: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+                decoders = {
+                    name: codecs.getincrementaldecoder("utf-8")(errors="replace")
+                    for name in ("stdout", "stderr")
+                }
+                
+                async def on_chunk(stream_name: str, data: bytes) -> None:
+                    if not capture.write(stream_name, data):
+                        _kill(process)
+                    text = decoders[stream_name].decode(data)
+                    if text:
+                        await chunks.put((stream_name, text))
+                
+                async def produce() -> None:
+                    await _pump_output(process, stdin_data, on_chunk)
+                    await chunks.put(None)
+                
+                producer = asyncio.ensure_future(produce())
+                try:
+                    while True:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError
+                        chunk = await asyncio.wait_for(chunks.get(), remaining)
+                        if chunk is None:
+                            break
+                        stream_name, text = chunk
+                        yield {"type": stream_name, "data": text}
+                finally:
+                    producer.cancel()
+                report = worker.report()
+            execution_time = round(time.time() - start_time, 3)
+    except asyncio.TimeoutError:
+        yield dict(_timeout_result(limits, capture, round(time.time() - start_time, 3)), type="result")
+        return
+    except OSError as e:
+        yield dict(_launch_failed_result(e), type="result")
+        return
+    
+    yield dict(_run_result(process.returncode, capture, execution_time, report, limits), type="result")
+
+
+async def _pump_output(
+    process: asyncio.subprocess.Process,
+    stdin_data: bytes,
+    on_chunk: Callable[[str, bytes], Awaitable[None]]
+) -> None:
+    """Feed stdin, pass stdout/stderr chunks to on_chunk as they arrive, and wait for exit"""
+    async def feed() -> None:
         try:
-            shutil.rmtree(temp_dir)
-        except:
+            process.stdin.write(stdin_data)
+            await process.stdin.drain()
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # Program exited without reading all of its input
             pass
+    
+    async def pump(stream: asyncio.StreamReader, stream_name: str) -> None:
+        while True:
+            data = await stream.read(STREAM_CHUNK_BYTES)
+            if not data:
+                return
+            await on_chunk(stream_name, data)
+    
+    await asyncio.gather(feed(), pump(process.stdout, "stdout"), pump(process.stderr, "stderr"))
+    await process.wait()
+
+
+def _new_capture() -> OutputCapture:
+    return OutputCapture(settings.OUTPUT_BUFFER_BYTES, settings.OUTPUT_LIMIT_BYTES)
+
+
+def _kill(process: asyncio.subprocess.Process) -> None:
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+
+def _run_result(
+    returncode: int,
+    capture: OutputCapture,
+    execution_time: float,
+    report: Optional[dict],
+    limits: TierLimits
+) -> dict:
+    """Result of a finished run, including what the worker reported about it"""
+    report = report or {}
+    compile_time = report.get("compile_time")
+    if compile_time is not None:
+        # Compiled inside the worker (Java): keep the two timings apart
+        execution_time = round(max(execution_time - compile_time, 0), 3)
+    if report.get("compile_error"):
+        result = {
+            "success": False,
+            "output": "",
+            "compilation_result": capture.stderr.getvalue() or "Compilation failed",
+            "execution_time": 0,
+            "status": "compilation_error"
+        }
+    else:
+        result = _build_result(returncode, capture, execution_time, limits, report.get("resource_usage"))
+    if compile_time is not None:
+        result["compile_time"] = compile_time
+    return result
+
+
+def _build_result(
+    returncode: int,
+    capture: OutputCapture,
+    execution_time: float,
+    limits: TierLimits,
+    usage: Optional[dict] = None
+) -> dict:
+    stdout = capture.stdout.getvalue()
+    stderr = capture.stderr.getvalue()
+    sizes = {
+        "truncated": capture.truncated,
+        "output_bytes": capture.stdout.total_bytes,
+        "resource_usage": usage
+    }
+    
+    if hasattr(signal, "SIGXCPU") and returncode == -signal.SIGXCPU:
+        return {
+            "success": False,
+            "output": stdout,
+            "compilation_result": f"CPU time limit exceeded ({limits.cpu_seconds}s). Check for infinite loops.",
+            "execution_time": execution_time,
+            "status": "timeout",
+            **sizes
+        }
+    
+    if capture.limit_exceeded:
+        return {
+            "success": False,
+            "output": stdout,
+            "compilation_result": f"Output limit exceeded ({capture.kill_bytes} bytes). Check for loops that print without stopping.",
+            "execution_time": execution_time,
+            "status": "runtime_error",
+            **sizes
+        }
+    
+    if returncode != 0:
+        # There was an error
+        error_output = stderr or stdout or _exit_description(returncode)
+        return {
+            "success": False,
+            "output": stdout,
+            "compilation_result": error_output,
+            "execution_time": execution_time,
+            "status": "runtime_error",
+            **sizes
+        }
+    
+    return {
+        "success": True,
+        "output": stdout,
+        "compilation_result": "Execution successful",
+        "execution_time": execution_time,
+        "status": "success",
+        **sizes
+    }
+
+
+def _exit_description(returncode: int) -> str:
+    """Explain a failure that printed nothing (e.g. a C program that segfaulted)"""
+    if returncode < 0:
+        try:
+            name = signal.Signals(-returncode).name
+        except ValueError:
+            name = f"signal {-returncode}"
+        return f"Program terminated by {name}"
+    return f"Program exited with code {returncode}"
+
+
+def _timeout_result(limits: TierLimits, capture: OutputCapture, execution_time: float) -> dict:
+    """A run killed at the wall-clock ceiling, with what it printed until then"""
+    return {
+        "success": False,
+        "output": capture.stdout.getvalue(),
+        "compilation_result": (
+            f"Execution exceeded the {limits.wall_seconds}s real-time limit. "
+            "The program may be sleeping or blocked; output up to that point is shown."
+        ),
+        "execution_time": execution_time,
+        "status": "timeout",
+        "truncated": capture.truncated,
+        "output_bytes": capture.stdout.total_bytes
+    }
+
+
+def _runs_on_host(language: str) -> bool:
+    """Languages run as local processes whatever the sandbox backend"""
+    return language == "java" or is_compiled_language(language)
+
+
+def _host_runtime_refused(language: str) -> dict:
+    backend = get_sandbox_backend().name
+    name = {"c": "C", "cpp": "C++", "java": "Java"}.get(language, language)
+    return {
+        "success": False,
+        "output": "",
+        "compilation_result": (
+            f"{name} programs can't run on this server: they would run outside "
+            f"the {backend} sandbox. Only Python is available."
+        ),
+        "execution_time": 0,
+        "status": "runtime_error"
+    }
+
+
+def _java_missing_result() -> dict:
+    return {
+        "success": False,
+        "output": "",
+        "compilation_result": "Java runtime (java/javac) not found on the system",
+        "execution_time": 0,
+        "status": "runtime_error"
+    }
+
+
+def _launch_failed_result(error: OSError) -> dict:
+    """
+    Result for a program that couldn't be started: its executable (interpreter,
+    JVM, compiled binary or docker) wasn't found, a JVM worker failed to come
+    up, or the fork itself failed (e.g. out of processes)
+    """
+    executable = str(error.filename or "")
+    name = os.path.basename(executable)
+    if not isinstance(error, FileNotFoundError):
+        message = f"Program could not be started: {error.strerror or error}"
+    elif name in ("java", "javac"):
+        return _java_missing_result()
+    elif name.startswith("python"):
+        message = f"Python interpreter ({executable}) not found on the system"
+    elif executable:
+        message = f"Program could not be started: {executable} not found"
+    else:
+        message = "Program could not be started: executable not found"
+    return {
+        "success": False,
+        "output": "",
+        "compilation_result": message,
+        "execution_time": 0,
+        "status": "runtime_error"
+    }
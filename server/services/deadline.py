@@ -0,0 +1,58 @@
+"""
+Request deadlines
+Endpoints that run several stages back to back (run, hints, save) set one
+deadline for the whole request. Each stage takes what is left of it: the run's
+wall-clock limit is capped at the remaining budget, and hints fall back to the
+local engine when too little is left for an LLM call. Computations shared
+between requests run without a deadline; each request bounds its own wait.
+"""
+import time
+from contextvars import Context, ContextVar, copy_context
+from typing import Optional
+
+
+class Deadline:
+    """Point in time by which the current request should have answered"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left (0 once expired)"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+# Set per request by the routes; tasks started from the request inherit it
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def set_deadline(seconds: float) -> Optional[Deadline]:
+    """Give the current request `seconds` to answer (0 = no deadline)"""
+    deadline = Deadline(seconds) if seconds > 0 else None
+    _deadline.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _deadline.get()
+
+
+def remaining_budget(default: float) -> float:
+    """What is left of the current request's deadline, at most `default`"""
+    deadline = _deadline.get()
+    return default if deadline is None else min(default, deadline.remaining())
+
+
+def context_without_deadline() -> Context:
+    """
+    Copy of the current context with no deadline, for work shared by several
+    requests (see single_flight.py): each caller applies its own deadline to
+    its wait, so one caller's deadline doesn't cut short the others'
+    """
+    context = copy_context()
+    context.run(_deadline.set, None)
+    return context
@@ -0,0 +1,246 @@
+"""
+Asynchronous execution engine
+Bounds how many sandboxed programs run at once and decides who runs next:
+weighted fair queueing per user, so a few users spamming Run can't starve the rest
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, List, NamedTuple, Optional
+
+from config import settings
+
+# Number of recent queue waits kept for percentile reporting
+WAIT_SAMPLE_SIZE = 1000
+FLOW_WAIT_SAMPLE_SIZE = 100
+
+# Weight of the newest sample in the moving averages of wait and run time
+EWMA_ALPHA = 0.2
+
+# Idle per-user records beyond this many are forgotten
+MAX_TRACKED_FLOWS = 1000
+
+
+class Requester(NamedTuple):
+    """Who a run is for: the fair-queueing flow it belongs to, its weight and limits tier"""
+    key: str
+    weight: float
+    anonymous: bool
+    tier: str  # "anonymous", "student" or "instructor"; see resource_limits.tier_limits
+
+
+ANONYMOUS = Requester("anonymous", 1.0, True, "anonymous")
+
+# Set per request by the routes (and per job by queue workers)
+_requester: ContextVar[Requester] = ContextVar("requester", default=ANONYMOUS)
+
+
+def requester_for(user: Optional[dict]) -> Requester:
+    """Flow for a user from get_current_user/get_optional_user (None = anonymous)"""
+    if not user or not user.get("id"):
+        return ANONYMOUS
+    if user.get("role") in ("instructor", "admin"):
+        return Requester(f"user:{user['id']}", settings.SCHEDULER_INSTRUCTOR_WEIGHT, False, "instructor")
+    return Requester(f"user:{user['id']}", 1.0, False, "student")
+
+
+def set_requester(user: Optional[dict]) -> None:
+    """Attribute runs started from the current task (and tasks it creates) to `user`"""
+    _requester.set(requester_for(user))
+
+
+def current_requester() -> Requester:
+    return _requester.get()
+
+
+class _Flow:
+    """Scheduling state and metrics for one user (or all anonymous traffic)"""
+
+    def __init__(self, requester: Requester):
+        self.requester = requester
+        self.last_tag = 0.0
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+        self.waits: Deque[float] = deque(maxlen=FLOW_WAIT_SAMPLE_SIZE)
+
+
+class _Waiter:
+    def __init__(self, flow: _Flow, future: asyncio.Future):
+        self.flow = flow
+        self.future = future
+        self.cancelled = False
+
+
+class ExecutionEngine:
+    """
+    Concurrency limiter for code runs with queue depth and wait-time metrics.
+    Waiting runs are ordered by virtual finish tag: each user's runs are spaced
+    1/weight apart, starting no earlier than the current virtual time, so every
+    active user gets a turn in proportion to their weight however many runs
+    they queue. Anonymous runs share one flow and may hold at most
+    `anonymous_limit` slots.
+    """
+
+    def __init__(self, max_concurrency: int, anonymous_limit: Optional[int] = None):
+        self.max_concurrency = max_concurrency
+        self.anonymous_limit = anonymous_limit or max_concurrency
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self._anonymous_in_flight = 0
+        self._virtual_time = 0.0
+        self._heap: List[tuple] = []  # (finish tag, sequence, waiter)
+        self._sequence = itertools.count()
+        self._flows: "OrderedDict[str, _Flow]" = OrderedDict()
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self.wait_ewma = 0.0  # seconds
+        self.service_time_ewma = 1.0  # seconds a slot is held; start pessimistic
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait for this requester's turn and hold an execution slot for the block"""
+        flow = self._flow(_requester.get())
+        enqueued_at = time.monotonic()
+        waiter = _Waiter(flow, asyncio.get_running_loop().create_future())
+        tag = max(self._virtual_time, flow.last_tag) + 1 / flow.requester.weight
+        flow.last_tag = tag
+        heapq.heappush(self._heap, (tag, next(self._sequence), waiter))
+        self.queued += 1
+        flow.queued += 1
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller went away: hand the slot on
+                self._release(flow, completed=False)
+            else:
+                waiter.cancelled = True
+                self.queued -= 1
+                flow.queued -= 1
+            raise
+        granted_at = time.monotonic()
+        wait = granted_at - enqueued_at
+        self._waits.append(wait)
+        flow.waits.append(wait)
+        self.wait_ewma += EWMA_ALPHA * (wait - self.wait_ewma)
+
+        try:
+            yield
+        finally:
+            held = time.monotonic() - granted_at
+            self.service_time_ewma += EWMA_ALPHA * (held - self.service_time_ewma)
+            self._release(flow)
+
+    def stats(self) -> dict:
+        """Queue and concurrency counters for monitoring"""
+        waits = sorted(self._waits)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "anonymous_limit": self.anonymous_limit,
+            "in_flight": self.in_flight,
+            "anonymous_in_flight": self._anonymous_in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "active_users": sum(1 for flow in self._flows.values() if flow.in_flight or flow.queued),
+            "wait_ms_p50": _percentile_ms(waits, 0.50),
+            "wait_ms_p95": _percentile_ms(waits, 0.95),
+            "wait_ms_max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            "wait_ms_ewma": round(self.wait_ewma * 1000, 2)
+        }
+
+    def flow_stats(self, limit: int = 50) -> List[dict]:
+        """Per-user queue waits, busiest first, to check that fairness holds"""
+        rows = []
+        for flow in self._flows.values():
+            waits = sorted(flow.waits)
+            rows.append({
+                "user": flow.requester.key,
+                "weight": flow.requester.weight,
+                "in_flight": flow.in_flight,
+                "queued": flow.queued,
+                "completed": flow.completed,
+                "wait_ms_p50": _percentile_ms(waits, 0.50),
+                "wait_ms_p95": _percentile_ms(waits, 0.95),
+                "wait_ms_max": round(waits[-1] * 1000, 2) if waits else 0.0
+            })
+        rows.sort(key=lambda row: (row["queued"] + row["in_flight"], row["completed"]), reverse=True)
+        return rows[:limit]
+
+    def _flow(self, requester: Requester) -> _Flow:
+        flow = self._flows.get(requester.key)
+        if flow is None:
+            flow = self._flows[requester.key] = _Flow(requester)
+            self._forget_idle_flows()
+        else:
+            flow.requester = requester  # role (and weight) may have changed
+            self._flows.move_to_end(requester.key)
+        return flow
+
+    def _forget_idle_flows(self) -> None:
+        for key in list(self._flows):
+            if len(self._flows) <= MAX_TRACKED_FLOWS:
+                return
+            flow = self._flows[key]
+            if not flow.in_flight and not flow.queued:
+                del self._flows[key]
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the waiters with the smallest finish tags"""
+        held_back = []
+        while self._heap and self.in_flight < self.max_concurrency:
+            entry = heapq.heappop(self._heap)
+            tag, _, waiter = entry
+            if waiter.cancelled:
+                continue
+            anonymous = waiter.flow.requester.anonymous
+            if anonymous and self._anonymous_in_flight >= self.anonymous_limit:
+                held_back.append(entry)
+                continue
+            self._virtual_time = max(self._virtual_time, tag - 1 / waiter.flow.requester.weight)
+            self.queued -= 1
+            waiter.flow.queued -= 1
+            self.in_flight += 1
+            waiter.flow.in_flight += 1
+            if anonymous:
+                self._anonymous_in_flight += 1
+            waiter.future.set_result(None)
+        for entry in held_back:
+            heapq.heappush(self._heap, entry)
+
+    def _release(self, flow: _Flow, completed: bool = True) -> None:
+        self.in_flight -= 1
+        flow.in_flight -= 1
+        if flow.requester.anonymous:
+            self._anonymous_in_flight -= 1
+        if completed:
+            self.completed += 1
+            flow.completed += 1
+        self._dispatch()
+
+
+def _percentile_ms(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return round(sorted_values[index] * 1000, 2)
+
+
+_engine: Optional[ExecutionEngine] = None
+
+
+def get_engine() -> ExecutionEngine:
+    """Get the shared engine (created on first use inside the running event loop)"""
+    global _engine
+    if _engine is None:
+        max_concurrency = settings.EXECUTION_CONCURRENCY or os.cpu_count() or 1
+        anonymous_limit = max(1, int(max_concurrency * settings.SCHEDULER_ANONYMOUS_SHARE))
+        _engine = ExecutionEngine(max_concurrency, min(anonymous_limit, max_concurrency))
+    return _engine
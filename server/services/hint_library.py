@@ -0,0 +1,234 @@
+"""
+Precomputed hint library
+Most hint requests are for a small set of recurring errors. A batch job
+(build_hint_library, started from POST /api/hints/library/rebuild) finds the
+most frequent error signatures among stored failed submissions, has the model
+write hints for each once, and saves them to a JSON file indexed by signature.
+A stored answer is served to every student whose error has that signature, so
+it is written from the error alone, without any one student's code.
+The API loads that file at startup and answers matching errors from it before
+making any LLM call. The file carries a format number and a version that goes
+up with each rebuild; a replaced file (from a rebuild here or copied from
+elsewhere) is picked up without a restart, checked every
+HINT_LIBRARY_CHECK_SECONDS.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import settings
+from services.local_hints import local_hints, parse_error
+
+# Layout of the file; files with another format are not loaded
+LIBRARY_FORMAT = 1
+
+# Fields of a hint answer kept in the library (as returned by hint_service.generate_hints)
+HINT_FIELDS = ("error_type", "hints", "root_cause", "concept_references", "minimal_patch")
+
+# Longest error message kept in a signature
+MAX_SIGNATURE_MESSAGE = 200
+
+_COMPILER_ERROR = re.compile(r"^\S+:\d+(?::\d+)?: error: (?P<message>.*)$", re.MULTILINE)
+_JAVA_EXCEPTION = re.compile(r'^Exception in thread "[^"]*" (?P<message>.*)$', re.MULTILINE)
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+def error_signature(language: str, error: str) -> Optional[str]:
+    """
+    Key under which an error is stored: the language, exception (or compiler
+    diagnostic) and message with numbers masked, e.g.
+    "python|IndexError: list index out of range". None if no error is recognized.
+    """
+    parsed = parse_error(error)
+    if parsed:
+        head = f"{parsed.exception}: {parsed.message}" if parsed.message else parsed.exception
+    else:
+        match = _COMPILER_ERROR.search(error) or _JAVA_EXCEPTION.search(error)
+        if not match:
+            return None
+        head = match.group("message")
+    head = " ".join(_NUMBER.sub("N", head).split())[:MAX_SIGNATURE_MESSAGE]
+    return f"{language}|{head}"
+
+
+def signature_message(signature: str) -> str:
+    """The error part of a signature ("IndexError: list index out of range")"""
+    return signature.split("|", 1)[1]
+
+
+class HintLibrary:
+    """Loaded library file: hint answers by error signature"""
+
+    def __init__(self, version: int, generated_at: str, entries: Dict[str, dict], path: str = "", mtime: float = 0.0):
+        self.version = version
+        self.generated_at = generated_at
+        self.entries = entries
+        self.path = path
+        self.mtime = mtime
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, language: str, error: str) -> Optional[dict]:
+        """The stored answer for this error, if its signature is in the library"""
+        signature = error_signature(language, error) if self.entries else None
+        entry = self.entries.get(signature) if signature else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {field: entry[field] for field in HINT_FIELDS}
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "generated_at": self.generated_at,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+def load_library(path: str) -> HintLibrary:
+    """Read a library file; raises OSError or ValueError if it can't be used"""
+    mtime = os.stat(path).st_mtime
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or data.get("format") != LIBRARY_FORMAT:
+        raise ValueError(f"{path}: not a format {LIBRARY_FORMAT} hint library")
+    entries = data.get("entries", {})
+    if not isinstance(entries, dict) or not all(isinstance(entry, dict) for entry in entries.values()):
+        raise ValueError(f"{path}: entries must map signatures to objects")
+    for signature, entry in entries.items():
+        missing = [field for field in HINT_FIELDS if field not in entry]
+        if missing:
+            raise ValueError(f"{path}: entry {signature!r} lacks {', '.join(missing)}")
+    return HintLibrary(int(data.get("version", 0)), data.get("generated_at", ""), entries, path, mtime)
+
+
+def save_library(path: str, library: HintLibrary) -> None:
+    """Write a library file atomically, so a reload never sees half of it"""
+    data = {
+        "format": LIBRARY_FORMAT,
+        "version": library.version,
+        "generated_at": library.generated_at,
+        "entries": library.entries
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+def mine_error_signatures(
+    submissions: Iterable[dict], limit: Optional[int], min_count: int
+) -> List[Tuple[str, int, dict]]:
+    """
+    The `limit` (None: all) most frequent error signatures among failed
+    submissions seen at least `min_count` times, as (signature, count, most
+    recent submission), most frequent first
+    """
+    counts: Counter = Counter()
+    samples: Dict[str, dict] = {}
+    for submission in submissions:
+        if submission.get("status") != "error":
+            continue
+        signature = error_signature(submission.get("language", ""), submission.get("error") or "")
+        if signature is None:
+            continue
+        counts[signature] += 1
+        sample = samples.get(signature)
+        if sample is None or submission.get("created_at", "") > sample.get("created_at", ""):
+            samples[signature] = submission
+    return [
+        (signature, count, samples[signature])
+        for signature, count in counts.most_common(limit)
+        if count >= min_count
+    ]
+
+
+async def build_hint_library(
+    submissions: Iterable[dict],
+    generate: Callable[[str, str], Awaitable[dict]],
+    path: str,
+    limit: int,
+    min_count: int
+) -> HintLibrary:
+    """
+    Pre-generate hints for the most frequent errors and save them as the next
+    library version
+    `generate(language, message)` is the live model call, given only the
+    signature's error message; answers that didn't come from the model
+    (fallbacks) are left out, as are errors the local engine already answers
+    when LOCAL_HINTS_FIRST is set.
+    """
+    top = [
+        (signature, count, sample)
+        for signature, count, sample in mine_error_signatures(submissions, None, min_count)
+        if not (settings.LOCAL_HINTS_FIRST and local_hints(sample["code"], sample["language"], sample["error"]))
+    ][:limit]
+    answers = await asyncio.gather(
+        *(generate(sample["language"], signature_message(signature)) for signature, _, sample in top),
+        return_exceptions=True
+    )
+
+    entries = {}
+    for (signature, count, _), answer in zip(top, answers):
+        if isinstance(answer, dict) and answer.get("prompt_tokens") is not None:
+            entries[signature] = dict({field: answer[field] for field in HINT_FIELDS}, count=count)
+
+    current = get_hint_library()
+    library = HintLibrary(
+        version=(current.version if current else 0) + 1,
+        generated_at=datetime.utcnow().isoformat(),
+        entries=entries
+    )
+    save_library(path, library)
+    _reload(force=True)
+    return get_hint_library() or library
+
+
+_library: Optional[HintLibrary] = None
+_checked_at = 0.0
+_rejected: Optional[Tuple[str, float]] = None  # (path, mtime) of a file that failed to load
+
+
+def get_hint_library() -> Optional[HintLibrary]:
+    """
+    The current library, or None if HINT_LIBRARY_PATH is unset or has none yet
+    Picks up a replaced file at most HINT_LIBRARY_CHECK_SECONDS after the change.
+    """
+    if not settings.HINT_LIBRARY_PATH:
+        return None
+    if time.monotonic() - _checked_at >= settings.HINT_LIBRARY_CHECK_SECONDS:
+        _reload()
+    return _library
+
+
+def _reload(force: bool = False) -> None:
+    """Load the library file if it changed; a broken file leaves the loaded library in place"""
+    global _library, _checked_at, _rejected
+    _checked_at = time.monotonic()
+    path = settings.HINT_LIBRARY_PATH
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return
+    except OSError as e:
+        print(f"Hint library unavailable: {e!r}")
+        return
+    if not force and (
+        (_library is not None and _library.path == path and _library.mtime == mtime) or _rejected == (path, mtime)
+    ):
+        return
+    try:
+        _library = load_library(path)
+    except (OSError, ValueError) as e:
+        _rejected = (path, mtime)
+        print(f"Hint library not loaded: {e!r}")
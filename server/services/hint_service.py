@@ -1,15 +1,23 @@
 """
 AI Hint generation service using OpenAI API
 """
-from openai import OpenAI
 from config import settings
+from services.admission import get_admission
+from services.deadline import current_deadline
+from services.hint_library import HintLibrary, build_hint_library, get_hint_library
+from services.hint_stream import HintStreamParser
+from services.llm_client import get_llm_client
+from services.local_hints import error_kind, local_hints
+from services.precheck import analyze, format_findings
+from services.prompt_builder import estimate_message_tokens, estimate_tokens, fit_prompt
+from services.single_flight import flight_key, get_hint_flights
+from services.submissions_service import iter_failed_submissions
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
 import json
 import re
 
-# Initialize OpenAI client
-client = None
-if settings.OPENAI_API_KEY:
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+HINT_MODEL = "gpt-3.5-turbo"
 
 # System prompt for educational hints (NOT solutions)
 HINT_SYSTEM_PROMPT = """You are an educational programming assistant for TraceCode system. 
@@ -43,77 +51,208 @@ Example for a missing colon in Python:
 
 Remember: You are a TEACHER, not a code fixer. Help them LEARN."""
 
+# Stands in for the student's code when writing hints for the hint library
+GENERIC_HINT_NOTE = (
+    "(No code is given: this error comes from many different students' programs. "
+    "Write hints that apply to any program raising it, without assuming names or lines.)"
+)
 
-def generate_hints(code: str, language: str, error: str = "", expected_output: str = "") -> dict:
-    """Generate educational hints for student code using OpenAI"""
-    
-    if not client:
-        # Return mock response if no API key
-        return get_mock_hints(code, language, error)
-    
-    try:
-        prompt = f"""Student's Code ({language}):
+HINT_PROMPT_TEMPLATE = """Student's Code ({language}):
 ```{language}
 {code}
 ```
 
 Error/Output:
-{error if error else "No error message provided"}
+{error}
 
 Expected Output:
-{expected_output if expected_output else "Not specified"}
+{expected_output}
+
+Static analysis findings:
+{findings}
 
 Analyze this code and provide educational hints. Respond ONLY with the JSON object, no other text."""
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": HINT_SYSTEM_PROMPT},
-                {"role": "user", "content": prompt}
-            ],
+
+async def request_hints(code: str, language: str, error: str = "", expected_output: str = "") -> dict:
+    """
+    generate_hints, counted as an in-flight LLM call
+    Errors the local engine or hint library recognize are answered without a
+    call (see _known_hints). Identical concurrent requests share one call. Within a request deadline
+    (see deadline.py), the local fallback answers instead when too little time
+    is left for the call, or when the call doesn't finish in time.
+    """
+    async def call() -> dict:
+        with get_admission().hint_call():
+            return await generate_hints(code, language, error, expected_output)
+    
+    async def shared_call() -> dict:
+        flights = get_hint_flights()
+        if not flights:
+            return await call()
+        key = flight_key(language, code, error, expected_output)
+        return await flights.do(key, call)
+    
+    known = _known_hints(code, language, error)
+    if known:
+        return known
+    
+    deadline = current_deadline()
+    if deadline is None:
+        return await shared_call()
+    if deadline.remaining() < settings.HINT_MIN_BUDGET_SECONDS:
+        return get_mock_hints(code, language, error)
+    try:
+        return await asyncio.wait_for(shared_call(), deadline.remaining())
+    except asyncio.TimeoutError:
+        return get_mock_hints(code, language, error)
+
+
+async def generate_hints(
+    code: str, language: str, error: str = "", expected_output: str = "", use_library: bool = True
+) -> dict:
+    """
+    Generate educational hints for student code using OpenAI
+    Errors in the precomputed hint library are answered from it. Answers from
+    the model include prompt_tokens, the estimated size of the prompt sent.
+    """
+    library = get_hint_library() if use_library else None
+    stored = library.lookup(language, error) if library else None
+    if stored:
+        return stored
+    
+    client = get_llm_client()
+    if not client:
+        # Return mock response if no API key
+        return get_mock_hints(code, language, error)
+    
+    try:
+        messages, prompt_tokens = _hint_messages(code, language, error, expected_output)
+        response_text = await client.complete(
+            model=HINT_MODEL,
+            messages=messages,
             temperature=0.7,
             max_tokens=1000
         )
         
-        response_text = response.choices[0].message.content
-        
         # Extract JSON from response
         json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
         if json_match:
-            result = json.loads(json_match.group())
-            # Ensure all required fields exist
-            return {
-                "error_type": result.get("error_type", "none"),
-                "hints": result.get("hints", ["Check your code carefully"]),
-                "root_cause": result.get("root_cause", "Unable to determine root cause"),
-                "concept_references": result.get("concept_references", []),
-                "minimal_patch": result.get("minimal_patch", "Review the error message and code structure")
-            }
+            return dict(_complete_hints(json.loads(json_match.group())), prompt_tokens=prompt_tokens)
         else:
             return get_mock_hints(code, language, error)
             
     except Exception as e:
-        print(f"OpenAI API error: {e}")
+        print(f"OpenAI API error: {e!r}")
         return get_mock_hints(code, language, error)
 
 
-def get_mock_hints(code: str, language: str, error: str) -> dict:
-    """Fallback mock hints when AI is unavailable"""
+async def stream_hints(code: str, language: str, error: str = "", expected_output: str = "") -> AsyncIterator[dict]:
+    """
+    Hints as the model writes them
+    Yields {"type": "hint", "index": i, "hint": str} as soon as each hint is
+    complete, then {"type": "result", ...} with generate_hints' fields. Without
+    an API key, or if the call fails before the first hint, the fallback hints
+    are sent the same way, as are known errors (see _known_hints).
+    """
+    client = get_llm_client()
+    known = _known_hints(code, language, error)
+    parser = HintStreamParser()
+    if client and not known:
+        with get_admission().hint_call():
+            try:
+                messages, prompt_tokens = _hint_messages(code, language, error, expected_output)
+                pieces = client.stream(
+                    model=HINT_MODEL,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=1000
+                )
+                try:
+                    async for piece in pieces:
+                        for kind, index, hint in parser.feed(piece):
+                            if kind == "hint":
+                                yield {"type": "hint", "index": index, "hint": hint}
+                        if parser.done:
+                            break
+                finally:
+                    await pieces.aclose()
+            except Exception as e:
+                print(f"OpenAI API error: {e!r}")
     
-    # Simple error detection for demo
-    error_type = "none"
-    if error:
-        error_lower = error.lower()
-        if "syntax" in error_lower or "unexpected" in error_lower or "invalid" in error_lower:
-            error_type = "syntax"
-        elif "runtime" in error_lower or "exception" in error_lower or "error" in error_lower:
-            error_type = "runtime"
-        elif "undefined" in error_lower or "not defined" in error_lower or "name" in error_lower:
-            error_type = "syntax"
-        elif "indentation" in error_lower:
-            error_type = "syntax"
-        else:
-            error_type = "logical"
+    if parser.hints:
+        result = _complete_hints(dict(parser.fields, hints=parser.hints))
+        yield dict(result, prompt_tokens=prompt_tokens, type="result")
+        return
+    result = known or get_mock_hints(code, language, error)
+    for index, hint in enumerate(result["hints"]):
+        yield {"type": "hint", "index": index, "hint": hint}
+    yield dict(result, type="result")
+
+
+async def rebuild_hint_library() -> HintLibrary:
+    """Pre-generate hints for the most frequent errors in stored submissions (see hint_library.py)"""
+    async def generate(language: str, message: str) -> dict:
+        # No code: the answer is shared by every student with this error
+        error = f"{message}\n\n{GENERIC_HINT_NOTE}"
+        return await generate_hints("", language, error, use_library=False)
+    
+    return await build_hint_library(
+        iter_failed_submissions(),
+        generate,
+        settings.HINT_LIBRARY_PATH,
+        limit=settings.HINT_LIBRARY_SIZE,
+        min_count=settings.HINT_LIBRARY_MIN_COUNT
+    )
+
+
+def _known_hints(code: str, language: str, error: str) -> Optional[dict]:
+    """Hints needing no LLM call: the local engine's (with LOCAL_HINTS_FIRST), else the hint library's"""
+    known = local_hints(code, language, error) if settings.LOCAL_HINTS_FIRST else None
+    library = get_hint_library()
+    return known or (library.lookup(language, error) if library else None)
+
+
+def _hint_messages(code: str, language: str, error: str, expected_output: str) -> Tuple[List[dict], int]:
+    """Chat messages for a hint call, within HINT_PROMPT_MAX_TOKENS, and their estimated tokens"""
+    findings = format_findings(analyze(code)) if language == "python" else ""
+    budget = settings.HINT_PROMPT_MAX_TOKENS - estimate_tokens(HINT_SYSTEM_PROMPT + HINT_PROMPT_TEMPLATE)
+    parts = fit_prompt(code, language, error, expected_output, findings, budget)
+    prompt = HINT_PROMPT_TEMPLATE.format(
+        language=language,
+        code=parts.code,
+        error=parts.error if parts.error else "No error message provided",
+        expected_output=parts.expected_output if parts.expected_output else "Not specified",
+        findings=parts.findings if parts.findings else "None"
+    )
+    messages = [
+        {"role": "system", "content": HINT_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    return messages, estimate_message_tokens(messages)
+
+
+def _complete_hints(result: dict) -> dict:
+    """The model's answer with every required field present"""
+    return {
+        "error_type": result.get("error_type", "none"),
+        "hints": result.get("hints", ["Check your code carefully"]),
+        "root_cause": result.get("root_cause", "Unable to determine root cause"),
+        "concept_references": result.get("concept_references", []),
+        "minimal_patch": result.get("minimal_patch", "Review the error message and code structure")
+    }
+
+
+def get_mock_hints(code: str, language: str, error: str) -> dict:
+    """Fallback hints when AI is unavailable: the local engine, or general hints by kind of error"""
+    analysis = analyze(code) if language == "python" else None
+    if analysis and analysis["syntax_error"]:
+        # The static pre-check is authoritative for code that doesn't compile
+        error = error or analysis["syntax_error"]
+    known = local_hints(code, language, error)
+    if known:
+        return known
+    error_type = "syntax" if analysis and analysis["syntax_error"] else error_kind(code, error)
     
     hints_by_type = {
         "syntax": [
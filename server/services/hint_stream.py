@@ -0,0 +1,112 @@
+"""
+Incremental parsing of the hint JSON object as the model streams it
+The model answers with one JSON object (see HINT_SYSTEM_PROMPT). Rather than
+waiting for all of it, the parser reports each entry of "hints" as soon as its
+closing quote arrives, and every other top-level field once its value is
+complete. Text around the object (a ```json fence, a preamble) is ignored.
+"""
+import json
+from typing import List, Optional, Tuple
+
+# Events: ("hint", index, text) and ("field", name, value)
+Event = Tuple[str, object, object]
+
+
+class HintStreamParser:
+    def __init__(self):
+        self.text = ""
+        self.done = False  # the object's closing brace has been seen
+        self.hints: List[str] = []
+        self.fields: dict = {}
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._expect = "key"  # at depth 1: "key", "value", or "end" (of the value)
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Event]:
+        """Parse more of the response; returns the events it completed"""
+        events: List[Event] = []
+        start = len(self.text)
+        self.text += chunk
+        for i in range(start, len(self.text)):
+            if self.done:
+                break
+            c = self.text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif c == "\\":
+                    self._escaped = True
+                elif c == '"':
+                    self._in_string = False
+                    self._string_closed(i + 1, events)
+                continue
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                    self._expect = "key"
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                self._begin_value(i)
+            elif c in "{[":
+                self._begin_value(i)
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end_value(i, events)
+                    self.done = True
+                elif self._depth == 1:
+                    self._end_value(i + 1, events)
+            elif self._depth == 1:
+                if c == ":":
+                    self._expect = "value"
+                elif c == ",":
+                    self._end_value(i, events)
+                    self._expect = "key"
+                elif not c.isspace():
+                    # Number, true, false or null: ends at the next , or }
+                    self._begin_value(i)
+        return events
+
+    def _begin_value(self, i: int) -> None:
+        if self._depth == 1 and self._expect == "value":
+            self._value_start = i
+            self._expect = "end"
+
+    def _string_closed(self, end: int, events: List[Event]) -> None:
+        if self._depth == 1 and self._expect == "key":
+            self._key = _loads(self.text[self._string_start:end])
+        elif self._depth == 1 and self._value_start == self._string_start:
+            self._end_value(end, events)
+        elif self._depth == 2 and self._key == "hints" and self.text[self._value_start] == "[":
+            hint = _loads(self.text[self._string_start:end])
+            if isinstance(hint, str):
+                self.hints.append(hint)
+                events.append(("hint", len(self.hints) - 1, hint))
+
+    def _end_value(self, end: int, events: List[Event]) -> None:
+        """A top-level value that started at _value_start ends before `end`"""
+        if self._value_start is None:
+            return
+        raw = self.text[self._value_start:end]
+        self._value_start = None
+        if self._key is None or self._key == "hints":
+            # Hints were reported one by one
+            return
+        value = _loads(raw.strip())
+        if value is not None:
+            self.fields[self._key] = value
+            events.append(("field", self._key, value))
+
+
+def _loads(raw: str):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
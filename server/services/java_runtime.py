@@ -0,0 +1,109 @@
+"""
+Java execution on warm JVM workers
+Each worker is a JVM started ahead of time with javac already loaded; it
+compiles one program in memory and runs it in a fresh class loader, so a run
+pays neither JVM startup nor a separate javac process.
+"""
+import asyncio
+import os
+import shutil
+from typing import List, Optional
+
+from config import settings
+from services.resource_limits import limits_preexec
+from services.scratch_space import get_scratch_space
+from services.worker_pool import SandboxWorker, WorkerPool, lease_worker
+
+WORKER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "JavaWorker.java")
+WORKER_CLASS = "JavaWorker"
+
+_classes_dir: Optional[str] = None
+_classes_lock: Optional[asyncio.Lock] = None
+_pool: Optional[WorkerPool] = None
+
+
+def java_available() -> bool:
+    """True if the configured JDK executables are on the system"""
+    return bool(shutil.which(settings.JAVA_EXECUTABLE) and shutil.which(settings.JAVAC_EXECUTABLE))
+
+
+def jvm_options() -> List[str]:
+    """JVM flags for workers: bounded heap and fast startup over peak throughput"""
+    return [
+        f"-Xmx{settings.JAVA_HEAP_MB}m",
+        "-Xss8m",
+        "-XX:+UseSerialGC",
+        "-XX:TieredStopAtLevel=1",
+        "-XX:-UsePerfData",
+        "-Xshare:auto",
+        # Match the Python path's UTF-8 I/O whatever the host locale is
+        "-Dfile.encoding=UTF-8",
+        "-Dsun.stdout.encoding=UTF-8",
+        "-Dsun.stderr.encoding=UTF-8"
+    ]
+
+
+async def start_java_worker() -> SandboxWorker:
+    classes_dir = await _worker_classes()
+    command = [settings.JAVA_EXECUTABLE, *jvm_options(), "-cp", classes_dir, WORKER_CLASS]
+    # The JVM reserves far more address space than it uses, so the heap is
+    # bounded with -Xmx instead of RLIMIT_AS. Its dozens of threads would eat
+    # into the user-wide RLIMIT_NPROC allowance, so that isn't set either.
+    return await SandboxWorker.start(command, limits_preexec({"RLIMIT_AS": 0, "RLIMIT_NPROC": 0}))
+
+
+def get_java_pool() -> Optional[WorkerPool]:
+    """
+    Get the shared JVM pool, starting it on first use. None when pooling is disabled.
+    Must be called from the running event loop.
+    """
+    global _pool
+    if settings.JAVA_POOL_SIZE <= 0:
+        return None
+    if _pool is None:
+        _pool = WorkerPool(
+            size=settings.JAVA_POOL_SIZE,
+            start_worker=start_java_worker,
+            max_idle_seconds=settings.JAVA_POOL_MAX_IDLE_SECONDS
+        )
+    return _pool
+
+
+def lease_java_worker():
+    """Get a JVM worker for one run (see worker_pool.lease_worker)"""
+    return lease_worker(get_java_pool(), start_java_worker)
+
+
+async def shutdown_java_pool() -> None:
+    """Kill pooled JVMs (called on application shutdown)"""
+    global _pool, _classes_dir
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.shutdown()
+    # The compiled worker lives in the scratch root, which is removed next
+    _classes_dir = None
+
+
+async def _worker_classes() -> str:
+    """Compile JavaWorker.java into the scratch root once per process"""
+    global _classes_dir, _classes_lock
+    if _classes_dir:
+        return _classes_dir
+    if _classes_lock is None:
+        _classes_lock = asyncio.Lock()
+    async with _classes_lock:
+        if _classes_dir:
+            return _classes_dir
+        target = os.path.join(get_scratch_space().root, "java_worker")
+        os.makedirs(target, exist_ok=True)
+        process = await asyncio.create_subprocess_exec(
+            settings.JAVAC_EXECUTABLE, "-d", target, WORKER_SOURCE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        output, _ = await process.communicate()
+        if process.returncode != 0:
+            # Raised as OSError so the pool's refill loop logs it and backs off
+            raise OSError(f"Failed to compile {WORKER_CLASS}: {output.decode(errors='replace')}")
+        _classes_dir = target
+    return _classes_dir
@@ -0,0 +1,357 @@
+"""
+Job-queue execution mode
+With EXECUTION_MODE=queue, runs are submitted as jobs instead of being executed
+inside the HTTP request. Execution worker processes consume the queue and send
+results back; clients poll (or long-poll) for them. The broker is the only thing
+the API and the workers share, so a networked broker can replace the local one
+to run workers on other machines.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from config import settings
+
+STOP_JOB = {"type": "stop"}
+
+# How often the API side looks for expired and lost jobs
+SWEEP_INTERVAL_SECONDS = 1.0
+
+
+class JobBroker:
+    """
+    Transport between the API and execution workers
+    Jobs are dicts with `id`, `code`, `language`, `input` and `user` (id and
+    role, for fair-share scheduling in the worker). Workers publish
+    ("running", job_id, None) and ("done", job_id, result) events. All methods
+    may block; the API calls them from a thread.
+    """
+
+    def submit(self, job: dict) -> None:
+        raise NotImplementedError
+
+    def next_job(self, timeout: float) -> Optional[dict]:
+        """Next job for a worker, or None if nothing arrived within `timeout`"""
+        raise NotImplementedError
+
+    def publish(self, event: tuple) -> None:
+        raise NotImplementedError
+
+    def next_event(self, timeout: float) -> Optional[tuple]:
+        """Next worker event for the API, or None if nothing arrived within `timeout`"""
+        raise NotImplementedError
+
+
+class LocalBroker(JobBroker):
+    """Broker for worker processes on this machine, over multiprocessing queues"""
+
+    def __init__(self):
+        context = multiprocessing.get_context("spawn")
+        self._jobs = context.Queue()
+        self._events = context.Queue()
+
+    def submit(self, job: dict) -> None:
+        self._jobs.put(job)
+
+    def next_job(self, timeout: float) -> Optional[dict]:
+        try:
+            return self._jobs.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def publish(self, event: tuple) -> None:
+        self._events.put(event)
+
+    def next_event(self, timeout: float) -> Optional[tuple]:
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def create_broker() -> JobBroker:
+    """Broker named by JOB_BROKER"""
+    if settings.JOB_BROKER == "local":
+        return LocalBroker()
+    raise ValueError(f"Unknown job broker: {settings.JOB_BROKER}")
+
+
+class JobManager:
+    """
+    API-side view of the queue: submits jobs, tracks their status and keeps
+    finished results for JOB_RESULT_TTL_SECONDS.
+    `on_done` callbacks run in the API process when a result arrives, for work
+    that needs the API's state (hints, saving submissions). Each runs in its own
+    task, bounded by REQUEST_DEADLINE_SECONDS, so a slow one (an LLM call)
+    doesn't hold up delivery of other jobs' results; its job stays "running"
+    until it returns.
+    """
+
+    def __init__(self, broker: JobBroker, worker_count: int, worker_concurrency: int):
+        self.broker = broker
+        self.worker_count = worker_count
+        self.worker_concurrency = worker_concurrency
+        self.submitted = 0
+        self.completed = 0
+        self.lost = 0
+        self._jobs: Dict[str, dict] = {}
+        self._done_events: Dict[str, asyncio.Event] = {}
+        self._on_done: Dict[str, Callable[[dict], Awaitable[dict]]] = {}
+        self._workers: List[multiprocessing.Process] = []
+        self._listener: Optional[asyncio.Task] = None
+        self._post_processing: Set[asyncio.Task] = set()
+        self._last_sweep = time.monotonic()
+
+    def start(self) -> None:
+        """Start the worker processes and the result listener"""
+        context = multiprocessing.get_context("spawn")
+        for _ in range(self.worker_count):
+            worker = context.Process(
+                target=worker_main, args=(self.broker, self.worker_concurrency), daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    def submit(
+        self,
+        code: str,
+        language: str,
+        user_input: str,
+        owner_id: Optional[str] = None,
+        on_done: Optional[Callable[[dict], Awaitable[dict]]] = None,
+        user: Optional[dict] = None
+    ) -> dict:
+        """Queue a run for `user` (None = anonymous, for scheduling); returns the job record"""
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "owner_id": owner_id,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None
+        }
+        self._jobs[job_id] = job
+        self._done_events[job_id] = asyncio.Event()
+        if on_done:
+            self._on_done[job_id] = on_done
+        self.broker.submit({
+            "id": job_id,
+            "code": code,
+            "language": language,
+            "input": user_input,
+            "user": {"id": user["id"], "role": user.get("role")} if user else None
+        })
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Wait up to `timeout` seconds for a job to finish; returns its record"""
+        done = self._done_events.get(job_id)
+        if done:
+            try:
+                await asyncio.wait_for(done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "workers": self.worker_count,
+            "workers_alive": sum(1 for worker in self._workers if worker.is_alive()),
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "lost": self.lost
+        }
+
+    async def shutdown(self) -> None:
+        """Stop the listener and ask workers to finish their current jobs and exit"""
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        for task in self._post_processing:
+            task.cancel()
+        await asyncio.gather(*self._post_processing, return_exceptions=True)
+        for _ in self._workers:
+            self.broker.submit(STOP_JOB)
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            await loop.run_in_executor(None, worker.join, settings.EXECUTION_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers.clear()
+
+    async def _listen(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await loop.run_in_executor(None, self.broker.next_event, SWEEP_INTERVAL_SECONDS)
+            if event:
+                self._handle(*event)
+            if time.monotonic() - self._last_sweep >= SWEEP_INTERVAL_SECONDS:
+                self._last_sweep = time.monotonic()
+                self._sweep()
+
+    def _handle(self, kind: str, job_id: str, result: Optional[dict]) -> None:
+        job = self._jobs.get(job_id)
+        if not job or job["status"] in ("done", "failed"):
+            return
+        if kind == "running":
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            return
+
+        on_done = self._on_done.pop(job_id, None)
+        if on_done:
+            job["status"] = "running"
+            task = asyncio.ensure_future(self._post_process(job, on_done, result))
+            self._post_processing.add(task)
+            task.add_done_callback(self._post_processing.discard)
+            return
+        self._finish(job, "done", result)
+        self.completed += 1
+
+    async def _post_process(self, job: dict, on_done: Callable[[dict], Awaitable[dict]], result: dict) -> None:
+        """Run a job's on_done callback, then finish it (with the bare result if the callback fails)"""
+        try:
+            result = await asyncio.wait_for(on_done(result), settings.REQUEST_DEADLINE_SECONDS or None)
+        except asyncio.TimeoutError:
+            print(f"Job {job['id']} post-processing timed out")
+        except Exception as e:
+            print(f"Job {job['id']} post-processing error: {e}")
+        if job["status"] in ("done", "failed"):
+            # Swept as lost while the callback ran
+            return
+        self._finish(job, "done", result)
+        self.completed += 1
+
+    def _finish(self, job: dict, status: str, result: dict) -> None:
+        job["status"] = status
+        job["result"] = result
+        job["finished_at"] = time.time()
+        self._done_events.pop(job["id"]).set()
+
+    def _sweep(self) -> None:
+        """Drop expired results and fail jobs that no worker finished in time"""
+        now = time.time()
+        for job in list(self._jobs.values()):
+            if job["finished_at"] is not None:
+                if now - job["finished_at"] > settings.JOB_RESULT_TTL_SECONDS:
+                    del self._jobs[job["id"]]
+            elif now - job["created_at"] > settings.JOB_TIMEOUT_SECONDS:
+                self._on_done.pop(job["id"], None)
+                self._finish(job, "failed", _lost_job_result())
+                self.lost += 1
+
+
+def _lost_job_result() -> dict:
+    return {
+        "success": False,
+        "output": "",
+        "compilation_result": "The job was not finished in time. Execution workers may be overloaded; please try again.",
+        "execution_time": 0,
+        "status": "runtime_error"
+    }
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> Optional[JobManager]:
+    """
+    Get the job manager, starting workers on first use. None unless
+    EXECUTION_MODE is "queue". Must be called from the running event loop.
+    """
+    global _manager
+    if settings.EXECUTION_MODE != "queue":
+        return None
+    if _manager is None:
+        _manager = JobManager(
+            broker=create_broker(),
+            worker_count=settings.JOB_WORKERS or os.cpu_count() or 1,
+            worker_concurrency=settings.JOB_WORKER_CONCURRENCY
+        )
+        _manager.start()
+    return _manager
+
+
+async def shutdown_job_manager() -> None:
+    """Stop execution workers (called on application shutdown)"""
+    global _manager
+    if _manager is not None:
+        manager, _manager = _manager, None
+        await manager.shutdown()
+
+
+# ========== Worker process ==========
+
+def worker_main(broker: JobBroker, concurrency: int) -> None:
+    """Entry point of an execution worker process"""
+    try:
+        asyncio.run(_consume(broker, concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _consume(broker: JobBroker, concurrency: int) -> None:
+    # Imported here: the API process only needs the queue side of this module
+    from services.code_service import run_code
+    from services.executor import set_requester
+    from services.java_runtime import shutdown_java_pool
+    from services.scratch_space import close_scratch_space
+    from services.sandbox_backend import get_sandbox_backend, shutdown_sandbox_backend
+
+    get_sandbox_backend().start()
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    running = set()
+
+    async def run_job(job: dict) -> None:
+        try:
+            set_requester(job.get("user"))
+            broker.publish(("running", job["id"], None))
+            result = await run_code(job["code"], job["language"], job["input"])
+        except Exception as e:
+            print(f"Job {job['id']} failed in worker {os.getpid()}: {e}")
+            result = {
+                "success": False,
+                "output": "",
+                "compilation_result": "Internal error while running the job",
+                "execution_time": 0,
+                "status": "runtime_error"
+            }
+        finally:
+            slots.release()
+        broker.publish(("done", job["id"], result))
+
+    try:
+        while True:
+            # Only take a job when there is capacity to start it
+            await slots.acquire()
+            job = await loop.run_in_executor(None, broker.next_job, SWEEP_INTERVAL_SECONDS)
+            if job is None:
+                slots.release()
+                continue
+            if job == STOP_JOB:
+                break
+            task = loop.create_task(run_job(job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    finally:
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        await shutdown_sandbox_backend()
+        await shutdown_java_pool()
+        close_scratch_space()
+
@@ -0,0 +1,156 @@
+"""
+Async client for the hint LLM
+All hint calls share one HTTP connection pool and a cap on calls in flight.
+Each attempt has a timeout, and timeouts, connection errors, rate limiting and
+server errors are retried with jittered exponential backoff. Neither outlasts
+the current request's deadline (see deadline.py).
+"""
+import asyncio
+import random
+from typing import AsyncIterator, List, Optional
+
+import httpx
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
+
+from config import settings
+from services.deadline import remaining_budget
+from services.prompt_builder import estimate_message_tokens
+
+# APITimeoutError is an APIConnectionError
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+# Backoff before retry n is uniform in [0, min(MAX, BASE * 2**n)] ("full jitter")
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 8.0
+
+# Idle keep-alive connections are closed after this long
+KEEPALIVE_EXPIRY_SECONDS = 30.0
+
+
+class LLMClient:
+    """Chat completions over a shared connection pool, at most `max_concurrency` at once"""
+
+    def __init__(self, api_key: str, timeout_seconds: float, max_retries: int, max_concurrency: int):
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.prompt_tokens = 0  # estimated, over all attempts
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=max_concurrency,
+            max_keepalive_connections=max_concurrency,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS
+        ))
+        # Retries are done here, where they can be jittered and kept within the deadline
+        self._client = AsyncOpenAI(api_key=api_key, http_client=self._http, max_retries=0)
+
+    async def complete(self, model: str, messages: List[dict], temperature: float, max_tokens: int) -> str:
+        """
+        Text of one chat completion
+        Raises asyncio.TimeoutError if the deadline leaves no time for an
+        attempt, or the last error once retries run out.
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self._slots:
+                    response = await self._create(model, messages, temperature, max_tokens, stream=False)
+                return response.choices[0].message.content or ""
+            except RETRYABLE_ERRORS:
+                delay = self._retry_delay(attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def stream(
+        self, model: str, messages: List[dict], temperature: float, max_tokens: int
+    ) -> AsyncIterator[str]:
+        """
+        Text of one chat completion, piece by piece as the model produces it
+        Only opening the stream is retried; an error after text has been
+        yielded propagates. The per-attempt timeout applies between pieces.
+        """
+        attempt = 0
+        while True:
+            async with self._slots:
+                try:
+                    stream = await self._create(model, messages, temperature, max_tokens, stream=True)
+                except RETRYABLE_ERRORS:
+                    delay = self._retry_delay(attempt)
+                    if delay is None:
+                        raise
+                else:
+                    try:
+                        async for chunk in stream:
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                yield chunk.choices[0].delta.content
+                    finally:
+                        await stream.response.aclose()
+                    return
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _create(self, model: str, messages: List[dict], temperature: float, max_tokens: int, stream: bool):
+        timeout = remaining_budget(self.timeout_seconds)
+        if timeout <= 0:
+            raise asyncio.TimeoutError
+        self.calls += 1
+        self.prompt_tokens += estimate_message_tokens(messages)
+        return await self._client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=stream,
+            timeout=timeout
+        )
+
+    def _retry_delay(self, attempt: int) -> Optional[float]:
+        """Backoff before retrying after failed attempt number `attempt`, or None to give up"""
+        delay = random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+        # Give up if the deadline would pass while backing off
+        if attempt >= self.max_retries or remaining_budget(delay + 1) <= delay:
+            self.failures += 1
+            return None
+        self.retries += 1
+        return delay
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "prompt_tokens": self.prompt_tokens
+        }
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+
+_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> Optional[LLMClient]:
+    """Get the shared client, or None when no API key is configured"""
+    global _client
+    if not settings.OPENAI_API_KEY:
+        return None
+    if _client is None:
+        _client = LLMClient(
+            api_key=settings.OPENAI_API_KEY,
+            timeout_seconds=settings.HINT_LLM_TIMEOUT_SECONDS,
+            max_retries=settings.HINT_LLM_MAX_RETRIES,
+            max_concurrency=settings.HINT_LLM_MAX_CONCURRENCY
+        )
+    return _client
+
+
+async def close_llm_client() -> None:
+    """Close pooled connections (called on application shutdown)"""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.close()
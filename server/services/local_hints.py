@@ -0,0 +1,486 @@
+"""
+Local hint engine
+Parses a CPython traceback (or one of the server's own limit messages) into
+the exception class, its message, the line in the student's file and that
+line's source, then answers from a table of exception-specific hint
+templates: one dict lookup and a couple of regular expressions, no LLM call.
+Errors without a template are left to the LLM.
+"""
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+# File names of the student's code in tracebacks: runs, the static pre-check, REPL cells
+STUDENT_FILES = ("main.py", "<main.py>")
+STUDENT_CELL_PREFIX = "<cell "
+
+_FRAME = re.compile(r'^\s*File "(?P<file>[^"]+)", line (?P<line>\d+)')
+_EXCEPTION = re.compile(r"^(?P<name>[A-Za-z_][\w.]*)(?::\s?(?P<message>.*))?$")
+# Markers under the source line: caret lines (3.11+) and "[Previous line repeated ...]"
+_MARKER = re.compile(r"^\s*(?:[~^]+\s*|\[Previous line repeated .*\])$")
+
+# Messages the execution service writes itself, as pseudo exception names
+_LIMIT_MESSAGES = (
+    (re.compile(r"^CPU time limit exceeded"), "CPUTimeLimit"),
+    (re.compile(r"^Execution exceeded the \d+s real-time limit"), "RealTimeLimit"),
+    (re.compile(r"^Output limit exceeded"), "OutputLimit"),
+)
+
+# gcc/g++/javac diagnostics: "main.c:3:5: error: ..." and "Main.java:3: error: ..."
+_COMPILER_DIAGNOSTIC = re.compile(r"^\S+:\d+(?::\d+)?: error:", re.MULTILINE)
+# Java exceptions and failures described by the execution service
+_RUNTIME_FAILURE = re.compile(r"^Exception in thread|^Program terminated by|^Program exited with code", re.MULTILINE)
+
+
+class ParsedError(NamedTuple):
+    exception: str  # class name without its module, e.g. "IndexError"
+    message: str
+    line: Optional[int]  # in the student's code, if the traceback points there
+    source: str  # that line, stripped ("" if unknown)
+
+
+class HintTemplate(NamedTuple):
+    error_type: str
+    hints: Tuple[str, str, str]  # vague to specific; may use {line}, {source} and the message's groups
+    root_cause: str
+    minimal_patch: str
+    concepts: Tuple[Tuple[str, str], ...]  # (title, url)
+
+
+def parse_error(error: str, code: str = "") -> Optional[ParsedError]:
+    """The exception a traceback ends with, or None if `error` isn't one"""
+    text = error.strip()
+    if not text:
+        return None
+    for pattern, name in _LIMIT_MESSAGES:
+        if pattern.match(text):
+            return ParsedError(name, text, None, "")
+
+    lines = text.splitlines()
+    last = lines[-1]
+    match = _EXCEPTION.match(last)
+    frames = [(i, _FRAME.match(line)) for i, line in enumerate(lines)]
+    frames = [(i, m) for i, m in frames if m]
+    if not match or (not frames and not last.startswith(tuple(TEMPLATES))):
+        return None
+
+    line_number = None
+    source = ""
+    student_frames = [(i, m) for i, m in frames if _is_student_file(m.group("file"))]
+    if student_frames:
+        # Innermost frame in the student's code: where their code went wrong
+        index, frame = student_frames[-1]
+        line_number = int(frame.group("line"))
+        following = lines[index + 1] if index + 1 < len(lines) else ""
+        if following.startswith("    ") and not _FRAME.match(following) and not _MARKER.match(following):
+            source = following.strip()
+        elif code:
+            code_lines = code.splitlines()
+            if 0 < line_number <= len(code_lines):
+                source = code_lines[line_number - 1].strip()
+
+    return ParsedError(
+        match.group("name").rsplit(".", 1)[-1],
+        (match.group("message") or "").strip(),
+        line_number,
+        source
+    )
+
+
+def student_lines(error: str) -> List[int]:
+    """Lines of the student's code a traceback points at, outermost frame first"""
+    lines = []
+    for line in error.splitlines():
+        frame = _FRAME.match(line)
+        if frame and _is_student_file(frame.group("file")):
+            lines.append(int(frame.group("line")))
+    return lines
+
+
+def _is_student_file(filename: str) -> bool:
+    return os.path.basename(filename) in STUDENT_FILES or filename.startswith(STUDENT_CELL_PREFIX)
+
+
+def local_hints(code: str, language: str, error: str) -> Optional[dict]:
+    """Hints for a recognized error (same fields as hint_service.generate_hints), else None"""
+    if language != "python" and not any(pattern.match(error.strip()) for pattern, _ in _LIMIT_MESSAGES):
+        return None
+    parsed = parse_error(error, code)
+    if parsed is None:
+        return None
+    variants = TEMPLATES.get(parsed.exception)
+    if not variants:
+        return None
+    for pattern, template in variants:
+        match = pattern.search(parsed.message) if pattern else None
+        if pattern is None or match:
+            break
+    else:
+        return None
+
+    values = {
+        "line": parsed.line or "?",
+        "source": parsed.source or "the line in the error",
+        "message": parsed.message
+    }
+    if match:
+        values.update({k: v for k, v in match.groupdict().items() if v is not None})
+    root_cause = template.root_cause.format(**values)
+    if parsed.line:
+        root_cause += f" (line {parsed.line})"
+    return {
+        "error_type": template.error_type,
+        "hints": [hint.format(**values) for hint in template.hints],
+        "root_cause": root_cause,
+        "concept_references": [{"title": title, "url": url} for title, url in template.concepts],
+        "minimal_patch": template.minimal_patch.format(**values)
+    }
+
+
+def error_kind(code: str, error: str) -> str:
+    """Broad error_type ("syntax", "runtime", "logical" or "none") for errors without a template"""
+    if not error.strip():
+        return "none"
+    if _COMPILER_DIAGNOSTIC.search(error):
+        return "syntax"
+    if parse_error(error, code) or _RUNTIME_FAILURE.search(error):
+        return "runtime"
+    # Ran to completion but failed some other way (e.g. wrong output)
+    return "logical"
+
+
+_DOCS = "https://docs.python.org/3/"
+_ERRORS = (("Errors and Exceptions", _DOCS + "tutorial/errors.html"),)
+_SYNTAX = (("Python Syntax", _DOCS + "reference/lexical_analysis.html"),)
+
+
+def _variants(*pairs: Tuple[Optional[str], HintTemplate]) -> List[Tuple[Optional[Pattern], HintTemplate]]:
+    return [(re.compile(pattern) if pattern else None, template) for pattern, template in pairs]
+
+
+# Exception name -> (message pattern, template) in order; a None pattern matches any message
+TEMPLATES: Dict[str, List[Tuple[Optional[Pattern], HintTemplate]]] = {
+    "SyntaxError": _variants(
+        (r"expected ':'", HintTemplate(
+            "syntax",
+            ("Look at line {line}: how does Python know a block is about to start?",
+             "Statements like if, for, while, def and class introduce an indented block",
+             "The header `{source}` is missing the character that ends a block header"),
+            "A block header is missing its ending colon",
+            "End the statement that opens the block the way Python requires, then indent the block below it",
+            _SYNTAX
+        )),
+        (r"was never closed|unmatched|does not match", HintTemplate(
+            "syntax",
+            ("Count the brackets around line {line}",
+             "Every (, [ and {{ needs a matching closing character of the same kind",
+             "Something in `{source}` opens or closes a bracket that has no partner"),
+            "Brackets or parentheses are not balanced",
+            "Find the bracket that is opened but not closed (or closed twice) and balance it",
+            _SYNTAX
+        )),
+        (r"unterminated string|EOL while scanning", HintTemplate(
+            "syntax",
+            ("Look at the text values on line {line}",
+             "A string must end with the same kind of quote it starts with",
+             "A quote in `{source}` is never closed"),
+            "A string literal is not closed",
+            "Close the string with the matching quote character",
+            _SYNTAX
+        )),
+        (r"invalid syntax\. Maybe you meant '==' or ':='|cannot assign to", HintTemplate(
+            "syntax",
+            ("Line {line} tries to store a value somewhere it can't go",
+             "= stores a value; == compares two values",
+             "Check whether `{source}` should be a comparison instead of an assignment"),
+            "Assignment used where a comparison (or a valid target) is expected",
+            "Decide whether the line compares or assigns, and use the matching operator",
+            _SYNTAX
+        )),
+        (None, HintTemplate(
+            "syntax",
+            ("Python could not understand line {line} (or the line just before it)",
+             "Check colons, brackets, quotes and operators on and around that line",
+             "Compare `{source}` with the general form of that kind of statement"),
+            "The code does not follow Python's grammar: {message}",
+            "Fix the statement at the reported position; the caret in the error points at where parsing failed",
+            _SYNTAX
+        )),
+    ),
+    "IndentationError": _variants((None, HintTemplate(
+        "syntax",
+        ("Look at how line {line} is indented compared to the lines around it",
+         "In Python, indentation decides which block a line belongs to",
+         "Line {line} is indented differently from what its block expects: {message}"),
+        "The indentation does not match the block structure",
+        "Indent the line to the same level as the other lines of its block (after a colon, indent one level deeper)",
+        (("Indentation", _DOCS + "reference/lexical_analysis.html#indentation"),)
+    ))),
+    "TabError": _variants((None, HintTemplate(
+        "syntax",
+        ("Look at the whitespace at the start of line {line}",
+         "Tabs and spaces look alike but Python counts them differently",
+         "Re-indent the block around line {line} using only spaces"),
+        "Tabs and spaces are mixed in the indentation",
+        "Use one kind of indentation (4 spaces) throughout the file",
+        (("Indentation", _DOCS + "reference/lexical_analysis.html#indentation"),)
+    ))),
+    "NameError": _variants((r"name '(?P<name>[^']+)' is not defined", HintTemplate(
+        "runtime",
+        ("Python doesn't know what `{name}` is when line {line} runs",
+         "A name must be assigned, defined or imported before it is used - and spelled the same way",
+         "Check where `{name}` is created: is it misspelled, defined later, only inside another function, or a string missing quotes?"),
+        "`{name}` is used before it has been given a value",
+        "Define or import `{name}` before line {line}, or fix its spelling to match where it is defined",
+        (("Names and binding", _DOCS + "reference/executionmodel.html#naming-and-binding"),) + _ERRORS
+    ))),
+    "UnboundLocalError": _variants((r"'(?P<name>[^']+)'", HintTemplate(
+        "runtime",
+        ("`{name}` exists outside the function, so why can't line {line} see it?",
+         "Assigning to a name anywhere in a function makes it local to the whole function",
+         "The function assigns to `{name}`, so reading it before that assignment fails"),
+        "`{name}` is treated as a local variable and read before it is assigned",
+        "Give `{name}` a value inside the function before reading it, or pass it in as a parameter and return the new value",
+        (("Scopes", _DOCS + "tutorial/classes.html#python-scopes-and-namespaces"),)
+    ))),
+    "TypeError": _variants(
+        (r"can only concatenate str \(not \"(?P<other>\w+)\"\) to str|unsupported operand type\(s\) for \+: 'int' and 'str'", HintTemplate(
+            "runtime",
+            ("Look at the values being combined on line {line}",
+             "Text and numbers can't be added together directly",
+             "In `{source}`, one side is a string and the other is a number; convert one of them first"),
+            "A string and a number are combined with +",
+            "Convert the number to text (or the text to a number) so both sides have the same type",
+            (("Strings", _DOCS + "tutorial/introduction.html#text"),) + _ERRORS
+        )),
+        (r"unsupported operand type\(s\) for (?P<op>\S+): '(?P<left>\w+)' and '(?P<right>\w+)'", HintTemplate(
+            "runtime",
+            ("Check the types of the values on line {line}",
+             "The {op} operator doesn't work between a {left} and a {right}",
+             "Find where the {left} or {right} value in `{source}` comes from and convert it"),
+            "The {op} operator is used with incompatible types ({left} and {right})",
+            "Make both operands the type the operation needs before applying {op}",
+            _ERRORS
+        )),
+        (r"'(?P<kind>\w+)' object is not callable", HintTemplate(
+            "runtime",
+            ("Line {line} calls something with ( ) that isn't a function",
+             "A {kind} value can't be called; maybe a variable reused a function's name",
+             "Check whether a name in `{source}` was assigned a {kind} earlier, hiding the function"),
+            "A {kind} value is called as if it were a function",
+            "Rename the variable that shadows the function, or remove the parentheses if no call was intended",
+            _ERRORS
+        )),
+        (r"'(?P<kind>\w+)' object is not subscriptable", HintTemplate(
+            "runtime",
+            ("Line {line} uses [ ] on a value that doesn't support it",
+             "Only sequences and mappings (lists, strings, dicts...) can be indexed; this value is a {kind}",
+             "Check what the value indexed in `{source}` really holds at that point"),
+            "A {kind} value is indexed with [ ]",
+            "Index the list or dict itself, not a {kind} - check the variable's value before this line",
+            _ERRORS
+        )),
+        (r"missing (?P<count>\d+) required positional argument", HintTemplate(
+            "runtime",
+            ("Compare the call on line {line} with the function's definition",
+             "The function needs {count} more argument(s) than the call provides",
+             "Count the parameters in the def line and the arguments in `{source}`"),
+            "A function is called with too few arguments",
+            "Pass every required argument in the call, in the order the function expects",
+            (("Defining functions", _DOCS + "tutorial/controlflow.html#defining-functions"),)
+        )),
+        (r"takes (?P<expected>\d+) positional arguments? but (?P<given>\d+) (?:was|were) given", HintTemplate(
+            "runtime",
+            ("Compare the call on line {line} with the function's definition",
+             "The function takes {expected} argument(s) but the call passes {given}",
+             "For methods, remember that `self` counts as the first parameter"),
+            "A function is called with the wrong number of arguments",
+            "Make the call's arguments match the function's parameters",
+            (("Defining functions", _DOCS + "tutorial/controlflow.html#defining-functions"),)
+        )),
+        (None, HintTemplate(
+            "runtime",
+            ("A value on line {line} has a different type than the operation expects",
+             "Read the message closely: it names the types involved",
+             "Print the type() of each value used in `{source}` just before that line"),
+            "An operation got a value of the wrong type: {message}",
+            "Convert the value to the type the operation needs, or use an operation that suits its type",
+            _ERRORS
+        )),
+    ),
+    "ValueError": _variants(
+        (r"invalid literal for int\(\) with base \d+: (?P<value>.*)", HintTemplate(
+            "runtime",
+            ("Line {line} turns text into a number, but the text isn't a whole number",
+             "int() only accepts text made of digits (no spaces, decimals or words); it got {value}",
+             "Check the input your program receives and what `{source}` passes to int()"),
+            "Text that is not a whole number is converted with int()",
+            "Make sure the text is a valid integer before converting it (strip spaces, use float() for decimals, or read the right value)",
+            (("Built-in int()", _DOCS + "library/functions.html#int"),) + _ERRORS
+        )),
+        (r"could not convert string to float", HintTemplate(
+            "runtime",
+            ("Line {line} turns text into a number, but the text isn't numeric",
+             "float() needs text like '3.5'; anything else fails",
+             "Check the value passed to float() in `{source}`"),
+            "Text that is not a number is converted with float()",
+            "Convert only text that holds a number - check the input first",
+            (("Built-in float()", _DOCS + "library/functions.html#float"),) + _ERRORS
+        )),
+        (r"not enough values to unpack|too many values to unpack", HintTemplate(
+            "runtime",
+            ("Line {line} splits a value into several variables",
+             "The number of variables on the left must equal the number of items on the right",
+             "Count the items produced in `{source}` and the names they are assigned to"),
+            "Unpacking a sequence into the wrong number of variables",
+            "Make the number of variables match the number of items (or check how the value was split)",
+            _ERRORS
+        )),
+        (None, HintTemplate(
+            "runtime",
+            ("A function on line {line} received a value it can't work with",
+             "The type is right but the value itself is not allowed",
+             "Print the value used in `{source}` before that line"),
+            "A value was rejected: {message}",
+            "Check the value before passing it on, and handle the case it can't accept",
+            _ERRORS
+        )),
+    ),
+    "IndexError": _variants((None, HintTemplate(
+        "runtime",
+        ("Line {line} reads a position that doesn't exist",
+         "Positions start at 0, so the last valid index is len(...) - 1",
+         "Check the index used in `{source}` against the sequence's length - especially loop bounds"),
+        "An index is outside the sequence's range",
+        "Keep the index between 0 and len(sequence) - 1, or check the length before indexing",
+        (("Lists", _DOCS + "tutorial/introduction.html#lists"),) + _ERRORS
+    ))),
+    "KeyError": _variants((r"(?P<key>.+)", HintTemplate(
+        "runtime",
+        ("Line {line} looks up a key that isn't in the dictionary",
+         "The key {key} was never added (check its spelling and type: '1' and 1 differ)",
+         "Print the dictionary's keys before `{source}`"),
+        "The dictionary has no key {key}",
+        "Add the key before reading it, or use .get() / an `in` check for keys that may be missing",
+        (("Dictionaries", _DOCS + "tutorial/datastructures.html#dictionaries"),) + _ERRORS
+    ))),
+    "AttributeError": _variants(
+        (r"'NoneType' object has no attribute '(?P<attr>[^']+)'", HintTemplate(
+            "runtime",
+            ("The value used on line {line} is None",
+             "Functions without a return statement return None, as do methods like list.sort()",
+             "Find where the value in `{source}` came from - did something return None instead of a result?"),
+            "An attribute (`{attr}`) is read from None",
+            "Make sure the value is what you expect before using `.{attr}`; keep the result, not the return value of an in-place method",
+            _ERRORS
+        )),
+        (r"'(?P<kind>\w+)' object has no attribute '(?P<attr>[^']+)'", HintTemplate(
+            "runtime",
+            ("Line {line} uses `.{attr}` on a value that doesn't have it",
+             "A {kind} has no `{attr}`; check the spelling or whether the value is the type you think",
+             "Look up which methods a {kind} has and compare with `{source}`"),
+            "`{attr}` does not exist on a {kind}",
+            "Use a method that {kind} provides, or convert the value to the type that has `{attr}`",
+            _ERRORS
+        )),
+        (None, HintTemplate(
+            "runtime",
+            ("Line {line} uses an attribute that doesn't exist",
+             "Check the spelling and the type of the value before the dot",
+             "Print type() of the value used in `{source}`"),
+            "Missing attribute: {message}",
+            "Use an attribute that the value's type actually has",
+            _ERRORS
+        )),
+    ),
+    "ZeroDivisionError": _variants((None, HintTemplate(
+        "runtime",
+        ("Line {line} divides by something that is zero",
+         "Think about which value ends up as the divisor and when it can be 0",
+         "Check the right-hand side of /, // or % in `{source}` - e.g. an empty list's length"),
+        "Division (or modulo) by zero",
+        "Handle the zero case before dividing, or make sure the divisor can't be 0",
+        _ERRORS
+    ))),
+    "RecursionError": _variants((None, HintTemplate(
+        "logical",
+        ("A function keeps calling itself without stopping",
+         "Every recursive function needs a base case that returns without recursing",
+         "Check that each recursive call moves closer to the base case"),
+        "Recursion never reaches a base case",
+        "Add (or fix) the base case, and make sure the argument changes toward it on every call",
+        (("Defining functions", _DOCS + "tutorial/controlflow.html#defining-functions"),)
+    ))),
+    "ModuleNotFoundError": _variants((r"No module named '(?P<module>[^']+)'", HintTemplate(
+        "runtime",
+        ("Line {line} imports `{module}`, which isn't available here",
+         "Check the module name's spelling; only the standard library is installed",
+         "If `{module}` is a third-party package, solve the task without it"),
+        "The module `{module}` is not installed",
+        "Fix the module name or use a standard-library alternative",
+        (("Modules", _DOCS + "tutorial/modules.html"),)
+    ))),
+    "ImportError": _variants((None, HintTemplate(
+        "runtime",
+        ("The import on line {line} failed",
+         "The module exists but doesn't provide the name you're importing",
+         "Check the spelling of the name after `import` in `{source}`"),
+        "An import failed: {message}",
+        "Import a name the module actually defines",
+        (("Modules", _DOCS + "tutorial/modules.html"),)
+    ))),
+    "EOFError": _variants((None, HintTemplate(
+        "runtime",
+        ("Your program asked for input that wasn't given",
+         "Each input() call reads one line; the program read more lines than the input had",
+         "Count the input() calls (including those in loops) and the lines in the input box"),
+        "input() was called after all the provided input was used up",
+        "Provide enough input lines, or read exactly as many lines as the task supplies",
+        (("Built-in input()", _DOCS + "library/functions.html#input"),)
+    ))),
+    "FileNotFoundError": _variants((None, HintTemplate(
+        "runtime",
+        ("Line {line} opens a file that doesn't exist",
+         "Programs here run in an empty directory",
+         "Read data from input() instead, or create the file before opening it for reading"),
+        "A file is opened for reading but does not exist",
+        "Only open files your program created, or read the data from standard input",
+        (("Reading and writing files", _DOCS + "tutorial/inputoutput.html#reading-and-writing-files"),)
+    ))),
+    "AssertionError": _variants((None, HintTemplate(
+        "logical",
+        ("The assert on line {line} found a condition that is false",
+         "An assert checks something the code assumes is always true",
+         "Print the values in `{source}` just before it to see which assumption fails"),
+        "An assertion failed",
+        "Fix the code that produces the unexpected value (not the assert itself)",
+        _ERRORS
+    ))),
+    "CPUTimeLimit": _variants((None, HintTemplate(
+        "logical",
+        ("Your program kept running until it hit the time limit",
+         "Look for a loop whose condition never becomes false",
+         "Check that every while loop changes the variable its condition depends on"),
+        "The program never finishes (most likely an infinite loop)",
+        "Make sure each loop moves toward its exit condition, and that recursion has a base case",
+        (("while statements", _DOCS + "reference/compound_stmts.html#the-while-statement"),)
+    ))),
+    "RealTimeLimit": _variants((None, HintTemplate(
+        "logical",
+        ("Your program stopped making progress until it hit the time limit",
+         "A program that waits (sleep, input, a blocked read) can run out of time without using the CPU",
+         "Check for time.sleep() calls and for input() calls that expect more input than given"),
+        "The program was waiting, not computing, when it ran out of time",
+        "Remove long sleeps and make sure the program only reads input that is provided",
+        (("Built-in input()", _DOCS + "library/functions.html#input"),)
+    ))),
+    "OutputLimit": _variants((None, HintTemplate(
+        "logical",
+        ("Your program printed far more than expected",
+         "A print inside a loop that never ends produces endless output",
+         "Check the loops around your print() calls and their exit conditions"),
+        "The program prints without stopping",
+        "Make sure the loop that prints ends, and print only what the task asks for",
+        (("while statements", _DOCS + "reference/compound_stmts.html#the-while-statement"),)
+    ))),
+}
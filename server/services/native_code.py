@@ -0,0 +1,391 @@
+"""
+C and C++ execution
+Programs are compiled once and the binary is kept in a content-addressed cache,
+so running the same source again (e.g. with new input) skips the compiler.
+Each run is started under a small runner (native_runner.c, built once per
+process) that reaps the program with wait4 and reports its resource usage.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from config import settings
+from services.executor import get_engine
+from services.resource_limits import current_limits, limits_preexec, set_cpu_limit
+from services.scratch_space import get_scratch_space
+
+BINARY_NAME = "main"
+ARTIFACT_DIR_NAME = "tracecode_artifacts"
+
+RUNNER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "native_runner.c")
+RUNNER_NAME = "native_runner"
+
+
+def compiled_languages() -> Dict[str, dict]:
+    """language -> compiler, source file name and flags, from settings"""
+    return {
+        "c": {
+            "compiler": settings.C_COMPILER,
+            "source_file": "main.c",
+            "flags": shlex.split(settings.C_COMPILE_FLAGS)
+        },
+        "cpp": {
+            "compiler": settings.CPP_COMPILER,
+            "source_file": "main.cpp",
+            "flags": shlex.split(settings.CPP_COMPILE_FLAGS)
+        }
+    }
+
+
+def is_compiled_language(language: str) -> bool:
+    return language in compiled_languages()
+
+
+class ArtifactCache:
+    """
+    Directory of compiled binaries named by the hash of what produced them,
+    evicted least-recently-used past `max_bytes`. Binaries in use by a request
+    are pinned and never evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self._pins: Dict[str, int] = {}
+
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # Binaries from earlier server runs are still valid: pick them up
+        existing = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    os.remove(entry.path)  # partial write from a crashed server
+                elif entry.is_file():
+                    stat = entry.stat()
+                    existing.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._bytes += size
+        self._evict()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def lookup(self, key: str) -> bool:
+        """True if a binary for `key` is cached (counts a hit or miss)"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def put(self, key: str, binary_path: str) -> None:
+        """Copy a freshly built binary into the cache"""
+        partial = os.path.join(self.directory, f".{key}.{os.getpid()}")
+        shutil.copyfile(binary_path, partial)
+        os.chmod(partial, 0o500)
+        os.replace(partial, self.path(key))
+        size = os.path.getsize(self.path(key))
+        self._bytes += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        self._evict()
+
+    def copy_to(self, key: str, directory: str) -> str:
+        """
+        Copy a cached binary into a run's scratch directory. Each run gets its own
+        copy, so a program can't tamper with the binary other runs will use.
+        """
+        destination = os.path.join(directory, BINARY_NAME)
+        shutil.copyfile(self.path(key), destination)
+        os.chmod(destination, 0o700)
+        return destination
+
+    def pin(self, key: str) -> None:
+        self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key: str) -> None:
+        remaining = self._pins.get(key, 0) - 1
+        if remaining > 0:
+            self._pins[key] = remaining
+        else:
+            self._pins.pop(key, None)
+        self._evict()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+    def _evict(self) -> None:
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                return
+            if key in self._pins:
+                continue
+            self._bytes -= self._entries.pop(key)
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+
+_artifact_cache: Optional[ArtifactCache] = None
+
+# Compiler executable -> first line of `--version`, probed once per process
+_compiler_versions: Dict[str, str] = {}
+
+# Built runner, or "" once building it failed (programs then start without one)
+_runner_path: Optional[str] = None
+_runner_lock: Optional[asyncio.Lock] = None
+
+
+def get_artifact_cache() -> ArtifactCache:
+    """Get the shared binary cache, creating its directory on first use"""
+    global _artifact_cache
+    if _artifact_cache is None:
+        directory = settings.ARTIFACT_CACHE_DIR or os.path.join(
+            get_scratch_space().base_dir, ARTIFACT_DIR_NAME
+        )
+        _artifact_cache = ArtifactCache(directory, settings.ARTIFACT_CACHE_MAX_BYTES)
+    return _artifact_cache
+
+
+def artifact_key(language: str, compiler_version: str, flags: list, code: str) -> str:
+    """Hash of everything that determines the compiled binary"""
+    digest = hashlib.sha256()
+    for part in (language, compiler_version, "\0".join(flags), code):
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+@asynccontextmanager
+async def compiled(code: str, language: str) -> AsyncIterator[dict]:
+    """
+    Compile a program (or find it in the cache) for the duration of the block
+    Yields: dict with `key` (artifact key, None if compilation failed), `error`
+    (compiler output on failure), `compile_time` (0 on a cache hit) and `cached`.
+    The binary is pinned in the cache until the block exits.
+    """
+    build = await _build(code, language)
+    if build["key"] is None:
+        yield build
+        return
+    cache = get_artifact_cache()
+    cache.pin(build["key"])
+    try:
+        yield build
+    finally:
+        cache.unpin(build["key"])
+
+
+class NativeProcess:
+    """
+    A compiled program started in its own scratch directory, under the runner
+    when there is one; `report_fd` is the read end of the runner's report pipe
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process, scratch_dir: str, report_fd: Optional[int]):
+        self.process = process
+        self.scratch_dir = scratch_dir
+        self._report_fd = report_fd
+        self._report: Optional[dict] = None
+
+    def limit_cpu(self, cpu_seconds: int) -> None:
+        # The program itself got the run's CPU limit at spawn (see launch_binary)
+        set_cpu_limit(self.process.pid, cpu_seconds)
+
+    def report(self) -> Optional[dict]:
+        """The runner's resource usage report, or None (no runner, or it was killed)"""
+        if self._report is None and self._report_fd is not None:
+            try:
+                data = os.read(self._report_fd, 65536)
+                self._report = json.loads(data) if data else None
+            except (BlockingIOError, OSError, ValueError):
+                return None
+        return self._report
+
+    async def close(self) -> None:
+        """Kill the program if still running and give back its scratch directory"""
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+        try:
+            await self.process.wait()
+        finally:
+            if self._report_fd is not None:
+                os.close(self._report_fd)
+            get_scratch_space().release(self.scratch_dir)
+
+
+@asynccontextmanager
+async def launch_binary(key: str) -> AsyncIterator[NativeProcess]:
+    """
+    Start a cached binary (pinned by compiled()) with piped stdio and the run's
+    resource limits; it is killed and its directory emptied on exit
+    """
+    runner = await _native_runner()
+    scratch = get_scratch_space()
+    scratch_dir = scratch.acquire()
+    report_read = report_write = None
+    try:
+        binary = get_artifact_cache().copy_to(key, scratch_dir)
+        command = [binary]
+        if runner:
+            report_read, report_write = os.pipe()
+            os.set_blocking(report_read, False)
+            command = [runner, binary, str(report_write)]
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=scratch_dir,
+            pass_fds=(report_write,) if runner else (),
+            # The runner forks the program right away, before limit_cpu(), so
+            # the run's own CPU limit is given at spawn
+            preexec_fn=limits_preexec({"RLIMIT_CPU": current_limits().cpu_seconds})
+        )
+    except BaseException:
+        if report_read is not None:
+            os.close(report_read)
+        scratch.release(scratch_dir)
+        raise
+    finally:
+        if report_write is not None:
+            os.close(report_write)
+    program = NativeProcess(process, scratch_dir, report_read)
+    try:
+        yield program
+    finally:
+        await program.close()
+
+
+async def _build(code: str, language: str) -> dict:
+    toolchain = compiled_languages()[language]
+    compiler_version = await _compiler_version(toolchain["compiler"])
+    if compiler_version is None:
+        return _build_failed(f"Compiler '{toolchain['compiler']}' not found on the system", 0)
+
+    key = artifact_key(language, compiler_version, toolchain["flags"], code)
+    cache = get_artifact_cache()
+    if cache.lookup(key):
+        return {"key": key, "error": None, "compile_time": 0, "cached": True}
+
+    timeout = settings.COMPILE_TIMEOUT
+    scratch = get_scratch_space()
+    async with get_engine().slot():
+        start_time = time.time()
+        scratch_dir = scratch.acquire()
+        try:
+            with open(os.path.join(scratch_dir, toolchain["source_file"]), "w", encoding="utf-8") as f:
+                f.write(code)
+            # Flags go after the source so libraries like -lm link in order
+            process = await asyncio.create_subprocess_exec(
+                toolchain["compiler"], "-fdiagnostics-color=never",
+                toolchain["source_file"], "-o", BINARY_NAME, *toolchain["flags"],
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                cwd=scratch_dir,
+                # The compiler is trusted; its driver's subprocesses shouldn't use up RLIMIT_NPROC
+                preexec_fn=limits_preexec({"RLIMIT_NPROC": 0})
+            )
+            try:
+                output, _ = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                return _build_failed(f"Compilation timeout ({timeout}s limit exceeded)", timeout)
+            finally:
+                if process.returncode is None:
+                    process.kill()
+            compile_time = round(time.time() - start_time, 3)
+
+            if process.returncode != 0:
+                message = output[:settings.OUTPUT_BUFFER_BYTES].decode("utf-8", errors="replace")
+                return _build_failed(message or "Compilation failed", compile_time)
+            cache.put(key, os.path.join(scratch_dir, BINARY_NAME))
+        finally:
+            scratch.release(scratch_dir)
+
+    return {"key": key, "error": None, "compile_time": compile_time, "cached": False}
+
+
+async def _native_runner() -> Optional[str]:
+    """Build native_runner.c into the scratch root once per process; None if it can't be built"""
+    global _runner_path, _runner_lock
+    if _runner_path is not None:
+        return _runner_path or None
+    if _runner_lock is None:
+        _runner_lock = asyncio.Lock()
+    async with _runner_lock:
+        if _runner_path is None:
+            target = os.path.join(get_scratch_space().root, RUNNER_NAME)
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    settings.C_COMPILER, "-O2", RUNNER_SOURCE, "-o", target,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    preexec_fn=limits_preexec({"RLIMIT_NPROC": 0})
+                )
+                try:
+                    output, _ = await asyncio.wait_for(process.communicate(), settings.COMPILE_TIMEOUT)
+                finally:
+                    if process.returncode is None:
+                        process.kill()
+                if process.returncode != 0:
+                    raise OSError(output.decode(errors="replace"))
+                _runner_path = target
+            except (OSError, asyncio.TimeoutError) as e:
+                print(f"Native runner not built, C/C++ runs won't report resource usage: {e!r}")
+                _runner_path = ""
+    return _runner_path or None
+
+
+def _build_failed(error: str, compile_time: float) -> dict:
+    return {"key": None, "error": error, "compile_time": compile_time, "cached": False}
+
+
+async def _compiler_version(compiler: str) -> Optional[str]:
+    """First line of `compiler --version`, or None if it can't be started"""
+    if compiler not in _compiler_versions:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                compiler, "--version",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        except OSError:
+            return None
+        stdout, _ = await process.communicate()
+        if process.returncode != 0:
+            return None
+        lines = stdout.decode(errors="replace").splitlines()
+        _compiler_versions[compiler] = f"{compiler} {lines[0] if lines else ''}"
+    return _compiler_versions[compiler]
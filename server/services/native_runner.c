@@ -0,0 +1,87 @@
+/*
+ * Runs a compiled student program and reports its resource usage.
+ *
+ * Usage: native_runner <program> <report fd>
+ *
+ * The program runs as a child with the runner's stdio and limits. The runner
+ * reaps it with wait4, writes a JSON report with the child's CPU time, peak
+ * RSS and context switches to the report descriptor, then exits the way the
+ * child did (same code, or killed by the same signal). Being a small
+ * exec'd process, its own footprint barely shows in the child's peak RSS,
+ * unlike a program forked straight from the API server. If the runner is
+ * killed, so is the program.
+ */
+#define _GNU_SOURCE
+#include <errno.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <sys/prctl.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+static double seconds(struct timeval tv) {
+    return tv.tv_sec + tv.tv_usec / 1e6;
+}
+
+int main(int argc, char **argv) {
+    if (argc != 3) {
+        fprintf(stderr, "usage: %s <program> <report fd>\n", argv[0]);
+        return 126;
+    }
+    int report_fd = atoi(argv[2]);
+    pid_t runner = getpid();
+
+    pid_t pid = fork();
+    if (pid < 0) {
+        perror("fork");
+        return 126;
+    }
+    if (pid == 0) {
+        close(report_fd);
+        prctl(PR_SET_PDEATHSIG, SIGKILL);
+        if (getppid() != runner) {
+            /* Runner died before the death signal was armed */
+            _exit(137);
+        }
+        execl(argv[1], argv[1], (char *)NULL);
+        perror(argv[1]);
+        _exit(127);
+    }
+
+    /* The program alone holds the pipes, so they close when it exits */
+    close(STDIN_FILENO);
+    close(STDOUT_FILENO);
+    close(STDERR_FILENO);
+
+    int status;
+    struct rusage usage;
+    while (wait4(pid, &status, 0, &usage) < 0) {
+        if (errno != EINTR) {
+            return 126;
+        }
+    }
+    dprintf(
+        report_fd,
+        "{\"resource_usage\": {\"cpu_user\": %.4f, \"cpu_system\": %.4f, \"max_rss_kb\": %ld, "
+        "\"voluntary_context_switches\": %ld, \"involuntary_context_switches\": %ld}}",
+        seconds(usage.ru_utime), seconds(usage.ru_stime), usage.ru_maxrss,
+        usage.ru_nvcsw, usage.ru_nivcsw
+    );
+    close(report_fd);
+
+    if (WIFSIGNALED(status)) {
+        int sig = WTERMSIG(status);
+        struct rlimit no_core = {0, 0};
+        setrlimit(RLIMIT_CORE, &no_core);
+        signal(sig, SIG_DFL);
+        sigset_t set;
+        sigemptyset(&set);
+        sigaddset(&set, sig);
+        sigprocmask(SIG_UNBLOCK, &set, NULL);
+        raise(sig);
+        return 128 + sig;
+    }
+    return WEXITSTATUS(status);
+}
@@ -0,0 +1,69 @@
+"""
+Bounded capture of program output
+Keeps the beginning and end of each stream in fixed-size buffers, so memory
+per run stays constant however much a program prints
+"""
+
+TRUNCATION_MARKER = "\n... [{omitted} bytes of output omitted] ...\n"
+
+
+class OutputBuffer:
+    """Head and tail of a byte stream, `limit` bytes in total, plus the full byte count"""
+
+    def __init__(self, limit: int):
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.total_bytes = 0
+        self._head = bytearray()
+        self._tail = bytearray()  # last tail_limit bytes written after the head filled
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > len(self._head) + len(self._tail)
+
+    def write(self, data: bytes) -> None:
+        self.total_bytes += len(data)
+        room = self.head_limit - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        if len(data) >= self.tail_limit:
+            self._tail[:] = data[-self.tail_limit:] if self.tail_limit else b""
+            return
+        self._tail += data
+        overflow = len(self._tail) - self.tail_limit
+        if overflow > 0:
+            del self._tail[:overflow]
+
+    def getvalue(self) -> str:
+        """Decoded output, with a marker where bytes were dropped"""
+        head = self._head.decode("utf-8", errors="replace")
+        tail = self._tail.decode("utf-8", errors="replace")
+        if not self.truncated:
+            return head + tail
+        omitted = self.total_bytes - len(self._head) - len(self._tail)
+        return head + TRUNCATION_MARKER.format(omitted=omitted) + tail
+
+
+class OutputCapture:
+    """stdout/stderr buffers for one run, with a cap on total bytes produced"""
+
+    def __init__(self, buffer_bytes: int, kill_bytes: int):
+        self.stdout = OutputBuffer(buffer_bytes)
+        self.stderr = OutputBuffer(buffer_bytes)
+        self.kill_bytes = kill_bytes
+        self.limit_exceeded = False
+
+    def write(self, stream_name: str, data: bytes) -> bool:
+        """Record a chunk; returns False once the run has printed more than kill_bytes"""
+        buffer = self.stdout if stream_name == "stdout" else self.stderr
+        buffer.write(data)
+        if self.stdout.total_bytes + self.stderr.total_bytes > self.kill_bytes:
+            self.limit_exceeded = True
+        return not self.limit_exceeded
+
+    @property
+    def truncated(self) -> bool:
+        return self.stdout.truncated or self.stderr.truncated
@@ -0,0 +1,157 @@
+"""
+Static pre-check for Python submissions
+Catches syntax errors and obviously undefined names in-process, so they cost
+microseconds instead of a sandbox launch
+"""
+import ast
+import builtins
+import hashlib
+import symtable
+from collections import OrderedDict
+from typing import List, Optional
+
+SOURCE_FILENAME = "main.py"
+# Compiled under a name that can't exist on disk, so error text comes from the
+# submitted source and not from whatever "main.py" is in the server's cwd
+COMPILE_FILENAME = "<main.py>"
+ANALYSIS_CACHE_SIZE = 1024
+
+# Names the interpreter defines in every module namespace
+MODULE_NAMES = {
+    "__name__", "__file__", "__doc__", "__builtins__", "__spec__",
+    "__loader__", "__package__", "__annotations__", "__cached__"
+}
+
+# Calls that can define names at runtime, making the static view unreliable
+DYNAMIC_NAMESPACE_CALLS = {"exec", "eval", "globals", "vars", "locals", "__import__"}
+
+_analysis_cache: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def analyze(code: str) -> dict:
+    """
+    Compile the code and resolve its global names without running it
+    Returns: dict with `syntax_error` (interpreter-style error text, or None) and
+    `diagnostics`, a list of {type, message, line, column} findings.
+    Results are cached by code hash.
+    """
+    key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    cached = _analysis_cache.get(key)
+    if cached is not None:
+        _analysis_cache.move_to_end(key)
+        return cached
+
+    analysis = _analyze(code)
+    _analysis_cache[key] = analysis
+    if len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+        _analysis_cache.popitem(last=False)
+    return analysis
+
+
+def syntax_error_result(analysis: dict) -> dict:
+    """Run result for code that doesn't compile (same shape as run_code's)"""
+    return {
+        "success": False,
+        "output": "",
+        "compilation_result": analysis["syntax_error"],
+        "execution_time": 0,
+        "status": "compilation_error",
+        "diagnostics": analysis["diagnostics"]
+    }
+
+
+def _analyze(code: str) -> dict:
+    try:
+        tree = compile(code, COMPILE_FILENAME, "exec", ast.PyCF_ONLY_AST)
+        compile(tree, COMPILE_FILENAME, "exec")
+    except SyntaxError as e:
+        return {
+            "syntax_error": _format_syntax_error(e),
+            "diagnostics": [{
+                "type": "syntax_error",
+                "message": f"{type(e).__name__}: {e.msg}",
+                "line": e.lineno or 0,
+                "column": e.offset or 0
+            }]
+        }
+    except (ValueError, RecursionError, MemoryError):
+        # Null bytes, absurd nesting: leave it to the real interpreter
+        return {"syntax_error": None, "diagnostics": []}
+
+    return {"syntax_error": None, "diagnostics": _undefined_names(code, tree)}
+
+
+def _format_syntax_error(e: SyntaxError) -> str:
+    """Interpreter-style error text, as `python main.py` would print it"""
+    lines = [f'  File "{SOURCE_FILENAME}", line {e.lineno}\n']
+    if e.text:
+        text = e.text.rstrip("\r\n")
+        source_line = text.lstrip()
+        lines.append(f"    {source_line}\n")
+        if e.offset:
+            indent = len(text) - len(source_line)
+            start = max(e.offset - indent, 1)
+            end = (e.end_offset or 0) - indent if e.end_lineno == e.lineno else 0
+            width = max(end - start, 1)
+            lines.append("    " + " " * (start - 1) + "^" * width + "\n")
+    lines.append(f"{type(e).__name__}: {e.msg}\n")
+    return "".join(lines)
+
+
+def _undefined_names(code: str, tree: ast.AST) -> List[dict]:
+    """Global names that are read somewhere but never bound in the module or builtins"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names):
+            return []
+        if isinstance(node, ast.Name) and node.id in DYNAMIC_NAMESPACE_CALLS:
+            return []
+
+    try:
+        top = symtable.symtable(code, COMPILE_FILENAME, "exec")
+    except (SyntaxError, RecursionError):
+        return []
+
+    defined = set(MODULE_NAMES) | set(dir(builtins))
+    referenced = set()
+    tables = [top]
+    while tables:
+        table = tables.pop()
+        tables.extend(table.get_children())
+        for symbol in table.get_symbols():
+            if not symbol.is_global():
+                continue
+            if symbol.is_assigned() or symbol.is_imported() or symbol.is_namespace():
+                defined.add(symbol.get_name())
+            if symbol.is_referenced():
+                referenced.add(symbol.get_name())
+
+    missing = referenced - defined
+    if not missing:
+        return []
+
+    # Report the first use of each missing name
+    first_use = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in missing:
+            position = (node.lineno, node.col_offset + 1)
+            if node.id not in first_use or position < first_use[node.id]:
+                first_use[node.id] = position
+    return [
+        {
+            "type": "undefined_name",
+            "message": f"name '{name}' is not defined",
+            "line": line,
+            "column": column
+        }
+        for name, (line, column) in sorted(first_use.items(), key=lambda item: item[1])
+    ]
+
+
+def format_findings(analysis: Optional[dict]) -> str:
+    """One line per finding, for prompts and logs"""
+    if not analysis:
+        return ""
+    return "\n".join(
+        f"- line {d['line']}, column {d['column']}: {d['message']}"
+        for d in analysis["diagnostics"]
+    )
@@ -0,0 +1,239 @@
+"""
+Hint prompts within a token budget
+Sending a large file and a long traceback whole costs tokens and latency, and
+can overflow the model's context. The builder collapses repeated traceback
+frames, keeps the code around the lines the error points at (the enclosing
+function when it fits, else a window of lines), and trims each part of the
+prompt so the whole stays within the budget. Tokens are counted with a local
+estimate of the model's tokenizer rather than the tokenizer itself.
+"""
+import ast
+import re
+from typing import Callable, List, NamedTuple, Optional, Set, Tuple
+
+from services.local_hints import student_lines
+
+# The tokenizer splits words into pieces of about 4 characters and gives most
+# symbols a token of their own; a line break or run of indentation is one more
+_PIECE = re.compile(r"\w+|[^\w\s]")
+CHARS_PER_TOKEN = 4
+# Role and separators around each chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Lines either side of an error line when its function doesn't fit (or there is none)
+CONTEXT_LINES = 8
+# Longest cycle of frames collapsed when repeated (mutual recursion)
+MAX_FRAME_CYCLE = 4
+
+# Native and Java references to the student's files: "main.c:3:5: error: ..." and "at Main.main(Main.java:7)"
+_NATIVE_LINE = re.compile(r"(?:\bmain\.c(?:pp)?|\bMain\.java):(\d+)")
+# A stack frame line; more-indented lines after it (source, carets) belong to it
+_FRAME_START = re.compile(r'^(\s*)(?:File "|at )')
+
+
+class PromptParts(NamedTuple):
+    code: str
+    error: str
+    expected_output: str
+    findings: str
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of `text` for the hint model"""
+    pieces = _PIECE.findall(text)
+    return sum((len(piece) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN for piece in pieces) + text.count("\n")
+
+
+def estimate_message_tokens(messages: List[dict]) -> int:
+    return sum(estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def fit_prompt(
+    code: str, language: str, error: str, expected_output: str, findings: str, budget: int
+) -> PromptParts:
+    """
+    The variable parts of a hint prompt, cut down to `budget` tokens in total
+    Expected output and findings get up to a tenth of the budget each; the
+    error gets what the code leaves over, but at least two fifths.
+    """
+    expected_output = fit_text(expected_output, budget // 10)
+    findings = fit_text(findings, budget // 10)
+    remaining = max(budget - estimate_tokens(expected_output) - estimate_tokens(findings), 0)
+
+    error = collapse_frames(error)
+    code_tokens = estimate_tokens(code)
+    error = fit_text(error, max(remaining - code_tokens, remaining * 2 // 5), head_share=0.25)
+    code = code_excerpt(code, language, error_lines(error), remaining - estimate_tokens(error))
+    return PromptParts(code, error, expected_output, findings)
+
+
+def error_lines(error: str) -> List[int]:
+    """Lines of the student's code the error points at, innermost first"""
+    lines = student_lines(error) + [int(n) for n in _NATIVE_LINE.findall(error)]
+    return list(dict.fromkeys(reversed(lines)))
+
+
+def collapse_frames(error: str) -> str:
+    """
+    `error` with consecutive repeats of the same stack frame, or cycle of up to
+    MAX_FRAME_CYCLE frames, written once plus a count
+    """
+    blocks = _frame_blocks(error.splitlines())
+    out: List[Tuple[str, ...]] = []
+    i = 0
+    while i < len(blocks):
+        period, repeats = _repetition(blocks, i)
+        out.extend(blocks[i:i + period])
+        if repeats > 1:
+            indent = _FRAME_START.match(blocks[i][0]).group(1)
+            frames = "frame" if period == 1 else f"{period} frames"
+            out.append((f"{indent}[Previous {frames} repeated {repeats - 1} more times]",))
+        i += period * repeats
+    return "\n".join(line for block in out for line in block)
+
+
+def _frame_blocks(lines: List[str]) -> List[Tuple[str, ...]]:
+    """Lines grouped into frames (a frame line and the lines indented under it); others alone"""
+    blocks: List[List[str]] = []
+    frame_indent: Optional[int] = None
+    for line in lines:
+        start = _FRAME_START.match(line)
+        indent = len(line) - len(line.lstrip())
+        if not start and frame_indent is not None and indent > frame_indent and line.strip():
+            blocks[-1].append(line)
+            continue
+        blocks.append([line])
+        frame_indent = len(start.group(1)) if start else None
+    return [tuple(block) for block in blocks]
+
+
+def _repetition(blocks: List[Tuple[str, ...]], i: int) -> Tuple[int, int]:
+    """(period, repeats) of the longest run of repeated frames starting at blocks[i]"""
+    best = (1, 1)
+    for period in range(1, MAX_FRAME_CYCLE + 1):
+        unit = blocks[i:i + period]
+        if len(unit) < period or not all(_FRAME_START.match(block[0]) for block in unit):
+            break
+        repeats = 1
+        while blocks[i + repeats * period:i + (repeats + 1) * period] == unit:
+            repeats += 1
+        if repeats > 1 and repeats * period > best[0] * best[1]:
+            best = (period, repeats)
+    return best
+
+
+def fit_text(text: str, budget: int, head_share: float = 0.5) -> str:
+    """
+    `text` if it fits in `budget` tokens, else its first and last lines with
+    the middle left out; `head_share` of the budget goes to the first lines
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    lines = [_clip_line(line, max(budget // 2, 1)) for line in text.splitlines()]
+    costs = [estimate_tokens(line) + 1 for line in lines]
+    omitted_note_tokens = 8
+    budget = max(budget - omitted_note_tokens, 0)
+
+    head_end, spent = 0, 0
+    while head_end < len(lines) and spent + costs[head_end] <= budget * head_share:
+        spent += costs[head_end]
+        head_end += 1
+    tail_start = len(lines)
+    while tail_start > head_end and spent + costs[tail_start - 1] <= budget:
+        tail_start -= 1
+        spent += costs[tail_start]
+    omitted = tail_start - head_end
+    if not omitted:
+        return "\n".join(lines)
+    return "\n".join(lines[:head_end] + [f"... ({omitted} lines omitted) ..."] + lines[tail_start:])
+
+
+def _clip_line(line: str, budget: int) -> str:
+    """A single line cut to about `budget` tokens"""
+    if len(line) <= budget * CHARS_PER_TOKEN or estimate_tokens(line) <= budget:
+        return line
+    keep = budget * CHARS_PER_TOKEN // 2
+    while keep > 0 and estimate_tokens(line[:keep]) > budget - 2:
+        keep //= 2
+    return line[:keep] + " ..."
+
+
+def code_excerpt(code: str, language: str, lines: List[int], budget: int) -> str:
+    """
+    `code` if it fits in `budget` tokens; otherwise numbered excerpts around
+    `lines` (1-based, most important first), or the start of the code when
+    there are none
+    """
+    if estimate_tokens(code) <= budget:
+        return code
+    code_lines = code.splitlines()
+    costs = [estimate_tokens(_numbered(i, line)) + 1 for i, line in enumerate(code_lines)]
+    # Room for the "..." between excerpts and the header
+    budget -= 2 * len(lines) + 16
+    chosen: Set[int] = set()
+    spent = 0
+
+    def take(indices: List[int]) -> bool:
+        nonlocal spent
+        new = [i for i in indices if i not in chosen]
+        cost = sum(costs[i] for i in new)
+        if spent + cost > budget:
+            return False
+        chosen.update(new)
+        spent += cost
+        return True
+
+    targets = [n - 1 for n in lines if 0 < n <= len(code_lines)]
+    enclosing = _enclosing_spans(code) if language == "python" else lambda index: None
+    for target in targets:
+        span = enclosing(target)
+        if span and take(list(range(*span))):
+            continue
+        take([target])
+        for distance in range(1, CONTEXT_LINES + 1):
+            take([i for i in (target - distance, target + distance) if 0 <= i < len(code_lines)])
+    if not targets:
+        for i in range(len(code_lines)):
+            if not take([i]):
+                break
+    # Spend what is left widening the windows, nearest lines first
+    for distance in range(CONTEXT_LINES + 1, len(code_lines)):
+        if not targets or budget - spent < min(costs):
+            break
+        for target in targets:
+            take([i for i in (target - distance, target + distance) if 0 <= i < len(code_lines)])
+
+    excerpt = []
+    previous = -1
+    for i in sorted(chosen):
+        if i != previous + 1:
+            excerpt.append("     ...")
+        excerpt.append(_numbered(i, code_lines[i]))
+        previous = i
+    if previous != len(code_lines) - 1:
+        excerpt.append("     ...")
+    header = f"(excerpt: {len(chosen)} of {len(code_lines)} lines, numbered)"
+    return "\n".join([header] + excerpt)
+
+
+def _numbered(index: int, line: str) -> str:
+    return f"{index + 1:>4} | {line}"
+
+
+def _enclosing_spans(code: str) -> Callable[[int], Optional[Tuple[int, int]]]:
+    """Lookup of the innermost function or class around a 0-based line, as a range"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return lambda index: None
+    spans = [
+        (node.lineno - 1, node.end_lineno)
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    ]
+
+    def lookup(index: int) -> Optional[Tuple[int, int]]:
+        around = [span for span in spans if span[0] <= index < span[1]]
+        return min(around, key=lambda span: span[1] - span[0]) if around else None
+
+    return lookup
@@ -0,0 +1,144 @@
+"""
+Warm Python sandbox worker
+
+Started ahead of time by the worker pool, so interpreter startup and the
+``site`` import are already paid for when a run arrives. The worker reads a
+single job from stdin: the source length in bytes, a newline, then the source.
+It runs that source as ``__main__`` and leaves the rest of stdin as the
+program's input. Each worker runs exactly one program and then exits.
+
+A header of ``<length> trace <max_steps> <snapshot_every>`` runs the program
+under the tracer, which leaves a trace file in the working directory.
+
+If started with a file descriptor argument, the worker writes a JSON report
+with its resource usage to that descriptor when the interpreter exits. The
+descriptor is moved to a high number, closed on exec and removed from argv
+before the program runs, and only the worker's own process writes the report
+(not children the program forks).
+"""
+import atexit
+import json
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SOURCE_FILENAME = "main.py"
+
+# Highest descriptor the report is moved to, below the usual RLIMIT_NOFILE
+HIGH_FD = 1023
+
+
+def peak_rss_kb(own) -> int:
+    """
+    Peak RSS of this process. ru_maxrss survives exec, so it would include the
+    API server we were forked from; Linux's VmHWM is reset by exec.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return own.ru_maxrss
+
+
+def hide_fd(fd: int) -> int:
+    """
+    Move `fd` to the highest number RLIMIT_NOFILE allows (at most HIGH_FD),
+    closed on exec, so it isn't among the program's low descriptors and doesn't
+    leak into programs it starts; returns the new number
+    """
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = HIGH_FD if soft == resource.RLIM_INFINITY else min(soft - 1, HIGH_FD)
+    if target <= fd:
+        os.set_inheritable(fd, False)
+        return fd
+    os.dup2(fd, target, inheritable=False)
+    os.close(fd)
+    return target
+
+
+def report_usage(fd: int, baseline, pid: int) -> None:
+    """
+    Write CPU time, peak RSS and context switches of this run (and its children).
+    Counters are relative to `baseline`, taken when the job arrived, so the
+    worker's own startup isn't billed to the program. Only process `pid` (the
+    worker) reports: a forked child runs the same atexit hooks.
+    """
+    if os.getpid() != pid:
+        return
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    usage = {
+        "cpu_user": round(own.ru_utime - baseline.ru_utime + children.ru_utime, 4),
+        "cpu_system": round(own.ru_stime - baseline.ru_stime + children.ru_stime, 4),
+        "max_rss_kb": max(peak_rss_kb(own), children.ru_maxrss),
+        "voluntary_context_switches": own.ru_nvcsw - baseline.ru_nvcsw + children.ru_nvcsw,
+        "involuntary_context_switches": own.ru_nivcsw - baseline.ru_nivcsw + children.ru_nivcsw
+    }
+    try:
+        os.write(fd, json.dumps({"resource_usage": usage}).encode("ascii"))
+    except OSError:
+        pass
+
+
+def main() -> int:
+    usage_fd = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    if usage_fd is not None and resource is not None:
+        usage_fd = hide_fd(usage_fd)
+    header = sys.stdin.buffer.readline()
+    if not header:
+        # Pool shut down before a job arrived
+        return 0
+    fields = header.split()
+    source = sys.stdin.buffer.read(int(fields[0])).decode("utf-8")
+    if usage_fd is not None and resource is not None:
+        atexit.register(report_usage, usage_fd, resource.getrusage(resource.RUSAGE_SELF), os.getpid())
+    recorder = None
+    if fields[1:2] == [b"trace"]:
+        # Imported before sys.path changes, so student files can't shadow it
+        from tracer import Recorder
+        recorder = Recorder(SOURCE_FILENAME, int(fields[2]), int(fields[3]))
+        atexit.register(recorder.stop)
+
+    import linecache
+    import types
+
+    # Look like `python main.py` run from the scratch directory
+    sys.argv = [SOURCE_FILENAME]
+    if hasattr(sys, "orig_argv"):
+        sys.orig_argv = [sys.executable, SOURCE_FILENAME]
+    sys.path[0] = os.getcwd()
+    linecache.cache[SOURCE_FILENAME] = (
+        len(source), None, source.splitlines(True), SOURCE_FILENAME
+    )
+    module = types.ModuleType("__main__")
+    module.__file__ = os.path.join(os.getcwd(), SOURCE_FILENAME)
+    sys.modules["__main__"] = module
+
+    try:
+        code = compile(source, SOURCE_FILENAME, "exec")
+        if recorder:
+            recorder.start()
+        exec(code, module.__dict__)
+    except SystemExit:
+        raise
+    except BaseException as exc:
+        import traceback
+        if recorder:
+            recorder.stop()
+
+        # Drop this bootstrap frame so the traceback matches a plain interpreter
+        tb = exc.__traceback__.tb_next if exc.__traceback__ else None
+        traceback.print_exception(type(exc), exc, tb)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+"""
+Persistent REPL sessions
+A session keeps one sandboxed interpreter (repl_worker.py) alive so the
+edit-run loop reuses imports and top-level state instead of starting over.
+Each cell holds an execution slot while it runs, but not while it waits for
+the user's input, and gets its requester's wall-clock limit. The manager bounds live
+sessions per node and per user and closes sessions that sit idle.
+"""
+import asyncio
+import codecs
+import json
+import os
+import signal
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+
+from config import settings
+from services.executor import get_engine
+from services.resource_limits import current_limits, limits_preexec
+from services.sandbox_backend import host_runtimes_allowed
+from services.worker_pool import SandboxWorker
+
+REPL_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "repl_worker.py")
+
+# Largest frame accepted from a worker; bigger means the program tampered with the channel
+MAX_FRAME_BYTES = 1024 * 1024
+
+# Frames buffered ahead of a slow client
+EVENT_QUEUE_SIZE = 16
+
+# Raw bytes read per pipe read (output of child processes, not of the cells themselves)
+RAW_CHUNK_BYTES = 4096
+
+# Time a cell gets to stop after Ctrl-C at its deadline before the session is killed
+INTERRUPT_GRACE_SECONDS = 1.0
+
+# Put in the input queue instead of text to interrupt a cell that waits for input
+_INTERRUPT = object()
+
+
+class ReplSession:
+    """One live interpreter and the cells run in it"""
+
+    def __init__(self, owner: str, worker: SandboxWorker):
+        self.id = str(uuid.uuid4())
+        self.owner = owner
+        self.worker = worker
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.cells = 0
+        self.busy = False
+        self.waiting_for_input = False
+        self.attached = False
+        self.closed_reason: Optional[str] = None
+        self.closed = asyncio.Event()
+        self._events: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._inputs: asyncio.Queue = asyncio.Queue()
+        self._readers: List[asyncio.Task] = []
+
+    @classmethod
+    async def start(cls, owner: str) -> "ReplSession":
+        worker = await SandboxWorker.start(
+            [settings.PYTHON_EXECUTABLE, REPL_SCRIPT],
+            preexec_fn=limits_preexec({
+                "RLIMIT_AS": settings.REPL_MEMORY_BYTES,
+                "RLIMIT_CPU": settings.REPL_CPU_SECONDS
+            })
+        )
+        session = cls(owner, worker)
+        loop = asyncio.get_running_loop()
+        session._readers = [
+            loop.create_task(session._read_channel()),
+            loop.create_task(session._read_raw(worker.process.stdout, "stdout")),
+            loop.create_task(session._read_raw(worker.process.stderr, "stderr"))
+        ]
+        return session
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_used
+
+    async def run_cell(self, code: str) -> AsyncIterator[dict]:
+        """
+        Run one cell in the session's namespace
+        Yields {"type": "stdout" | "stderr", "data": str} as output is produced,
+        {"type": "input_request"} when the cell waits for send_input(), then one
+        {"type": "result", ...} event. Closing the generator before the result
+        closes the session, since the cell would still be running.
+        """
+        self.busy = True
+        self.cells += 1
+        self.last_used = time.monotonic()
+        decoders = {
+            name: codecs.getincrementaldecoder("utf-8")(errors="replace")
+            for name in ("stdout", "stderr")
+        }
+        output_bytes = 0
+        time_limit = current_limits().wall_seconds
+        remaining = float(time_limit)
+        timed_out = False
+        summary: Optional[dict] = None
+        finished = False
+        try:
+            self._send("cell", code.encode("utf-8"))
+            while summary is None and self.closed_reason is None:
+                async with get_engine().slot():
+                    started = time.monotonic()
+                    deadline = started + remaining
+                    while True:
+                        try:
+                            kind, payload = await asyncio.wait_for(
+                                self._events.get(), max(deadline - time.monotonic(), 0)
+                            )
+                        except asyncio.TimeoutError:
+                            if timed_out:
+                                await self.close("timeout")
+                                break
+                            # Ctrl-C keeps the session's state if the cell stops in time
+                            timed_out = True
+                            self._signal(signal.SIGINT)
+                            deadline = time.monotonic() + INTERRUPT_GRACE_SECONDS
+                            continue
+                        if kind in ("stdout", "stderr"):
+                            output_bytes += len(payload)
+                            if output_bytes > settings.OUTPUT_LIMIT_BYTES:
+                                await self.close("output_limit")
+                                break
+                            text = decoders[kind].decode(payload)
+                            if text:
+                                yield {"type": kind, "data": text}
+                        elif kind == "wait":
+                            break
+                        elif kind == "done":
+                            summary = json.loads(payload)
+                            break
+                        else:
+                            # Interpreter exited: exit() in the cell, a crash, or the CPU limit
+                            await self.close("exited")
+                            break
+                    remaining -= time.monotonic() - started
+
+                if summary is None and self.closed_reason is None:
+                    # Wait for the user's input without holding an execution slot
+                    self.waiting_for_input = True
+                    yield {"type": "input_request"}
+                    data = await self._inputs.get()
+                    self.waiting_for_input = False
+                    self.last_used = time.monotonic()
+                    if data is None:
+                        break
+                    if data is _INTERRUPT:
+                        self._signal(signal.SIGINT)
+                    else:
+                        self._send("input", data.encode("utf-8"))
+            finished = True
+        finally:
+            self.busy = False
+            self.waiting_for_input = False
+            self.last_used = time.monotonic()
+            if not finished:
+                await self.close("cancelled")
+
+        execution_time = round(time_limit - remaining, 3)
+        if summary is None:
+            yield {
+                "type": "result",
+                "cell": self.cells,
+                "success": False,
+                "status": "timeout" if self.closed_reason == "timeout" else "runtime_error",
+                "execution_time": execution_time,
+                "resource_usage": None,
+                "session_closed": self.closed_reason
+            }
+            return
+        status = "success" if summary["ok"] else "runtime_error"
+        if timed_out:
+            status = "timeout"
+        yield {
+            "type": "result",
+            "cell": summary["cell"],
+            "success": status == "success",
+            "status": status,
+            "execution_time": execution_time,
+            "resource_usage": summary.get("resource_usage"),
+            "session_closed": None
+        }
+
+    def send_input(self, data: str) -> None:
+        """Text for the running (or next) cell's stdin; an empty string is end-of-file"""
+        self._inputs.put_nowait(data)
+
+    def interrupt(self) -> None:
+        """Ctrl-C the running cell"""
+        if self.waiting_for_input:
+            self._inputs.put_nowait(_INTERRUPT)
+        elif self.busy:
+            self._signal(signal.SIGINT)
+
+    async def close(self, reason: str) -> None:
+        """Kill the interpreter; `reason` is reported to the client"""
+        if self.closed_reason is not None:
+            return
+        self.closed_reason = reason
+        self.closed.set()
+        for reader in self._readers:
+            reader.cancel()
+        await asyncio.gather(*self._readers, return_exceptions=True)
+        # Wake a cell that waits for input
+        self._inputs.put_nowait(None)
+        await self.worker.close()
+
+    def _send(self, kind: str, payload: bytes) -> None:
+        stdin = self.worker.process.stdin
+        try:
+            stdin.write(f"{kind} {len(payload)}\n".encode("ascii") + payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # Interpreter already gone; its channel reports the exit
+            pass
+
+    def _signal(self, signum: int) -> None:
+        try:
+            self.worker.process.send_signal(signum)
+        except ProcessLookupError:
+            pass
+
+    async def _read_channel(self) -> None:
+        """Forward framed messages from the interpreter to the event queue"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_FRAME_BYTES)
+        # Duplicated: the worker owns (and closes) the original descriptor
+        pipe = os.fdopen(os.dup(self.worker.report_fd), "rb", 0)
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                kind, length = header.decode("ascii").split()
+                if int(length) > MAX_FRAME_BYTES:
+                    break
+                payload = await reader.readexactly(int(length))
+                await self._events.put((kind, payload))
+        except (ValueError, UnicodeDecodeError, asyncio.IncompleteReadError):
+            # Malformed frame: treat it like the interpreter going away
+            pass
+        finally:
+            transport.close()
+        await self._events.put(("exit", b""))
+
+    async def _read_raw(self, stream: asyncio.StreamReader, kind: str) -> None:
+        """Output written straight to the pipes, e.g. by processes a cell starts"""
+        while True:
+            data = await stream.read(RAW_CHUNK_BYTES)
+            if not data:
+                return
+            await self._events.put((kind, data))
+
+
+class ReplSessionManager:
+    """Live sessions on this node, bounded in number and closed when idle"""
+
+    def __init__(self, max_sessions: int, max_per_user: int, idle_seconds: float):
+        self.max_sessions = max_sessions
+        self.max_per_user = max_per_user
+        self.idle_seconds = idle_seconds
+        self.opened = 0
+        self.evicted_idle = 0
+        self.evicted_for_room = 0
+        self._sessions: Dict[str, ReplSession] = {}
+        self._starting = 0
+        self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def open(self, owner: str) -> Optional[ReplSession]:
+        """
+        Start a session for `owner`, closing their least recently used detached
+        session or the node's least recently used detached one to make room.
+        None when every session that could make room is attached: a live
+        connection's session, even an idle one, is never closed for another.
+        """
+        mine = [s for s in self._sessions.values() if s.owner == owner]
+        if len(mine) >= self.max_per_user:
+            victim = _least_recently_used(s for s in mine if not s.attached)
+            if victim is None:
+                return None
+            await self._evict(victim, "replaced")
+        if len(self._sessions) + self._starting >= self.max_sessions:
+            victim = _least_recently_used(
+                s for s in self._sessions.values() if not s.attached and not s.busy
+            )
+            if victim is None:
+                return None
+            await self._evict(victim, "evicted")
+
+        self._starting += 1
+        try:
+            session = await ReplSession.start(owner)
+        finally:
+            self._starting -= 1
+        session.attached = True
+        self._sessions[session.id] = session
+        self.opened += 1
+        return session
+
+    def attach(self, session_id: str, owner: str) -> Optional[ReplSession]:
+        """Reconnect to a live session of `owner`'s that no other connection is using"""
+        session = self._sessions.get(session_id)
+        if session is None or session.owner != owner or session.attached:
+            return None
+        if session.closed_reason is not None:
+            return None
+        session.attached = True
+        return session
+
+    def detach(self, session: ReplSession) -> None:
+        """The connection went away; the session lives on until it is idle too long"""
+        session.attached = False
+        session.last_used = time.monotonic()
+        if session.closed_reason is not None:
+            self._sessions.pop(session.id, None)
+
+    async def close(self, session: ReplSession, reason: str) -> None:
+        self._sessions.pop(session.id, None)
+        await session.close(reason)
+
+    def stats(self) -> dict:
+        sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "max_sessions": self.max_sessions,
+            "attached": sum(1 for s in sessions if s.attached),
+            "busy": sum(1 for s in sessions if s.busy),
+            "opened": self.opened,
+            "evicted_idle": self.evicted_idle,
+            "evicted_for_room": self.evicted_for_room
+        }
+
+    async def shutdown(self) -> None:
+        self._sweeper.cancel()
+        await asyncio.gather(self._sweeper, return_exceptions=True)
+        for session in list(self._sessions.values()):
+            await self.close(session, "shutdown")
+
+    async def _evict(self, session: ReplSession, reason: str) -> None:
+        self.evicted_for_room += 1
+        await self.close(session, reason)
+
+    async def _sweep_loop(self) -> None:
+        check_interval = max(1.0, self.idle_seconds / 10)
+        while True:
+            await asyncio.sleep(check_interval)
+            for session in list(self._sessions.values()):
+                if session.closed_reason is not None:
+                    # Ended on its own (exit(), timeout, output limit)
+                    self._sessions.pop(session.id, None)
+                    continue
+                # A cell blocked on input() counts as idle: the user may be gone
+                idle = not session.busy or session.waiting_for_input
+                if idle and session.idle_for() > self.idle_seconds:
+                    self.evicted_idle += 1
+                    await self.close(session, "idle")
+
+
+def _least_recently_used(sessions) -> Optional[ReplSession]:
+    return min(sessions, key=lambda s: s.last_used, default=None)
+
+
+_manager: Optional[ReplSessionManager] = None
+
+
+def get_repl_manager() -> Optional[ReplSessionManager]:
+    """
+    Get the shared session manager. None when REPL sessions are disabled,
+    including when the sandbox backend isolates runs and sessions (local
+    interpreters) aren't allowed next to it. Must be called from the running
+    event loop.
+    """
+    global _manager
+    if settings.REPL_MAX_SESSIONS <= 0 or not host_runtimes_allowed():
+        return None
+    if _manager is None:
+        _manager = ReplSessionManager(
+            max_sessions=settings.REPL_MAX_SESSIONS,
+            max_per_user=settings.REPL_MAX_SESSIONS_PER_USER,
+            idle_seconds=settings.REPL_IDLE_TIMEOUT_SECONDS
+        )
+    return _manager
+
+
+async def shutdown_repl_manager() -> None:
+    """Close all sessions (called on application shutdown)"""
+    global _manager
+    if _manager is not None:
+        manager, _manager = _manager, None
+        await manager.shutdown()
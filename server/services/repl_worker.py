@@ -0,0 +1,201 @@
+"""
+Persistent Python REPL worker
+
+One interpreter per REPL session. Unlike python_worker, it keeps running and
+executes cell after cell in the same ``__main__`` namespace, so imports and
+slow top-level setup survive between runs.
+
+Messages on stdin are a header line ``<kind> <length>`` followed by that many
+bytes: ``cell`` (source to run) or ``input`` (text for the running cell's
+``input()``/``sys.stdin``; an empty ``input`` is end-of-file). Output goes to
+the channel file descriptor given as the only argument, framed the same way:
+``stdout``/``stderr`` text, ``wait`` when a cell blocks on input, and ``done``
+with a JSON summary after each cell. Keeping everything on one channel means the
+server sees a cell's output strictly before its ``done``.
+"""
+import ast
+import io
+import json
+import linecache
+import os
+import sys
+import traceback
+import types
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from python_worker import peak_rss_kb
+
+CHANNEL_BUFFER_BYTES = 8192
+
+
+class Channel:
+    """Framed messages to the server"""
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    def send(self, kind: str, payload: bytes = b"") -> None:
+        data = f"{kind} {len(payload)}\n".encode("ascii") + payload
+        while data:
+            written = os.write(self.fd, data)
+            data = data[written:]
+
+
+class FramedOutput(io.RawIOBase):
+    """Raw stream that forwards every write as a `kind` frame"""
+
+    def __init__(self, channel: Channel, kind: str):
+        self.channel = channel
+        self.kind = kind
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.channel.send(self.kind, bytes(data))
+        return len(data)
+
+
+class Inbox:
+    """Messages from the server on stdin; input that arrives early is kept for later"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.pending = bytearray()
+        self.eof = False
+
+    def next_message(self):
+        header = self.stream.readline()
+        if not header:
+            return None, b""
+        kind, length = header.decode("ascii").split()
+        return kind, self.stream.read(int(length))
+
+
+class CellInput(io.RawIOBase):
+    """stdin for cells: asks the server for input when it has none buffered"""
+
+    def __init__(self, inbox: Inbox, channel: Channel):
+        self.inbox = inbox
+        self.channel = channel
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.inbox.pending and not self.inbox.eof:
+            # Prompts written with print(..., end="") must be visible first
+            sys.stdout.flush()
+            sys.stderr.flush()
+            self.channel.send("wait")
+            kind, payload = self.inbox.next_message()
+            if kind is None:
+                raise SystemExit(0)
+            if kind == "input":
+                if payload:
+                    self.inbox.pending += payload
+                else:
+                    self.inbox.eof = True
+        count = min(len(buffer), len(self.inbox.pending))
+        buffer[:count] = self.inbox.pending[:count]
+        del self.inbox.pending[:count]
+        return count
+
+
+def run_cell(source: str, filename: str, namespace: dict) -> bool:
+    """Run one cell; like the interactive prompt, a final expression's value is printed"""
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    try:
+        tree = ast.parse(source, filename)
+        last = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            last = ast.Expression(tree.body.pop().value)
+        exec(compile(tree, filename, "exec"), namespace)
+        if last is not None:
+            value = eval(compile(last, filename, "eval"), namespace)
+            if value is not None:
+                namespace["_"] = value
+                print(repr(value))
+    except SystemExit:
+        raise
+    except BaseException as exc:
+        # Show only the user's frames (not this worker's, e.g. when input() is interrupted)
+        report = traceback.TracebackException(type(exc), exc, exc.__traceback__)
+        report.stack = traceback.StackSummary.from_list(
+            [frame for frame in report.stack if frame.filename != __file__]
+        )
+        sys.stderr.write("".join(report.format()))
+        return False
+    return True
+
+
+def usage_since(baseline) -> dict:
+    """Resource usage of one cell, relative to `baseline` taken when it started"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "cpu_user": round(own.ru_utime - baseline[0].ru_utime + children.ru_utime - baseline[1].ru_utime, 4),
+        "cpu_system": round(own.ru_stime - baseline[0].ru_stime + children.ru_stime - baseline[1].ru_stime, 4),
+        "max_rss_kb": max(peak_rss_kb(own), children.ru_maxrss),
+        "voluntary_context_switches": own.ru_nvcsw - baseline[0].ru_nvcsw + children.ru_nvcsw - baseline[1].ru_nvcsw,
+        "involuntary_context_switches": own.ru_nivcsw - baseline[0].ru_nivcsw + children.ru_nivcsw - baseline[1].ru_nivcsw
+    }
+
+
+def main() -> int:
+    channel = Channel(int(sys.argv[1]))
+    inbox = Inbox(sys.stdin.buffer)
+    sys.stdout = io.TextIOWrapper(
+        io.BufferedWriter(FramedOutput(channel, "stdout"), CHANNEL_BUFFER_BYTES),
+        encoding="utf-8", line_buffering=True
+    )
+    sys.stderr = io.TextIOWrapper(
+        io.BufferedWriter(FramedOutput(channel, "stderr"), CHANNEL_BUFFER_BYTES),
+        encoding="utf-8", errors="backslashreplace", line_buffering=True
+    )
+    sys.stdin = io.TextIOWrapper(io.BufferedReader(CellInput(inbox, channel)), encoding="utf-8")
+
+    # Look like an interactive interpreter started in the scratch directory
+    sys.argv = [""]
+    sys.path[0] = os.getcwd()
+    module = types.ModuleType("__main__")
+    sys.modules["__main__"] = module
+    namespace = module.__dict__
+
+    cell_number = 0
+    while True:
+        try:
+            kind, payload = inbox.next_message()
+        except KeyboardInterrupt:
+            # Ctrl-C that arrived just after a cell finished
+            continue
+        if kind is None:
+            return 0
+        if kind == "input":
+            # Typed ahead of the cell that will read it
+            if payload:
+                inbox.pending += payload
+            else:
+                inbox.eof = True
+            continue
+
+        cell_number += 1
+        inbox.eof = False
+        baseline = None
+        if resource is not None:
+            baseline = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+        ok = run_cell(payload.decode("utf-8"), f"<cell {cell_number}>", namespace)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        summary = {"cell": cell_number, "ok": ok}
+        if baseline is not None:
+            summary["resource_usage"] = usage_since(baseline)
+        channel.send("done", json.dumps(summary).encode("ascii"))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Resource limits for sandboxed processes
+Applied in the child between fork and exec, so they cover everything the
+student program does (including processes it starts). The CPU limit of a run
+depends on who asked for it and is set again when a warm worker is leased.
+"""
+import os
+from typing import Callable, Dict, NamedTuple, Optional
+
+from config import settings
+from services.deadline import remaining_budget
+from services.executor import current_requester
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Hard CPU limit above the largest tier's soft limit: room for a warm worker's
+# own startup, and SIGXCPU arrives before SIGKILL
+CPU_HARD_MARGIN_SECONDS = 2
+
+
+class TierLimits(NamedTuple):
+    """Time limits of one run"""
+    cpu_seconds: int  # CPU time, the limit that catches infinite loops (0 = unlimited)
+    wall_seconds: int  # real-time ceiling, for programs that sleep, block or are starved of CPU
+
+
+def tier_limits(tier: str) -> TierLimits:
+    """Limits for a requester tier (see executor.Requester)"""
+    if tier == "anonymous":
+        return TierLimits(settings.ANONYMOUS_CPU_SECONDS, settings.ANONYMOUS_WALL_SECONDS)
+    if tier == "instructor":
+        return TierLimits(settings.INSTRUCTOR_CPU_SECONDS, settings.INSTRUCTOR_WALL_SECONDS)
+    return TierLimits(settings.RLIMIT_CPU_SECONDS, settings.EXECUTION_TIMEOUT)
+
+
+def current_limits() -> TierLimits:
+    """
+    Limits for runs started by the current request (see executor.set_requester).
+    The wall-clock limit is capped at what is left of the request's deadline,
+    if it has one (see deadline.py), but is never below one second.
+    """
+    limits = tier_limits(current_requester().tier)
+    wall_seconds = int(remaining_budget(limits.wall_seconds))
+    return limits._replace(wall_seconds=max(wall_seconds, 1))
+
+
+def set_cpu_limit(pid: int, cpu_seconds: int) -> None:
+    """
+    Allow a started process `cpu_seconds` more CPU time (0 = unlimited), so a
+    warm worker gets the limit of the run it was leased for. Needs prlimit
+    (Linux); elsewhere the limit given at spawn applies.
+    """
+    if resource is None or not hasattr(resource, "prlimit"):
+        return
+    try:
+        _, hard = resource.prlimit(pid, resource.RLIMIT_CPU)
+        soft = resource.RLIM_INFINITY
+        if cpu_seconds > 0:
+            # Whole seconds only: round the worker's own startup time to the nearest
+            soft = round(_cpu_seconds_used(pid)) + cpu_seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = hard - 1 if soft == resource.RLIM_INFINITY else min(soft, hard - 1)
+        resource.prlimit(pid, resource.RLIMIT_CPU, (soft, hard))
+    except (OSError, ValueError):
+        # Exited already, or not ours to change
+        pass
+
+
+def _cpu_seconds_used(pid: int) -> float:
+    """CPU time a process has used so far (e.g. starting a JVM), from /proc"""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            # Fields after the parenthesized command name; utime and stime are 14 and 15
+            fields = stat.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _cpu_hard_limit(soft: int) -> int:
+    tiers = [tier_limits(tier).cpu_seconds for tier in ("anonymous", "student", "instructor")]
+    if min(tiers) <= 0:
+        # Some tier may run without a CPU limit
+        return resource.RLIM_INFINITY
+    return max(soft, *tiers) + CPU_HARD_MARGIN_SECONDS
+
+
+def _nproc_limit(processes: int) -> int:
+    """
+    RLIMIT_NPROC for a local run allowed `processes` processes and threads
+    The kernel counts everything the server's user owns against it: the API's
+    threads, warm workers, JVMs, compilers and other runs. So the limit is what
+    the user has now plus `processes` for this run and every execution slot,
+    which still stops a fork bomb long before the host's own limits.
+    """
+    if os.getuid() == 0:
+        # Not enforced for root
+        return processes
+    slots = settings.EXECUTION_CONCURRENCY or os.cpu_count() or 1
+    return _user_task_count() + processes * (slots + 1)
+
+
+def _user_task_count() -> int:
+    """Processes and threads owned by this user, as RLIMIT_NPROC counts them"""
+    uid = os.getuid()
+    count = 0
+    try:
+        pids = [name for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return 0
+    for pid in pids:
+        try:
+            if os.stat(f"/proc/{pid}").st_uid == uid:
+                count += len(os.listdir(f"/proc/{pid}/task"))
+        except OSError:
+            # Exited meanwhile
+            pass
+    return count
+
+
+def run_limits(overrides: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """
+    rlimit name -> value for one run, from settings (0 = leave unlimited)
+    `overrides` replaces individual limits, e.g. for runtimes that need more
+    address space than the default allows.
+    """
+    limits = {
+        "RLIMIT_CPU": settings.RLIMIT_CPU_SECONDS,
+        "RLIMIT_AS": settings.RLIMIT_MEMORY_BYTES,
+        "RLIMIT_NPROC": settings.RLIMIT_PROCESSES,
+        "RLIMIT_FSIZE": settings.RLIMIT_FILE_SIZE_BYTES
+    }
+    limits.update(overrides or {})
+    return {name: value for name, value in limits.items() if value > 0}
+
+
+def limits_preexec(overrides: Optional[Dict[str, int]] = None) -> Optional[Callable[[], None]]:
+    """A preexec_fn that applies run_limits() in the child, or None if unsupported"""
+    if resource is None:
+        return None
+    limits = []
+    for name, value in run_limits(overrides).items():
+        if name == "RLIMIT_NPROC":
+            value = _nproc_limit(value)
+        # CPU: the hard limit leaves room to raise the soft one for any tier
+        hard = _cpu_hard_limit(value) if name == "RLIMIT_CPU" else value
+        limits.append((getattr(resource, name), value, hard))
+
+    def apply() -> None:
+        for limit, soft, hard in limits:
+            resource.setrlimit(limit, (soft, hard))
+
+    return apply
@@ -0,0 +1,148 @@
+"""
+Content-addressed cache for deterministic code runs
+Identical (language, interpreter, time limits, code, stdin) runs are answered without a subprocess
+"""
+import ast
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+
+# Modules whose use makes a program's output vary between runs
+NONDETERMINISTIC_MODULES = {
+    "os", "time", "random", "datetime", "secrets", "uuid", "threading",
+    "multiprocessing", "subprocess", "socket", "asyncio", "tempfile", "glob",
+    "shutil", "signal", "urllib", "http", "requests"
+}
+
+# Builtins whose results depend on memory layout or hash randomization
+NONDETERMINISTIC_BUILTINS = {"id", "hash", "open"}
+
+
+def is_deterministic(code: str) -> bool:
+    """
+    Conservative static check: False if the program imports or calls anything
+    known to vary between runs. Code that doesn't parse is deterministic
+    (it always fails the same way). Set iteration order is stable because
+    workers run with a fixed PYTHONHASHSEED (see worker_pool.py).
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return True
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = [node.module or ""]
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id in NONDETERMINISTIC_BUILTINS:
+                return False
+            continue
+        elif isinstance(node, ast.Name) and node.id in ("__import__", "eval", "exec"):
+            return False
+        else:
+            continue
+        if any(name.split(".")[0] in NONDETERMINISTIC_MODULES for name in names):
+            return False
+    return True
+
+
+def make_key(language: str, interpreter: str, limits: str, code: str, user_input: str) -> str:
+    """
+    Hash of everything that determines a deterministic run's result
+    `limits` describes the tier's time limits: a run that finished under one
+    tier's limits may time out under another's.
+    """
+    digest = hashlib.sha256()
+    for part in (language, interpreter, limits, code, user_input):
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def _result_size(result: dict) -> int:
+    # Approximate memory held by an entry: the output strings dominate
+    return len(result.get("output", "")) + len(result.get("compilation_result", "")) + 256
+
+
+class ResultCache:
+    """LRU cache of run results bounded by total size, with per-entry TTL"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored_at, size, result)
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, size, result = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(result)
+
+    def put(self, key: str, result: dict) -> None:
+        size = _result_size(result)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic(), size, dict(result))
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def record_bypass(self) -> None:
+        """Count a run that skipped the cache because it is non-deterministic"""
+        self.bypassed += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Get the shared cache. None when caching is disabled"""
+    global _cache
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ResultCache(
+            max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+            ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS
+        )
+    return _cache
@@ -0,0 +1,608 @@
+"""
+Sandbox backends for Python runs
+"local" runs programs as processes on this machine, from the warm worker pool.
+"container" runs them in Docker containers built from docker/Dockerfile.sandbox:
+the containers are created ahead of time, leased for one run each and reset
+afterwards, so a run costs a `docker exec` rather than a container start.
+"fake" is the container backend with plain directories and local processes
+standing in for containers - the same leasing and reset logic without Docker,
+for development and tests.
+
+Every backend hands out workers with `process`, `scratch_dir`, `limit_cpu()`
+and `report()`, like worker_pool.SandboxWorker, and reports the version of the
+Python that runs the programs (for the pre-check and the result cache).
+
+Only Python runs go through the backend: Java, C/C++ and REPL sessions are
+local processes, so with an isolating backend they are refused unless
+SANDBOX_HOST_RUNTIMES allows them (see host_runtimes_allowed).
+"""
+import asyncio
+import itertools
+import json
+import os
+import signal
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from config import settings
+from services.resource_limits import current_limits, limits_preexec, run_limits, set_cpu_limit
+from services.scratch_space import get_scratch_space
+from services.worker_pool import (
+    PYTHON_HASH_SEED, WORKER_SCRIPT, get_python_pool, lease_python_worker, python_worker_env,
+    shutdown_python_pool
+)
+
+# A pipe can't be passed through `docker exec`, so containers get a named pipe
+# for the worker's report, in a directory of its own mounted read-only (the
+# program can't replace it, unlike a file in its writable /code)
+REPORT_FIFO_NAME = "report"
+
+# Inside the container: the scratch directory, this directory and the report directory are mounted here
+CONTAINER_CODE_DIR = "/code"
+CONTAINER_SERVICES_DIR = "/opt/tracecode"
+CONTAINER_REPORT_DIR = "/run/tracecode"
+CONTAINER_PYTHON = "python3"
+
+PYTHON_VERSION_SCRIPT = "import sys; print(sys.version)"
+
+# docker run / exec / rm calls that take longer than this are given up on
+DOCKER_COMMAND_TIMEOUT_SECONDS = 30
+
+# rlimit -> (sh `ulimit` flag, bytes per unit) for limits applied inside a container
+ULIMIT_FLAGS = {
+    "RLIMIT_AS": ("-v", 1024),
+    "RLIMIT_FSIZE": ("-f", 512)
+}
+
+
+class SandboxBackend:
+    """Where Python runs execute"""
+
+    name = ""
+    isolated = False  # programs are kept apart from the host (not plain local processes)
+    _python_version: Optional[str] = None
+
+    def start(self) -> None:
+        """Start warming up (called from the running event loop)"""
+
+    def lease_python(self):
+        """Async context manager yielding a started Python worker for one run"""
+        raise NotImplementedError
+
+    def stats(self) -> Optional[dict]:
+        """Sandbox pool counters, or None for backends without one"""
+        return None
+
+    async def python_version(self) -> Optional[str]:
+        """
+        "<interpreter> <sys.version>" of the Python that runs programs, or None
+        if it can't be started. Probed once.
+        """
+        if self._python_version is None:
+            self._python_version = await self._probe_python_version()
+        return self._python_version
+
+    async def _probe_python_version(self) -> Optional[str]:
+        raise NotImplementedError
+
+    async def shutdown(self) -> None:
+        raise NotImplementedError
+
+
+class LocalBackend(SandboxBackend):
+    """Local processes from the warm worker pool"""
+
+    name = "local"
+
+    def start(self) -> None:
+        get_python_pool()
+
+    def lease_python(self):
+        return lease_python_worker()
+
+    async def _probe_python_version(self) -> Optional[str]:
+        return await probe_python_version(settings.PYTHON_EXECUTABLE, [settings.PYTHON_EXECUTABLE])
+
+    async def shutdown(self) -> None:
+        await shutdown_python_pool()
+
+
+class Sandbox:
+    """One pre-created sandbox: a running container (or stand-in) and its working directory"""
+
+    def __init__(self, name: str, directory: str, report_dir: str = ""):
+        self.name = name
+        self.directory = directory
+        self.report_dir = report_dir  # holds the report pipe, for drivers that need one
+        self.uses = 0
+
+
+class SandboxDriver:
+    """Creates sandboxes, starts programs in them, and resets and destroys them"""
+
+    async def create(self) -> Sandbox:
+        """New sandbox; OSError if it can't be created"""
+        raise NotImplementedError
+
+    async def run(self, sandbox: Sandbox, cpu_seconds: int) -> Tuple[Any, int]:
+        """
+        Start the Python worker in a sandbox; returns an asyncio-Process-like
+        object and the non-blocking read end of the worker's report pipe
+        """
+        raise NotImplementedError
+
+    async def python_version(self) -> Optional[str]:
+        """See SandboxBackend.python_version"""
+        raise NotImplementedError
+
+    async def reset(self, sandbox: Sandbox) -> bool:
+        """Kill whatever the last program left running; False if the sandbox is unusable"""
+        raise NotImplementedError
+
+    async def destroy(self, sandbox: Sandbox) -> None:
+        raise NotImplementedError
+
+
+class SandboxRun:
+    """A program running in a leased sandbox"""
+
+    def __init__(self, sandbox: Sandbox, process, report_fd: int):
+        self.sandbox = sandbox
+        self.process = process
+        self.scratch_dir = sandbox.directory
+        self._report_fd = report_fd
+        self._report: Optional[dict] = None
+
+    def limit_cpu(self, cpu_seconds: int) -> None:
+        # Applied by the driver when the program was started
+        pass
+
+    def report(self) -> Optional[dict]:
+        """Report the worker wrote when it exited, or None (e.g. if it was killed)"""
+        if self._report is None:
+            try:
+                data = os.read(self._report_fd, 65536)
+                self._report = json.loads(data) if data else None
+            except (BlockingIOError, OSError, ValueError):
+                return None
+        return self._report
+
+    async def close(self) -> None:
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+        try:
+            await self.process.wait()
+        finally:
+            os.close(self._report_fd)
+
+
+class SandboxPool:
+    """
+    Pool of `size` reusable sandboxes.
+    A sandbox is leased for one run, then reset in the background (leftover
+    processes killed, directory emptied) and put back. Sandboxes are replaced
+    after `max_uses` runs, or when a reset fails; a background task creates new
+    ones to keep `size` in the pool. When all are in use, a run gets an extra
+    sandbox that is discarded afterwards.
+    """
+
+    def __init__(self, driver: SandboxDriver, size: int, max_uses: int):
+        self.driver = driver
+        self.size = size
+        self.max_uses = max_uses
+        self.leases = 0
+        self.warm_hits = 0
+        self.cold_starts = 0
+        self.resets = 0
+        self.discarded = 0
+        self._idle: Deque[Sandbox] = deque()
+        self._leased = 0
+        self._resetting: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()  # fill the pool right away
+        self._closed = False
+        self._refill_task = asyncio.get_running_loop().create_task(self._refill_loop())
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[SandboxRun]:
+        """
+        Start the Python worker in a sandbox for one run. The caller writes a
+        program framed by prepare_source() plus its input to the worker's stdin.
+        """
+        sandbox = await self._acquire()
+        self._leased += 1
+        try:
+            process, report_fd = await self.driver.run(sandbox, current_limits().cpu_seconds)
+        except BaseException:
+            self._recycle(sandbox)
+            raise
+        sandbox.uses += 1
+        run = SandboxRun(sandbox, process, report_fd)
+        try:
+            yield run
+        finally:
+            try:
+                await run.close()
+            finally:
+                self._recycle(sandbox)
+
+    def stats(self) -> dict:
+        """Pool counters for monitoring"""
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "leased": self._leased,
+            "resetting": len(self._resetting),
+            "leases": self.leases,
+            "warm_hits": self.warm_hits,
+            "cold_starts": self.cold_starts,
+            "resets": self.resets,
+            "discarded": self.discarded
+        }
+
+    async def shutdown(self) -> None:
+        """Stop refilling, finish resets in progress and destroy all idle sandboxes"""
+        self._closed = True
+        self._refill_task.cancel()
+        await asyncio.gather(self._refill_task, *self._resetting, return_exceptions=True)
+        sandboxes = list(self._idle)
+        self._idle.clear()
+        for sandbox in sandboxes:
+            await self.driver.destroy(sandbox)
+
+    async def _acquire(self) -> Sandbox:
+        self.leases += 1
+        self._wakeup.set()
+        if self._idle:
+            self.warm_hits += 1
+            return self._idle.popleft()
+        self.cold_starts += 1
+        return await self.driver.create()
+
+    def _recycle(self, sandbox: Sandbox) -> None:
+        # Not awaited: the run's result doesn't wait for the cleanup
+        self._leased -= 1
+        task = asyncio.get_running_loop().create_task(self._reset(sandbox))
+        self._resetting.add(task)
+        task.add_done_callback(self._resetting.discard)
+
+    async def _reset(self, sandbox: Sandbox) -> None:
+        try:
+            ok = await self.driver.reset(sandbox)
+        except OSError as e:
+            print(f"Failed to reset sandbox {sandbox.name}: {e}")
+            ok = False
+        if ok:
+            ok = get_scratch_space().empty(sandbox.directory)
+        if ok and not self._closed and sandbox.uses < self.max_uses and len(self._idle) < self.size:
+            self.resets += 1
+            self._idle.append(sandbox)
+            return
+        self.discarded += 1
+        await self.driver.destroy(sandbox)
+        self._wakeup.set()
+
+    async def _refill_loop(self) -> None:
+        while not self._closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Leased sandboxes and those being reset come back on their own
+            while not self._closed and len(self._idle) + self._leased + len(self._resetting) < self.size:
+                try:
+                    sandbox = await self.driver.create()
+                except OSError as e:
+                    print(f"Failed to create sandbox: {e}")
+                    break
+                if self._closed:
+                    await self.driver.destroy(sandbox)
+                    break
+                self._idle.append(sandbox)
+
+
+class ContainerBackend(SandboxBackend):
+    """Python runs in pooled sandboxes made by a driver"""
+
+    isolated = True
+
+    def __init__(self, name: str, driver: SandboxDriver):
+        self.name = name
+        self.driver = driver
+        self._pool: Optional[SandboxPool] = None
+
+    def start(self) -> None:
+        self._get_pool()
+
+    def lease_python(self):
+        return self._get_pool().lease()
+
+    def stats(self) -> Optional[dict]:
+        return self._pool.stats() if self._pool else None
+
+    async def _probe_python_version(self) -> Optional[str]:
+        return await self.driver.python_version()
+
+    async def shutdown(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.shutdown()
+
+    def _get_pool(self) -> SandboxPool:
+        if self._pool is None:
+            self._pool = SandboxPool(
+                self.driver,
+                size=settings.SANDBOX_POOL_SIZE,
+                max_uses=settings.SANDBOX_MAX_USES
+            )
+        return self._pool
+
+
+class DockerExecProcess:
+    """
+    A `docker exec` client standing in for the program it runs. Exit statuses
+    above 128 mean "killed by signal N - 128" and read as -N, like a local
+    process's. Killing the client doesn't stop the program; the reset does.
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self._process = process
+        self.stdin = process.stdin
+        self.stdout = process.stdout
+        self.stderr = process.stderr
+        self.pid = process.pid
+
+    @property
+    def returncode(self) -> Optional[int]:
+        code = self._process.returncode
+        if code is not None and 128 < code < 128 + 65:
+            return 128 - code
+        return code
+
+    async def wait(self) -> int:
+        await self._process.wait()
+        return self.returncode
+
+    def kill(self) -> None:
+        self._process.kill()
+
+
+class DockerDriver(SandboxDriver):
+    """Sandboxes are long-running containers of the sandbox image"""
+
+    def __init__(self, image: str, docker: str):
+        self.image = image
+        self.docker = docker
+        self._numbers = itertools.count(1)
+
+    async def create(self) -> Sandbox:
+        scratch = get_scratch_space()
+        directory = scratch.acquire()
+        report_dir = scratch.acquire()
+        name = f"tracecode-sandbox-{os.getpid()}-{next(self._numbers)}"
+        try:
+            os.mkfifo(os.path.join(report_dir, REPORT_FIFO_NAME), 0o600)
+            code, output = await self._docker(
+                "run", "--detach", "--rm", "--name", name,
+                *self._isolation_flags(),
+                "--volume", f"{directory}:{CONTAINER_CODE_DIR}",
+                "--volume", f"{os.path.dirname(WORKER_SCRIPT)}:{CONTAINER_SERVICES_DIR}:ro",
+                # Writing to a named pipe doesn't need a writable mount
+                "--volume", f"{report_dir}:{CONTAINER_REPORT_DIR}:ro",
+                "--workdir", CONTAINER_CODE_DIR,
+                self.image, "sleep", "infinity"
+            )
+        except BaseException:
+            scratch.release(directory)
+            scratch.release(report_dir)
+            raise
+        if code != 0:
+            scratch.release(directory)
+            scratch.release(report_dir)
+            raise OSError(f"docker run failed: {output}")
+        return Sandbox(name, directory, report_dir)
+
+    async def run(self, sandbox: Sandbox, cpu_seconds: int) -> Tuple[DockerExecProcess, int]:
+        worker = f"{CONTAINER_SERVICES_DIR}/{os.path.basename(WORKER_SCRIPT)}"
+        script = "; ".join(_ulimit_commands(cpu_seconds) + [
+            f"exec {CONTAINER_PYTHON} {worker} 3 3>{CONTAINER_REPORT_DIR}/{REPORT_FIFO_NAME}"
+        ])
+        # Open the reading end first: the shell's open for writing waits for a reader
+        report_fd = os.open(os.path.join(sandbox.report_dir, REPORT_FIFO_NAME), os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.docker, "exec", "--interactive", "--env", f"PYTHONHASHSEED={PYTHON_HASH_SEED}",
+                sandbox.name, "sh", "-c", script,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except BaseException:
+            os.close(report_fd)
+            raise
+        return DockerExecProcess(process), report_fd
+
+    async def python_version(self) -> Optional[str]:
+        return await probe_python_version(
+            f"{self.image}/{CONTAINER_PYTHON}",
+            [self.docker, "run", "--rm", "--network", "none", self.image, CONTAINER_PYTHON]
+        )
+
+    async def reset(self, sandbox: Sandbox) -> bool:
+        # kill -1 spares PID 1 (the container's `sleep`) and the shell itself;
+        # fails only if the container is gone
+        code, _ = await self._docker("exec", sandbox.name, "sh", "-c", "kill -9 -1 2>/dev/null; true")
+        return code == 0
+
+    async def destroy(self, sandbox: Sandbox) -> None:
+        try:
+            await self._docker("rm", "--force", sandbox.name)
+        except OSError as e:
+            print(f"Failed to remove sandbox {sandbox.name}: {e}")
+        get_scratch_space().release(sandbox.directory)
+        get_scratch_space().release(sandbox.report_dir)
+
+    def _isolation_flags(self) -> List[str]:
+        # Same user as the server, so both sides can write the shared directory
+        flags = [
+            "--network", "none",
+            "--read-only",
+            "--tmpfs", "/tmp:size=16m",
+            "--cap-drop", "ALL",
+            "--security-opt", "no-new-privileges",
+            "--user", f"{os.getuid()}:{os.getgid()}",
+            "--memory", settings.SANDBOX_CONTAINER_MEMORY,
+            "--memory-swap", settings.SANDBOX_CONTAINER_MEMORY,
+            "--cpus", settings.SANDBOX_CONTAINER_CPUS
+        ]
+        if settings.RLIMIT_PROCESSES > 0:
+            flags += ["--pids-limit", str(settings.RLIMIT_PROCESSES)]
+        return flags
+
+    async def _docker(self, *args: str) -> Tuple[int, str]:
+        """Run a docker command; (exit status, output)"""
+        process = await asyncio.create_subprocess_exec(
+            self.docker, *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), DOCKER_COMMAND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return -1, f"docker {args[0]} timed out"
+        return process.returncode, output.decode("utf-8", errors="replace").strip()
+
+
+def _ulimit_commands(cpu_seconds: int) -> List[str]:
+    """sh commands applying run_limits() inside a container (processes are capped by --pids-limit)"""
+    commands = []
+    if cpu_seconds > 0:
+        # Soft limit raises SIGXCPU (reported as a CPU timeout); the hard one kills
+        commands += [f"ulimit -H -t {cpu_seconds + 2}", f"ulimit -S -t {cpu_seconds}"]
+    for name, value in run_limits().items():
+        if name in ULIMIT_FLAGS:
+            flag, unit = ULIMIT_FLAGS[name]
+            commands.append(f"ulimit {flag} {max(value // unit, 1)}")
+    return commands
+
+
+async def probe_python_version(label: str, command: List[str]) -> Optional[str]:
+    """f"{label} {sys.version}" of the Python started by `command`, or None if it can't be started"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command, "-c", PYTHON_VERSION_SCRIPT,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+    except OSError:
+        return None
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), DOCKER_COMMAND_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return None
+    if process.returncode != 0:
+        return None
+    return f"{label} {stdout.decode().strip()}"
+
+
+class FakeDriver(SandboxDriver):
+    """
+    Stand-in sandboxes for running the container backend without Docker: a
+    scratch directory each, and programs started as local process groups.
+    """
+
+    def __init__(self):
+        self._numbers = itertools.count(1)
+        self._groups: Dict[str, int] = {}  # sandbox name -> process group of its last run
+
+    async def create(self) -> Sandbox:
+        return Sandbox(f"fake-sandbox-{next(self._numbers)}", get_scratch_space().acquire())
+
+    async def run(self, sandbox: Sandbox, cpu_seconds: int) -> Tuple[asyncio.subprocess.Process, int]:
+        report_read, report_write = os.pipe()
+        os.set_blocking(report_read, False)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                settings.PYTHON_EXECUTABLE, WORKER_SCRIPT, str(report_write),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=sandbox.directory,
+                pass_fds=(report_write,),
+                preexec_fn=limits_preexec(),
+                start_new_session=True,
+                env=python_worker_env()
+            )
+        except BaseException:
+            os.close(report_read)
+            raise
+        finally:
+            os.close(report_write)
+        self._groups[sandbox.name] = process.pid
+        set_cpu_limit(process.pid, cpu_seconds)
+        return process, report_read
+
+    async def python_version(self) -> Optional[str]:
+        return await probe_python_version(settings.PYTHON_EXECUTABLE, [settings.PYTHON_EXECUTABLE])
+
+    async def reset(self, sandbox: Sandbox) -> bool:
+        group = self._groups.pop(sandbox.name, None)
+        if group is not None:
+            try:
+                os.killpg(group, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        return True
+
+    async def destroy(self, sandbox: Sandbox) -> None:
+        await self.reset(sandbox)
+        get_scratch_space().release(sandbox.directory)
+
+
+def create_backend() -> SandboxBackend:
+    """Backend named by SANDBOX_BACKEND"""
+    if settings.SANDBOX_BACKEND == "local":
+        return LocalBackend()
+    if settings.SANDBOX_BACKEND == "container":
+        return ContainerBackend("container", DockerDriver(settings.SANDBOX_IMAGE, settings.DOCKER_EXECUTABLE))
+    if settings.SANDBOX_BACKEND == "fake":
+        return ContainerBackend("fake", FakeDriver())
+    raise ValueError(f"Unknown sandbox backend: {settings.SANDBOX_BACKEND}")
+
+
+_backend: Optional[SandboxBackend] = None
+
+
+def get_sandbox_backend() -> SandboxBackend:
+    """Get the configured backend"""
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+def host_runtimes_allowed() -> bool:
+    """
+    Whether Java, C/C++ and REPL sessions may run: they are local processes,
+    so with an isolating backend only when SANDBOX_HOST_RUNTIMES says so
+    """
+    return not get_sandbox_backend().isolated or settings.SANDBOX_HOST_RUNTIMES
+
+
+def lease_python_sandbox():
+    """Get a Python worker for one run from the configured backend"""
+    return get_sandbox_backend().lease_python()
+
+
+async def shutdown_sandbox_backend() -> None:
+    """Stop the backend's workers or sandboxes (called on application shutdown)"""
+    global _backend
+    if _backend is not None:
+        backend, _backend = _backend, None
+        await backend.shutdown()
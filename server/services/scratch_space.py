@@ -0,0 +1,109 @@
+"""
+Scratch directories for sandboxed processes
+Each worker runs in its own directory under a per-process root, on disk in the
+system temp directory unless SANDBOX_SCRATCH_DIR says otherwise. Directories are
+emptied and reused rather than created and deleted for every run.
+"""
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+from config import settings
+
+ROOT_PREFIX = "tracecode_"
+
+
+def _default_base_dir() -> str:
+    # Not /dev/shm: RLIMIT_FSIZE caps each file, not how many a program writes,
+    # and on tmpfs those files take host memory from the API and other runs
+    return tempfile.gettempdir()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_stale_roots(base_dir: str) -> None:
+    """Remove roots left behind by server processes that died without cleaning up"""
+    try:
+        names = os.listdir(base_dir)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith(ROOT_PREFIX):
+            continue
+        pid_part = name[len(ROOT_PREFIX):].split("_", 1)[0]
+        if pid_part.isdigit() and int(pid_part) != os.getpid() and not _pid_alive(int(pid_part)):
+            shutil.rmtree(os.path.join(base_dir, name), ignore_errors=True)
+
+
+class ScratchSpace:
+    """Pool of reusable working directories under one root owned by this process"""
+
+    def __init__(self, base_dir: str):
+        sweep_stale_roots(base_dir)
+        self.base_dir = base_dir
+        self.root = tempfile.mkdtemp(prefix=f"{ROOT_PREFIX}{os.getpid()}_", dir=base_dir)
+        self._free: List[str] = []
+        self._created = 0
+
+    def acquire(self) -> str:
+        """Get an empty directory for a worker"""
+        if self._free:
+            return self._free.pop()
+        self._created += 1
+        path = os.path.join(self.root, str(self._created))
+        os.mkdir(path, 0o700)
+        return path
+
+    def release(self, path: str) -> None:
+        """Empty a directory and make it available again; discard it if it can't be emptied"""
+        if self.empty(path):
+            self._free.append(path)
+
+    def empty(self, path: str) -> bool:
+        """Remove everything in a directory; False (and the directory is removed) if that fails"""
+        try:
+            with os.scandir(path) as entries:
+                leftovers = [entry.path for entry in entries]
+            for leftover in leftovers:
+                if os.path.isdir(leftover) and not os.path.islink(leftover):
+                    shutil.rmtree(leftover)
+                else:
+                    os.remove(leftover)
+        except OSError as e:
+            print(f"Discarding scratch directory {path}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            return False
+        return True
+
+    def close(self) -> None:
+        """Remove the whole root"""
+        shutil.rmtree(self.root, ignore_errors=True)
+        self._free.clear()
+
+
+_scratch: Optional[ScratchSpace] = None
+
+
+def get_scratch_space() -> ScratchSpace:
+    """Get this process's scratch space, creating the root on first use"""
+    global _scratch
+    if _scratch is None:
+        _scratch = ScratchSpace(settings.SANDBOX_SCRATCH_DIR or _default_base_dir())
+    return _scratch
+
+
+def close_scratch_space() -> None:
+    """Remove the scratch root (called on application shutdown)"""
+    global _scratch
+    if _scratch is not None:
+        _scratch.close()
+        _scratch = None
@@ -0,0 +1,108 @@
+"""
+Single-flight request coalescing
+Concurrent identical requests (a snippet the whole class runs at once, or the
+same hint asked for by many students) share one in-flight computation: the
+first caller starts it and later callers with the same key await its result.
+Nothing is kept once the computation finishes; see result_cache for that.
+The shared computation doesn't inherit the first caller's request deadline;
+callers with a deadline bound their own wait for it.
+"""
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import settings
+from services.deadline import context_without_deadline
+
+
+def flight_key(*parts: str) -> str:
+    """Hash identifying a computation by everything that determines its result"""
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls by key
+    The shared computation runs as its own task, so it survives the caller that
+    started it going away as long as someone is still waiting; it is cancelled
+    once every waiter has been cancelled.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls: Dict[str, _Call] = {}
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        """Result of `compute()`, shared with any concurrent call for the same key"""
+        call = self._calls.get(key)
+        if call is None:
+            # The task's context is copied from the one current when it is created
+            call = _Call(context_without_deadline().run(asyncio.ensure_future, compute()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            call.waiters -= 1
+            if call.waiters == 0:
+                # Nobody wants the result any more; later callers start afresh
+                self._forget(key, call)
+                call.task.cancel()
+            raise
+        call.waiters -= 1
+        # Each caller gets its own copy to build its response from
+        return dict(result)
+
+    def stats(self) -> dict:
+        calls = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / calls, 4) if calls else 0.0
+        }
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+_executions: Optional[SingleFlight] = None
+_hints: Optional[SingleFlight] = None
+
+
+def get_execution_flights() -> Optional[SingleFlight]:
+    """Coalescer for code runs. None when single-flight is disabled"""
+    global _executions
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return None
+    if _executions is None:
+        _executions = SingleFlight()
+    return _executions
+
+
+def get_hint_flights() -> Optional[SingleFlight]:
+    """Coalescer for hint generation. None when single-flight is disabled"""
+    global _hints
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return None
+    if _hints is None:
+        _hints = SingleFlight()
+    return _hints
@@ -1,7 +1,7 @@
 """
 Submissions storage service for user code history
 """
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
 from datetime import datetime
 import uuid
 
@@ -17,9 +17,12 @@ def create_submission(
     output: str,
     status: str,
     execution_time: float,
+    error: Optional[str] = None,
     error_type: Optional[str] = None,
     hints: Optional[List[str]] = None,
-    root_cause: Optional[str] = None
+    root_cause: Optional[str] = None,
+    resource_usage: Optional[Dict[str, Any]] = None,
+    cached: bool = False
 ) -> Dict[str, Any]:
     """Create and store a new submission"""
     submission_id = str(uuid.uuid4())
@@ -33,9 +36,12 @@ def create_submission(
         "output": output,
         "status": status,
         "execution_time": execution_time,
+        "error": error,
         "error_type": error_type,
         "hints": hints or [],
         "root_cause": root_cause,
+        "resource_usage": resource_usage,
+        "cached": cached,
         "timestamp": timestamp,
         "created_at": timestamp
     }
@@ -56,6 +62,11 @@ def get_submission(submission_id: str) -> Optional[Dict[str, Any]]:
     return _submissions_db.get(submission_id)
 
 
+def iter_failed_submissions() -> Iterator[Dict[str, Any]]:
+    """All users' failed submissions, for offline analysis"""
+    return (sub for sub in list(_submissions_db.values()) if sub.get("status") == "error")
+
+
 def get_user_submissions(
     user_id: str,
     limit: int = 20,
@@ -109,6 +120,7 @@ def get_user_stats(user_id: str) -> Dict[str, Any]:
     languages: Dict[str, int] = {}
     error_types: Dict[str, int] = {}
     total_time = 0.0
+    timed = 0
     
     for sid in submission_ids:
         sub = _submissions_db.get(sid)
@@ -130,8 +142,10 @@ def get_user_stats(user_id: str) -> Dict[str, Any]:
             et = sub.get("error_type")
             error_types[et] = error_types.get(et, 0) + 1
         
-        # Sum execution time
-        total_time += sub.get("execution_time", 0)
+        # Sum execution time of runs that were actually measured
+        if not sub.get("cached"):
+            total_time += sub.get("execution_time", 0)
+            timed += 1
     
     total = len(submission_ids)
     
@@ -142,7 +156,7 @@ def get_user_stats(user_id: str) -> Dict[str, Any]:
         "success_rate": round((success_count / total) * 100, 2) if total > 0 else 0.0,
         "languages": languages,
         "error_types": error_types,
-        "avg_execution_time": round(total_time / total, 3) if total > 0 else 0.0
+        "avg_execution_time": round(total_time / timed, 3) if timed > 0 else 0.0
     }
 
 
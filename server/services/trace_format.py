@@ -0,0 +1,180 @@
+"""
+Compact execution trace format
+A trace is a set of columns rather than a list of JSON objects: one row per
+step (event kind, line, call depth, function) and one row per variable change
+(step, name, value), with every string stored once in a string table. The
+encoded form is the columns' raw little-endian arrays, zlib-compressed.
+
+Also imported by the sandbox worker, so it must not depend on server modules.
+"""
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Tuple
+
+# Written by the worker into its scratch directory
+TRACE_FILENAME = ".tracecode_trace"
+
+LINE, CALL, RETURN, EXCEPTION = range(4)
+EVENT_NAMES = ("line", "call", "return", "exception")
+
+MAGIC = b"TCTR"
+VERSION = 1
+FLAG_TRUNCATED = 1
+
+# magic, version, flags, steps, changes, strings
+_HEADER = struct.Struct("<4sBBIII")
+
+
+def _column_bytes(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_column(typecode: str, data: bytes, offset: int, count: int) -> Tuple[array, int]:
+    column = array(typecode)
+    end = offset + count * column.itemsize
+    if end > len(data):
+        raise ValueError("Trace is truncated")
+    column.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, end
+
+
+class Trace:
+    """Columns of one traced run; built by the worker's recorder, read by the server"""
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.lines = array("I")
+        self.depths = array("H")
+        self.functions = array("I")  # string ids
+        self.change_steps = array("I")  # non-decreasing
+        self.change_names = array("I")
+        self.change_values = array("I")
+        self.strings: List[str] = []
+        self.truncated = False  # recording stopped at the step cap
+        self._string_ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def intern(self, text: str) -> int:
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def add_step(self, kind: int, line: int, depth: int, function: str) -> int:
+        self.kinds.append(kind)
+        self.lines.append(line)
+        self.depths.append(min(depth, 0xFFFF))
+        self.functions.append(self.intern(function))
+        return len(self.kinds) - 1
+
+    def add_change(self, step: int, name: str, value: str) -> None:
+        self.change_steps.append(step)
+        self.change_names.append(self.intern(name))
+        self.change_values.append(self.intern(value))
+
+    def encode(self) -> bytes:
+        encoded = [s.encode("utf-8", errors="replace") for s in self.strings]
+        lengths = array("I", [len(s) for s in encoded])
+        parts = [
+            _HEADER.pack(
+                MAGIC, VERSION, FLAG_TRUNCATED if self.truncated else 0,
+                len(self.kinds), len(self.change_steps), len(encoded)
+            ),
+            *(_column_bytes(column) for column in (
+                self.kinds, self.lines, self.depths, self.functions,
+                self.change_steps, self.change_names, self.change_values, lengths
+            )),
+            b"".join(encoded)
+        ]
+        return zlib.compress(b"".join(parts))
+
+    @classmethod
+    def decode(cls, blob: bytes, max_bytes: int) -> "Trace":
+        """Parse an encoded trace; ValueError if it is malformed or inflates past max_bytes"""
+        try:
+            inflater = zlib.decompressobj()
+            data = inflater.decompress(blob, max_bytes)
+        except zlib.error as e:
+            raise ValueError(f"Trace is not compressed correctly: {e}")
+        if inflater.unconsumed_tail:
+            raise ValueError("Trace is too large")
+        if len(data) < _HEADER.size:
+            raise ValueError("Trace is truncated")
+        magic, version, flags, steps, changes, strings = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a trace")
+
+        trace = cls()
+        trace.truncated = bool(flags & FLAG_TRUNCATED)
+        offset = _HEADER.size
+        trace.kinds, offset = _read_column("B", data, offset, steps)
+        trace.lines, offset = _read_column("I", data, offset, steps)
+        trace.depths, offset = _read_column("H", data, offset, steps)
+        trace.functions, offset = _read_column("I", data, offset, steps)
+        trace.change_steps, offset = _read_column("I", data, offset, changes)
+        trace.change_names, offset = _read_column("I", data, offset, changes)
+        trace.change_values, offset = _read_column("I", data, offset, changes)
+        lengths, offset = _read_column("I", data, offset, strings)
+        for length in lengths:
+            if offset + length > len(data):
+                raise ValueError("Trace is truncated")
+            trace.strings.append(data[offset:offset + length].decode("utf-8", errors="replace"))
+            offset += length
+
+        # The worker runs student code, so check every reference before use
+        if any(kind >= len(EVENT_NAMES) for kind in trace.kinds):
+            raise ValueError("Unknown trace event")
+        for column in (trace.functions, trace.change_names, trace.change_values):
+            if column and max(column) >= strings:
+                raise ValueError("Trace string id out of range")
+        if trace.change_steps and (
+            trace.change_steps[-1] >= steps
+            or any(a > b for a, b in zip(trace.change_steps, trace.change_steps[1:]))
+        ):
+            raise ValueError("Trace changes out of order")
+        return trace
+
+    def changes(self, step: int) -> Dict[str, str]:
+        """Variables that changed at a step: name -> repr"""
+        first = bisect_left(self.change_steps, step)
+        last = bisect_right(self.change_steps, step)
+        return {
+            self.strings[self.change_names[i]]: self.strings[self.change_values[i]]
+            for i in range(first, last)
+        }
+
+    def step(self, index: int) -> dict:
+        return {
+            "index": index,
+            "event": EVENT_NAMES[self.kinds[index]],
+            "line": self.lines[index],
+            "depth": self.depths[index],
+            "function": self.strings[self.functions[index]],
+            "changes": self.changes(index)
+        }
+
+    def variables_before(self, index: int) -> Dict[str, str]:
+        """Known variables of the innermost frame just before a step, replayed from the start"""
+        stack: List[Dict[str, str]] = [{}]
+        change = 0
+        for step in range(index):
+            kind = self.kinds[step]
+            if kind == CALL:
+                stack.append({})
+            while change < len(self.change_steps) and self.change_steps[change] == step:
+                stack[-1][self.strings[self.change_names[change]]] = self.strings[self.change_values[change]]
+                change += 1
+            if kind == RETURN and len(stack) > 1:
+                stack.pop()
+        return stack[-1]
@@ -0,0 +1,72 @@
+"""
+Recorded execution traces, kept so clients can fetch them step range by step range
+"""
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+from services.trace_format import Trace
+
+
+def _trace_size(trace: Trace) -> int:
+    # Approximate memory held: the columns plus the string table
+    columns = (
+        trace.kinds, trace.lines, trace.depths, trace.functions,
+        trace.change_steps, trace.change_names, trace.change_values
+    )
+    return sum(len(c) * c.itemsize for c in columns) + sum(len(s) + 48 for s in trace.strings) + 256
+
+
+class TraceStore:
+    """LRU store of decoded traces bounded by total size, with per-entry TTL"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (stored_at, size, trace)
+
+    def put(self, trace: Trace) -> Optional[str]:
+        """Store a trace and return its id, or None if it is too large to keep"""
+        size = _trace_size(trace)
+        if size > self.max_bytes:
+            return None
+        trace_id = str(uuid.uuid4())
+        self._entries[trace_id] = (time.monotonic(), size, trace)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return trace_id
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        entry = self._entries.get(trace_id)
+        if entry is None:
+            return None
+        stored_at, _, trace = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            self._remove(trace_id)
+            return None
+        self._entries.move_to_end(trace_id)
+        return trace
+
+    def _remove(self, trace_id: str) -> None:
+        _, size, _ = self._entries.pop(trace_id)
+        self._bytes -= size
+
+
+_store: Optional[TraceStore] = None
+
+
+def get_trace_store() -> TraceStore:
+    """Get the shared trace store"""
+    global _store
+    if _store is None:
+        _store = TraceStore(
+            max_bytes=settings.TRACE_STORE_MAX_BYTES,
+            ttl_seconds=settings.TRACE_TTL_SECONDS
+        )
+    return _store
@@ -0,0 +1,109 @@
+"""
+Execution recorder for traced runs
+Runs inside the sandbox worker. Records call, line, return and exception
+events of the student's own code (other files are not traced at all) into a
+trace_format.Trace, with the variables that changed. Overhead is bounded:
+recording stops for good at `max_steps` events, variables are snapshotted on
+every `snapshot_every`-th line (and on every call and return), and values are
+shortened reprs. The trace is written as soon as recording stops, so a program
+that loops until it is killed still leaves one behind.
+"""
+import os
+import reprlib
+import sys
+import types
+
+from trace_format import CALL, EXCEPTION, LINE, RETURN, TRACE_FILENAME, Trace
+
+MAX_VARIABLES = 32
+
+# Names a student didn't create, and values that are noise in a variables view
+HIDDEN_TYPES = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, type)
+
+_repr = reprlib.Repr()
+_repr.maxstring = 60
+_repr.maxother = 60
+_repr.maxlist = _repr.maxtuple = _repr.maxset = _repr.maxdict = 10
+_repr.maxlevel = 3
+
+
+def short_repr(value) -> str:
+    try:
+        return _repr.repr(value)
+    except Exception:
+        return f"<{type(value).__name__}>"
+
+
+class Recorder:
+    def __init__(self, filename: str, max_steps: int, snapshot_every: int):
+        self.filename = filename
+        self.max_steps = max_steps
+        self.snapshot_every = max(snapshot_every, 1)
+        self.trace = Trace()
+        # Resolved now: the program may change directory
+        self.path = os.path.abspath(TRACE_FILENAME)
+        self.stopped = False
+        self._depth = 0
+        self._lines = 0
+        self._last_seen = {}  # id(frame) -> {name: repr} as of its last snapshot
+
+    def start(self) -> None:
+        sys.settrace(self._on_call)
+
+    def stop(self) -> None:
+        """Stop recording and write the trace (once)"""
+        if self.stopped:
+            return
+        self.stopped = True
+        sys.settrace(None)
+        try:
+            with open(self.path, "wb") as out:
+                out.write(self.trace.encode())
+        except OSError:
+            pass
+
+    def _on_call(self, frame, event, arg):
+        if self.stopped or frame.f_code.co_filename != self.filename:
+            return None
+        self._depth += 1
+        self._record(CALL, frame, snapshot=True)
+        return self._on_event
+
+    def _on_event(self, frame, event, arg):
+        if self.stopped:
+            return None
+        if event == "line":
+            self._lines += 1
+            self._record(LINE, frame, snapshot=self._lines % self.snapshot_every == 0)
+        elif event == "return":
+            # Also fired when an exception propagates out (arg is None then)
+            self._record(RETURN, frame, snapshot=True, extra=("<return>", short_repr(arg)))
+            self._last_seen.pop(id(frame), None)
+            self._depth -= 1
+        elif event == "exception":
+            exc_type, exc, _ = arg
+            self._record(EXCEPTION, frame, snapshot=False, extra=("<exception>", f"{exc_type.__name__}: {exc}"))
+        return self._on_event
+
+    def _record(self, kind: int, frame, snapshot: bool, extra=None) -> None:
+        if len(self.trace) >= self.max_steps:
+            self.trace.truncated = True
+            self.stop()
+            return
+        step = self.trace.add_step(kind, frame.f_lineno or 0, self._depth, frame.f_code.co_name)
+        if snapshot:
+            seen = self._last_seen.setdefault(id(frame), {})
+            shown = 0
+            for name, value in list(frame.f_locals.items()):
+                # ".0" and the like are the hidden iterators of comprehensions
+                if name.startswith(("__", ".")) or isinstance(value, HIDDEN_TYPES):
+                    continue
+                shown += 1
+                if shown > MAX_VARIABLES:
+                    break
+                text = short_repr(value)
+                if seen.get(name) != text:
+                    seen[name] = text
+                    self.trace.add_change(step, name, text)
+        if extra:
+            self.trace.add_change(step, *extra)
@@ -0,0 +1,282 @@
+"""
+Warm worker pools for code execution
+Keeps pre-started runtime processes (Python interpreters, JVMs) ready so a run
+skips runtime startup
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, List, Optional
+
+from config import settings
+from services.resource_limits import limits_preexec, set_cpu_limit
+from services.scratch_space import get_scratch_space
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+
+# Fixed string hashing for Python workers, so iterating a set of strings gives
+# the same order on every run and cached results match fresh ones
+PYTHON_HASH_SEED = "0"
+
+
+def python_worker_env() -> dict:
+    """Environment for Python worker processes"""
+    return dict(os.environ, PYTHONHASHSEED=PYTHON_HASH_SEED)
+
+
+def prepare_source(code: str) -> bytes:
+    """Frame a program for a worker: byte length, newline, UTF-8 source"""
+    source = code.encode("utf-8")
+    return f"{len(source)}\n".encode("ascii") + source
+
+
+def prepare_traced_source(code: str, max_steps: int, snapshot_every: int) -> bytes:
+    """Like prepare_source, but the Python worker records a trace (see tracer.py)"""
+    source = code.encode("utf-8")
+    return f"{len(source)} trace {max_steps} {snapshot_every}\n".encode("ascii") + source
+
+
+class SandboxWorker:
+    """
+    A started language runtime waiting for exactly one program
+    The runtime gets the write end of a pipe as its last argument and writes a
+    JSON report there when it exits (resource usage, compile outcome).
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process, scratch_dir: str, report_fd: int):
+        self.process = process
+        self.scratch_dir = scratch_dir
+        self.started_at = time.monotonic()
+        self._report_fd = report_fd
+        self._report: Optional[dict] = None
+
+    @classmethod
+    async def start(
+        cls,
+        command: List[str],
+        preexec_fn: Optional[Callable[[], None]] = None,
+        env: Optional[dict] = None
+    ) -> "SandboxWorker":
+        scratch = get_scratch_space()
+        scratch_dir = scratch.acquire()
+        report_read, report_write = os.pipe()
+        os.set_blocking(report_read, False)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command, str(report_write),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=scratch_dir,
+                pass_fds=(report_write,),
+                preexec_fn=preexec_fn or limits_preexec(),
+                env=env
+            )
+        except BaseException:
+            # Spawn failed or the pool shut down mid-start
+            os.close(report_read)
+            scratch.release(scratch_dir)
+            raise
+        finally:
+            os.close(report_write)
+        return cls(process, scratch_dir, report_read)
+
+    @property
+    def report_fd(self) -> int:
+        """Read end of the report pipe, for runtimes that report more than once (REPL sessions)"""
+        return self._report_fd
+
+    def is_usable(self, max_idle_seconds: float) -> bool:
+        """Worker is still alive and has not sat idle for too long"""
+        if self.process.returncode is not None:
+            return False
+        return time.monotonic() - self.started_at < max_idle_seconds
+
+    def limit_cpu(self, cpu_seconds: int) -> None:
+        """Give the worker the CPU limit of the run it was leased for"""
+        set_cpu_limit(self.process.pid, cpu_seconds)
+
+    def report(self) -> Optional[dict]:
+        """Report written by the runtime after it exited, or None (e.g. if it was killed)"""
+        if self._report is None:
+            try:
+                data = os.read(self._report_fd, 65536)
+                self._report = json.loads(data) if data else None
+            except (BlockingIOError, OSError, ValueError):
+                return None
+        return self._report
+
+    async def close(self) -> None:
+        """Kill the worker if still running and give back its (emptied) scratch directory"""
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+        try:
+            await self.process.wait()
+        finally:
+            # Runs even if the caller is cancelled while the process is reaped
+            os.close(self._report_fd)
+            get_scratch_space().release(self.scratch_dir)
+
+
+class WorkerPool:
+    """
+    Pool of single-use warm workers.
+    A worker is handed out for one run and then discarded; a background task
+    starts replacements so `size` idle workers are ready when the next run comes.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        start_worker: Callable[[], Awaitable[SandboxWorker]],
+        max_idle_seconds: float
+    ):
+        self.size = size
+        self.start_worker = start_worker
+        self.max_idle_seconds = max_idle_seconds
+        self.warm_hits = 0
+        self.cold_starts = 0
+        self._idle: Deque[SandboxWorker] = deque()
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()  # fill the pool right away
+        self._closed = False
+        self._refill_task = asyncio.get_running_loop().create_task(self._refill_loop())
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[SandboxWorker]:
+        """
+        Hand out a warm worker (or a cold one if the pool is drained) for one run.
+        The caller writes a program framed by prepare_source() plus the program's
+        input to the worker's stdin; the worker is killed and discarded on exit.
+        """
+        worker = await self._acquire()
+        try:
+            yield worker
+        finally:
+            await worker.close()
+
+    def stats(self) -> dict:
+        """Pool counters for monitoring"""
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "warm_hits": self.warm_hits,
+            "cold_starts": self.cold_starts
+        }
+
+    async def shutdown(self) -> None:
+        """Stop refilling and kill all idle workers"""
+        self._closed = True
+        self._refill_task.cancel()
+        await asyncio.gather(self._refill_task, return_exceptions=True)
+        workers = list(self._idle)
+        self._idle.clear()
+        for worker in workers:
+            await worker.close()
+
+    async def _acquire(self) -> SandboxWorker:
+        worker = None
+        stale = []
+        while self._idle:
+            candidate = self._idle.popleft()
+            if candidate.is_usable(self.max_idle_seconds):
+                worker = candidate
+                break
+            stale.append(candidate)
+        self._wakeup.set()
+
+        for old in stale:
+            await old.close()
+        if worker:
+            self.warm_hits += 1
+            return worker
+        self.cold_starts += 1
+        return await self.start_worker()
+
+    async def _refill_loop(self) -> None:
+        # Wake up on every acquire, and periodically to recycle idle workers
+        check_interval = max(1.0, self.max_idle_seconds / 2)
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            for worker in list(self._idle):
+                if not worker.is_usable(self.max_idle_seconds):
+                    self._idle.remove(worker)
+                    await worker.close()
+
+            while not self._closed and len(self._idle) < self.size:
+                try:
+                    worker = await self.start_worker()
+                except OSError as e:
+                    print(f"Failed to start sandbox worker: {e}")
+                    break
+                if self._closed:
+                    await worker.close()
+                    break
+                self._idle.append(worker)
+
+
+def start_python_worker() -> Awaitable[SandboxWorker]:
+    return SandboxWorker.start([settings.PYTHON_EXECUTABLE, WORKER_SCRIPT], env=python_worker_env())
+
+
+_pool: Optional[WorkerPool] = None
+
+
+def get_python_pool() -> Optional[WorkerPool]:
+    """
+    Get the shared pool, starting it on first use. None when pooling is disabled.
+    Must be called from the running event loop.
+    """
+    global _pool
+    if settings.PYTHON_POOL_SIZE <= 0:
+        return None
+    if _pool is None:
+        _pool = WorkerPool(
+            size=settings.PYTHON_POOL_SIZE,
+            start_worker=start_python_worker,
+            max_idle_seconds=settings.PYTHON_POOL_MAX_IDLE_SECONDS
+        )
+    return _pool
+
+
+@asynccontextmanager
+async def lease_worker(
+    pool: Optional[WorkerPool], start_worker: Callable[[], Awaitable[SandboxWorker]]
+) -> AsyncIterator[SandboxWorker]:
+    """
+    Get a worker for one run: from the warm pool, or a freshly started one
+    when pooling is disabled. Either way the source goes over stdin.
+    """
+    if pool:
+        async with pool.lease() as worker:
+            yield worker
+        return
+    worker = await start_worker()
+    try:
+        yield worker
+    finally:
+        await worker.close()
+
+
+def lease_python_worker():
+    """Get a Python worker for one run (see lease_worker)"""
+    return lease_worker(get_python_pool(), start_python_worker)
+
+
+async def shutdown_python_pool() -> None:
+    """Kill pooled workers (called on application shutdown)"""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.shutdown()
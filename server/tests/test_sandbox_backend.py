@@ -0,0 +1,106 @@
+"""
+Container sandbox pool, exercised through the fake driver (no Docker needed)
+Run from server/: python -m unittest discover tests
+"""
+import asyncio
+import os
+import unittest
+
+from config import settings
+from services.sandbox_backend import ContainerBackend, FakeDriver
+from services.worker_pool import prepare_source
+
+
+async def run_program(backend: ContainerBackend, code: str, user_input: str = ""):
+    """(returncode, stdout, report, scratch_dir) of one run in a leased sandbox"""
+    async with backend.lease_python() as worker:
+        stdout, _ = await worker.process.communicate(prepare_source(code) + user_input.encode())
+        return worker.process.returncode, stdout.decode(), worker.report(), worker.scratch_dir
+
+
+async def settle(backend: ContainerBackend) -> None:
+    """Wait until the pool has no resets in progress"""
+    for _ in range(200):
+        if not backend.stats()["resetting"]:
+            return
+        await asyncio.sleep(0.01)
+
+
+def process_running(pid: int) -> bool:
+    """Process exists and isn't a zombie waiting to be reaped"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+class FakeBackendTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._settings = (settings.SANDBOX_POOL_SIZE, settings.SANDBOX_MAX_USES)
+        settings.SANDBOX_POOL_SIZE, settings.SANDBOX_MAX_USES = 1, 2
+        self.backend = ContainerBackend("fake", FakeDriver())
+        self.backend.start()
+
+    async def asyncTearDown(self):
+        await self.backend.shutdown()
+        settings.SANDBOX_POOL_SIZE, settings.SANDBOX_MAX_USES = self._settings
+
+    async def test_runs_program_with_input_and_reports_usage(self):
+        code, stdout, report, _ = await run_program(self.backend, "print(input().upper())", "hello\n")
+        self.assertEqual(code, 0)
+        self.assertEqual(stdout, "HELLO\n")
+        self.assertIn("resource_usage", report)
+
+    async def test_sandbox_is_reset_and_reused(self):
+        await settle(self.backend)
+        _, _, _, first_dir = await run_program(self.backend, "open('left.txt', 'w').write('x')")
+        await settle(self.backend)
+        self.assertEqual(os.listdir(first_dir), [])
+        _, _, _, second_dir = await run_program(self.backend, "print(1)")
+        self.assertEqual(first_dir, second_dir)
+        self.assertGreaterEqual(self.backend.stats()["warm_hits"], 1)
+
+    async def test_sandbox_replaced_after_max_uses(self):
+        for _ in range(3):
+            await run_program(self.backend, "print(1)")
+            await settle(self.backend)
+        self.assertGreaterEqual(self.backend.stats()["discarded"], 1)
+
+    async def test_reset_kills_leftover_processes(self):
+        code = (
+            "import subprocess, sys\n"
+            "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'],\n"
+            "                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)\n"
+            "print(child.pid)\n"
+        )
+        _, stdout, _, _ = await run_program(self.backend, code)
+        await settle(self.backend)
+        pid = int(stdout)
+        for _ in range(100):
+            if not process_running(pid):
+                break
+            await asyncio.sleep(0.01)
+        else:
+            self.fail("leftover process survived the reset")
+
+    async def test_program_cannot_forge_report_file(self):
+        code = "open('.tracecode_report', 'w').write('{\"resource_usage\": {\"cpu_user\": -1}}')"
+        _, _, report, _ = await run_program(self.backend, code)
+        self.assertGreaterEqual(report["resource_usage"]["cpu_user"], 0)
+
+    async def test_forked_child_does_not_spoil_report(self):
+        code = "import os, sys\nif os.fork() == 0:\n    sys.exit(0)\nos.wait()\nprint(sys.argv, os.listdir('/proc/self/fd'))"
+        _, stdout, report, _ = await run_program(self.backend, code)
+        self.assertIsNotNone(report)
+        self.assertGreaterEqual(report["resource_usage"]["cpu_user"], 0)
+        self.assertTrue(stdout.startswith("['main.py']"))
+
+    async def test_python_version_is_the_sandbox_interpreter(self):
+        version = await self.backend.python_version()
+        self.assertIsNotNone(version)
+        self.assertTrue(version.startswith(f"{settings.PYTHON_EXECUTABLE} 3."))
+
+
+if __name__ == "__main__":
+    unittest.main()